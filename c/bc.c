@@ -298,3 +298,76 @@ void bc_unpack2(const boundary_conditions* bc,
       MPI_Wait(&sendreq[d], MPI_STATUS_IGNORE);
 #endif // PARALLEL
 }
+
+
+// Do the boundary conditions for bands nstart to nend-1 of a1 in
+// blocks of blocksize bands.  All bands of a block are sent in one
+// message per neighbor, and the messages for the next block are
+// posted before apply_block() is called for the current block
+// (a2 with padding, first band n, number of bands nin).  With
+// cfd, the three directions are independent and all of them are
+// started early.  Otherwise, the corners are passed on from one
+// direction to the next, so only the first direction can be started
+// before the current block is done.
+void bc_pipeline(const boundary_conditions* bc, const double* a1,
+                 int nstart, int nend, int blocksize,
+                 const double_complex* phases, int thd,
+                 bc_block_function apply_block, void* args)
+{
+  int ng = bc->ndouble * bc->size1[0] * bc->size1[1] * bc->size1[2];
+  int ng2 = bc->ndouble * bc->size2[0] * bc->size2[1] * bc->size2[2];
+  int nearly = (bc->cfd ? 3 : 1);
+  int nsend = bc->maxsend * blocksize;
+  int nrecv = bc->maxrecv * blocksize;
+
+  // Two sets (current and next block) of buffers and requests:
+  MPI_Request recvreq[2][3][2];
+  MPI_Request sendreq[2][3][2];
+  double* sendbuf = GPAW_MALLOC(double, 2 * 3 * nsend);
+  double* recvbuf = GPAW_MALLOC(double, 2 * 3 * nrecv);
+  double* buf = GPAW_MALLOC(double, 2 * ng2 * blocksize);
+
+  int b = 0;
+  int n = nstart;
+  int nin = (nend - n < blocksize ? nend - n : blocksize);
+  for (int i = 0; i < nearly; i++)
+    bc_unpack1(bc, a1 + n * ng, buf, i, recvreq[0][i], sendreq[0][i],
+               recvbuf + i * nrecv, sendbuf + i * nsend,
+               phases + 2 * i, thd, nin);
+
+  while (n < nend)
+    {
+      // Post the next block:
+      int n2 = n + nin;
+      int nin2 = (nend - n2 < blocksize ? nend - n2 : blocksize);
+      int b2 = 1 - b;
+      for (int i = 0; i < nearly && nin2 > 0; i++)
+        bc_unpack1(bc, a1 + n2 * ng, buf + b2 * ng2 * blocksize, i,
+                   recvreq[b2][i], sendreq[b2][i],
+                   recvbuf + (b2 * 3 + i) * nrecv,
+                   sendbuf + (b2 * 3 + i) * nsend,
+                   phases + 2 * i, thd, nin2);
+
+      // Finish the current block:
+      double* a2 = buf + b * ng2 * blocksize;
+      for (int i = 0; i < 3; i++)
+        {
+          if (i >= nearly)
+            bc_unpack1(bc, a1 + n * ng, a2, i,
+                       recvreq[b][i], sendreq[b][i],
+                       recvbuf + (b * 3 + i) * nrecv,
+                       sendbuf + (b * 3 + i) * nsend,
+                       phases + 2 * i, thd, nin);
+          bc_unpack2(bc, a2, i, recvreq[b][i], sendreq[b][i],
+                     recvbuf + (b * 3 + i) * nrecv, nin);
+        }
+      apply_block(args, a2, n, nin);
+
+      b = b2;
+      n = n2;
+      nin = nin2;
+    }
+  free(buf);
+  free(recvbuf);
+  free(sendbuf);
+}
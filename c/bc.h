@@ -54,3 +54,8 @@ void bc_unpack2(const boundary_conditions* bc,
     MPI_Request recvreq[2],
     MPI_Request sendreq[2],
     double* rbuf, int nin);
+typedef void (*bc_block_function)(void* args, double* a2, int n, int nin);
+void bc_pipeline(const boundary_conditions* bc, const double* a1,
+    int nstart, int nend, int blocksize,
+    const double_complex* phases, int thd,
+    bc_block_function apply_block, void* args);
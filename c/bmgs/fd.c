@@ -59,8 +59,7 @@ void Z(bmgs_fd)(const bmgsstencil* s, const T* a, T* b)
 
   int nthds = 1;
 #ifdef GPAW_OMP_MONLY
-  if (getenv("OMP_NUM_THREADS") != NULL)
-    nthds = atoi(getenv("OMP_NUM_THREADS"));
+  nthds = gpaw_get_num_threads();
 #endif
   struct Z(fds) *wargs = GPAW_MALLOC(struct Z(fds), nthds);
   pthread_t *thds = GPAW_MALLOC(pthread_t, nthds);
@@ -71,8 +71,7 @@ void IP1D(const T* a, int n, int m, T* b, int skip[2])
 
   int nthds = 1;
 #ifdef GPAW_OMP_MONLY
-  if (getenv("OMP_NUM_THREADS") != NULL)
-    nthds = atoi(getenv("OMP_NUM_THREADS"));
+  nthds = gpaw_get_num_threads();
 #endif
   struct IP1DA *wargs = GPAW_MALLOC(struct IP1DA, nthds);
   pthread_t *thds = GPAW_MALLOC(pthread_t, nthds);
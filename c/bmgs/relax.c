@@ -3,6 +3,55 @@
  *  Please see the accompanying LICENSE file for further information. */
 
 #include "bmgs.h"
+#include <pthread.h>
+#include "../extensions.h"
+
+struct jacobiargs{
+  int thread_id;
+  int nthds;
+  const bmgsstencil* s;
+  const double* a;
+  double* b;
+  const double* src;
+  double w;
+};
+
+void *bmgs_jacobi_worker(void *threadarg)
+{
+  struct jacobiargs *args = (struct jacobiargs *) threadarg;
+  const bmgsstencil* s = args->s;
+  const double w = args->w;
+
+  int chunksize = s->n[0] / args->nthds + 1;
+  int nstart = args->thread_id * chunksize;
+  if (nstart >= s->n[0])
+    return NULL;
+  int nend = nstart + chunksize;
+  if (nend > s->n[0])
+    nend = s->n[0];
+
+  for (int i0 = nstart; i0 < nend; i0++)
+    {
+      const double* a = args->a + i0 * (s->j[1] + s->n[1] * (s->j[2] + s->n[2]));
+      double* b = args->b + i0 * s->n[1] * s->n[2];
+      const double* src = args->src + i0 * s->n[1] * s->n[2];
+      for (int i1 = 0; i1 < s->n[1]; i1++)
+        {
+#pragma omp simd
+          for (int i2 = 0; i2 < s->n[2]; i2++)
+            {
+              double x = 0.0;
+              for (int c = 1; c < s->ncoefs; c++)
+                x += a[s->offsets[c] + i2] * s->coefs[c];
+              b[i2] = (1.0 - w) * b[i2] + w * (src[i2] - x)/s->coefs[0];
+            }
+          src += s->n[2];
+          b += s->n[2];
+          a += s->j[2] + s->n[2];
+        }
+    }
+  return NULL;
+}
 
 void bmgs_relax(const int relax_method, const bmgsstencil* s, double* a, double* b,
     const double* src, const double w)
@@ -46,27 +95,40 @@ if (relax_method == 1)
 else
 {
      /* Weighted Jacobi relaxation for the equation "operator" b = src
-        a contains the temporariry array holding also the boundary values. */
+        a contains the temporariry array holding also the boundary values.
+        The planes along the first axis are independent, so they are
+        shared out between threads. */
 
   a += (s->j[0] + s->j[1] + s->j[2]) / 2;
-  for (int i0 = 0; i0 < s->n[0]; i0++)
+
+  int nthds = 1;
+#ifdef GPAW_OMP_MONLY
+  nthds = gpaw_get_num_threads();
+#endif
+  struct jacobiargs *wargs = GPAW_MALLOC(struct jacobiargs, nthds);
+  pthread_t *thds = GPAW_MALLOC(pthread_t, nthds);
+
+  for(int i=0; i < nthds; i++)
     {
-      for (int i1 = 0; i1 < s->n[1]; i1++)
-        {
-#pragma omp simd
-          for (int i2 = 0; i2 < s->n[2]; i2++)
-            {
-              double x = 0.0;
-              for (int c = 1; c < s->ncoefs; c++)
-                x += a[s->offsets[c] + i2] * s->coefs[c];
-              b[i2] = (1.0 - w) * b[i2] + w * (src[i2] - x)/s->coefs[0];
-            }
-          src += s->n[2];
-          b += s->n[2];
-          a += s->j[2] + s->n[2];
-        }
-      a += s->j[1];
+      (wargs+i)->thread_id = i;
+      (wargs+i)->nthds = nthds;
+      (wargs+i)->s = s;
+      (wargs+i)->a = a;
+      (wargs+i)->b = b;
+      (wargs+i)->src = src;
+      (wargs+i)->w = w;
     }
+#ifdef GPAW_OMP_MONLY
+  for(int i=1; i < nthds; i++)
+    pthread_create(thds + i, NULL, bmgs_jacobi_worker, (void*) (wargs+i));
+#endif
+  bmgs_jacobi_worker(wargs);
+#ifdef GPAW_OMP_MONLY
+  for(int i=1; i < nthds; i++)
+    pthread_join(*(thds+i), NULL);
+#endif
+  free(wargs);
+  free(thds);
 }
 
 }
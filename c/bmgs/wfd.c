@@ -79,8 +79,7 @@ void Z(bmgs_wfd)(int nweights, const bmgsstencil* stencils, const double** weigh
 
   int nthds = 1;
 #ifdef GPAW_OMP_MONLY
-  if (getenv("OMP_NUM_THREADS") != NULL)
-    nthds = atoi(getenv("OMP_NUM_THREADS"));
+  nthds = gpaw_get_num_threads();
 #endif
   struct Z(wfds) *wargs = GPAW_MALLOC(struct Z(wfds), nthds);
   pthread_t *thds = GPAW_MALLOC(pthread_t, nthds);
@@ -46,6 +46,20 @@ static INLINE void* gpaw_malloc(size_t n)
 #define GPAW_MALLOC(T, n) (gpaw_malloc((n) * sizeof(T)))
 #endif
 #endif
+// Number of threads used by the pthread code paths that are enabled with
+// the GPAW_OMP and GPAW_OMP_MONLY macros.  Set from Python with
+// _gpaw.set_num_threads().  Zero means: use $OMP_NUM_THREADS.
+extern int gpaw_num_threads;
+
+static INLINE int gpaw_get_num_threads(void)
+{
+  if (gpaw_num_threads > 0)
+    return gpaw_num_threads;
+  if (getenv("OMP_NUM_THREADS") != NULL)
+    return atoi(getenv("OMP_NUM_THREADS"));
+  return 1;
+}
+
 #define MIN(x, y) ((x) < (y) ? (x) : (y))
 #define MAX(x, y) ((x) > (y) ? (x) : (y))
 #define INTP(a) ((int*)PyArray_DATA(a))
@@ -313,6 +313,41 @@ void *apply_worker_cfd(void *threadarg)
   return NULL;
 }
 
+static void apply_block(void *threadarg, double* buf, int n, int nin)
+{
+  struct apply_args *args = (struct apply_args *) threadarg;
+  double* out = args->out + n * args->ng;
+  for (int m = 0; m < nin; m++)
+    if (args->real)
+      bmgs_fd(&args->self->stencil, buf + m * args->ng2, out + m * args->ng);
+    else
+      bmgs_fdz(&args->self->stencil, (const double_complex*) (buf + m * args->ng2),
+                                     (double_complex*) (out + m * args->ng));
+}
+
+//Pipelined worker: halos of the next block of bands are exchanged
+//while the stencil is applied to the current block
+void *apply_worker_pipeline(void *threadarg)
+{
+  struct apply_args *args = (struct apply_args *) threadarg;
+
+  int chunksize = args->nin / args->nthds;
+  if (!chunksize)
+    chunksize = 1;
+  int nstart = args->thread_id * chunksize;
+  if (nstart >= args->nin)
+    return NULL;
+  int nend = nstart + chunksize;
+  if (nend > args->nin)
+    nend = args->nin;
+  if (chunksize > args->chunksize)
+    chunksize = args->chunksize;
+
+  bc_pipeline(args->self->bc, args->in, nstart, nend, chunksize, args->ph,
+              args->thread_id, apply_block, args);
+  return NULL;
+}
+
 static PyObject * Operator_apply(OperatorObject *self,
                                  PyObject *args)
 {
@@ -351,10 +386,13 @@ static PyObject * Operator_apply(OperatorObject *self,
   if (getenv("GPAW_CHUNK_INC") != NULL)
     chunkinc = atoi(getenv("GPAW_CHUNK_INC"));
 
+  int pipeline = 0;
+  if (getenv("GPAW_PIPELINE") != NULL)
+    pipeline = atoi(getenv("GPAW_PIPELINE"));
+
   int nthds = 1;
 #ifdef GPAW_OMP
-  if (getenv("OMP_NUM_THREADS") != NULL)
-    nthds = atoi(getenv("OMP_NUM_THREADS"));
+  nthds = gpaw_get_num_threads();
 #endif
   struct apply_args *wargs = GPAW_MALLOC(struct apply_args, nthds);
   pthread_t *thds = GPAW_MALLOC(pthread_t, nthds);
@@ -374,26 +412,18 @@ static PyObject * Operator_apply(OperatorObject *self,
       (wargs+i)->real = real;
       (wargs+i)->ph = ph;
     }
-#ifndef GPAW_ASYNC
-  if (1)
-#else
-  if (bc->cfd == 0)
+  void *(*worker)(void *) = apply_worker;
+#ifdef GPAW_ASYNC
+  if (bc->cfd != 0)
+    worker = apply_worker_cfd;
 #endif
-    {
-    #ifdef GPAW_OMP
-      for(int i=1; i < nthds; i++)
-        pthread_create(thds + i, NULL, apply_worker, (void*) (wargs+i));
-    #endif
-      apply_worker(wargs);
-    }
-  else
-    {
-    #ifdef GPAW_OMP
-      for(int i=1; i < nthds; i++)
-        pthread_create(thds + i, NULL, apply_worker_cfd, (void*) (wargs+i));
-    #endif
-      apply_worker_cfd(wargs);
-    }
+  if (pipeline && nin > 1)
+    worker = apply_worker_pipeline;
+#ifdef GPAW_OMP
+  for(int i=1; i < nthds; i++)
+    pthread_create(thds + i, NULL, worker, (void*) (wargs+i));
+#endif
+  worker(wargs);
 #ifdef GPAW_OMP
   for(int i=1; i < nthds; i++)
     pthread_join(*(thds+i), NULL);
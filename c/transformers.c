@@ -45,6 +45,7 @@ struct transapply_args{
   int ng2;
   int nin;
   int nthds;
+  int chunksize;
   const double* in;
   double* out;
   int real;
@@ -123,6 +124,84 @@ void *transapply_worker(void *threadarg)
 }
 
 
+struct transapply_block_args{
+  struct transapply_args *args;
+  int out_ng;
+  double* buf2;
+};
+
+static void transapply_block(void *blockarg, double* buf, int n, int nin)
+{
+  struct transapply_block_args *bargs =
+    (struct transapply_block_args *) blockarg;
+  struct transapply_args *args = bargs->args;
+  TransformerObject *self = args->self;
+  boundary_conditions* bc = self->bc;
+  double* buf2 = bargs->buf2;
+  for (int m = 0; m < nin; m++)
+    {
+      double* in = buf + m * args->ng2;
+      double* out = args->out + (n + m) * bargs->out_ng;
+      if (args->real)
+        {
+          if (self->interpolate)
+            bmgs_interpolate(self->k, self->skip, in, bc->size2,
+                             out, buf2);
+          else
+            bmgs_restrict(self->k, in, bc->size2,
+                          out, buf2);
+        }
+      else
+        {
+          if (self->interpolate)
+            bmgs_interpolatez(self->k, self->skip, (double_complex*)in,
+                              bc->size2, (double_complex*)out,
+                              (double_complex*) buf2);
+          else
+            bmgs_restrictz(self->k, (double_complex*) in,
+                           bc->size2, (double_complex*)out,
+                           (double_complex*) buf2);
+        }
+    }
+}
+
+//Pipelined worker: halos of the next block of bands are exchanged
+//while the current block is transformed
+void *transapply_worker_pipeline(void *threadarg)
+{
+  struct transapply_args *args = (struct transapply_args *) threadarg;
+  TransformerObject *self = args->self;
+  boundary_conditions* bc = self->bc;
+
+  int chunksize = args->nin / args->nthds;
+  if (!chunksize)
+    chunksize = 1;
+  int nstart = args->thread_id * chunksize;
+  if (nstart >= args->nin)
+    return NULL;
+  int nend = nstart + chunksize;
+  if (nend > args->nin)
+    nend = args->nin;
+  if (chunksize > args->chunksize)
+    chunksize = args->chunksize;
+
+  int buf2size = args->ng2;
+  if (self->interpolate)
+    buf2size *= 16;
+  else
+    buf2size /= 2;
+
+  struct transapply_block_args bargs;
+  bargs.args = args;
+  bargs.out_ng = bc->ndouble * self->size_out[0] * self->size_out[1]
+                 * self->size_out[2];
+  bargs.buf2 = GPAW_MALLOC(double, buf2size);
+  bc_pipeline(bc, args->in, nstart, nend, chunksize, args->ph,
+              args->thread_id, transapply_block, &bargs);
+  free(bargs.buf2);
+  return NULL;
+}
+
 
 static PyObject* Transformer_apply(TransformerObject *self, PyObject *args)
 {
@@ -147,10 +226,17 @@ static PyObject* Transformer_apply(TransformerObject *self, PyObject *args)
   bool real = (PyArray_DESCR(input)->type_num == NPY_DOUBLE);
   const double_complex* ph = (real ? 0 : COMPLEXP(phases));
 
+  int chunksize = 1;
+  if (getenv("GPAW_CHUNK_SIZE") != NULL)
+    chunksize = atoi(getenv("GPAW_CHUNK_SIZE"));
+
+  int pipeline = 0;
+  if (getenv("GPAW_PIPELINE") != NULL)
+    pipeline = atoi(getenv("GPAW_PIPELINE"));
+
   int nthds = 1;
 #ifdef GPAW_OMP
-  if (getenv("OMP_NUM_THREADS") != NULL)
-    nthds = atoi(getenv("OMP_NUM_THREADS"));
+  nthds = gpaw_get_num_threads();
 #endif
   struct transapply_args *wargs = GPAW_MALLOC(struct transapply_args, nthds);
   pthread_t *thds = GPAW_MALLOC(pthread_t, nthds);
@@ -159,6 +245,7 @@ static PyObject* Transformer_apply(TransformerObject *self, PyObject *args)
     {
       (wargs+i)->thread_id = i;
       (wargs+i)->nthds = nthds;
+      (wargs+i)->chunksize = chunksize;
       (wargs+i)->self = self;
       (wargs+i)->ng = ng;
       (wargs+i)->ng2 = ng2;
@@ -169,11 +256,14 @@ static PyObject* Transformer_apply(TransformerObject *self, PyObject *args)
       (wargs+i)->ph = ph;
     }
 
+  void *(*worker)(void *) = transapply_worker;
+  if (pipeline && nin > 1)
+    worker = transapply_worker_pipeline;
 #ifdef GPAW_OMP
   for(int i=1; i < nthds; i++)
-    pthread_create(thds + i, NULL, transapply_worker, (void*) (wargs+i));
+    pthread_create(thds + i, NULL, worker, (void*) (wargs+i));
 #endif
-  transapply_worker(wargs);
+  worker(wargs);
 #ifdef GPAW_OMP
   for(int i=1; i < nthds; i++)
     pthread_join(*(thds+i), NULL);
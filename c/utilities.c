@@ -475,6 +475,30 @@ PyObject* errorfunction(PyObject *self, PyObject *args)
 }
 
 
+int gpaw_num_threads = 0;
+
+PyObject* set_num_threads(PyObject *self, PyObject *args)
+{
+  int nthreads;
+  if (!PyArg_ParseTuple(args, "i", &nthreads))
+    return NULL;
+  if (nthreads < 0) {
+    PyErr_SetString(PyExc_ValueError, "Number of threads must be >= 0");
+    return NULL;
+  }
+  gpaw_num_threads = nthreads;
+  Py_RETURN_NONE;
+}
+
+
+PyObject* get_num_threads(PyObject *self, PyObject *args)
+{
+  if (!PyArg_ParseTuple(args, ""))
+    return NULL;
+  return Py_BuildValue("i", gpaw_get_num_threads());
+}
+
+
 PyObject* pack(PyObject *self, PyObject *args)
 {
     PyArrayObject* a_obj;
@@ -399,8 +399,7 @@ static PyObject * WOperator_apply(WOperatorObject *self,
 
   int nthds = 1;
 #ifdef GPAW_OMP
-  if (getenv("OMP_NUM_THREADS") != NULL)
-    nthds = atoi(getenv("OMP_NUM_THREADS"));
+  nthds = gpaw_get_num_threads();
 #endif
   struct wapply_args *wargs = GPAW_MALLOC(struct wapply_args, nthds);
   pthread_t *thds = GPAW_MALLOC(pthread_t, nthds);
@@ -8,7 +8,9 @@ from ase.utils import basestring, plural
 from ase.utils.timing import Timer
 from ase.dft.bandgap import bandgap
 
+import _gpaw
 import gpaw
+import gpaw.fftw as fftw
 import gpaw.mpi as mpi
 import gpaw.wavefunctions.pw as pw
 from gpaw import dry_run, memory_estimate_depth
@@ -37,6 +39,7 @@ from gpaw.utilities import check_atoms_too_close
 from gpaw.utilities.gpts import get_number_of_grid_points
 from gpaw.utilities.grid import GridRedistributor
 from gpaw.utilities.partition import AtomPartition
+from gpaw.wavefunctions.extrapolation import create_wfs_extrapolation
 from gpaw.wavefunctions.mode import create_wave_function_mode
 from gpaw.xc import XC
 from gpaw.xc.sic import SIC
@@ -70,7 +73,8 @@ class GPAW(PAW, Calculator):
                          'niter_fixdensity': 0,
                          'magmoms': None,
                          'soc': None,
-                         'kpt_refine': None},
+                         'kpt_refine': None,
+                         'wfs_extrapolation': None},
         'external': None,
         'random': False,
         'hund': False,
@@ -80,7 +84,8 @@ class GPAW(PAW, Calculator):
                      'time_reversal': True,
                      'symmorphic': True,
                      'tolerance': 1e-7,
-                     'do_not_symmetrize_the_density': False},
+                     'do_not_symmetrize_the_density': False,
+                     'irreducible_grid': False},
         'convergence': {'energy': 0.0005,  # eV / electron
                         'density': 1.0e-4,
                         'eigenstates': 4.0e-8,  # eV^2
@@ -105,7 +110,8 @@ class GPAW(PAW, Calculator):
         'sl_lrtddft': gpaw.sl_lrtddft,
         'use_elpa': False,
         'elpasolver': '2stage',
-        'buffer_size': gpaw.buffer_size}
+        'buffer_size': gpaw.buffer_size,
+        'nthreads': None}
 
     def __init__(self, restart=None, ignore_bad_restart_file=False, label=None,
                  atoms=None, timer=None,
@@ -274,6 +280,15 @@ class GPAW(PAW, Calculator):
             if system_changes == ['positions']:
                 # Only positions have changed:
                 self.density.reset()
+            elif self.keep_plane_wave_basis(atoms, system_changes):
+                # Unit cell has changed.  Keep the plane-wave basis set
+                # and the wave functions:
+                self.wfs.set_cell(atoms.get_cell() / Bohr)
+                self.occupations = None
+                self.density = None
+                self.hamiltonian = None
+                self.scf = None
+                self.initialize(atoms)
             else:
                 # Drastic changes:
                 self.wfs = None
@@ -428,6 +443,11 @@ class GPAW(PAW, Calculator):
                         self.wfs = None
                     elif key2 in ['reuse_wfs_method', 'niter_fixdensity']:
                         continue
+                    elif key2 == 'wfs_extrapolation':
+                        if self.wfs:
+                            self.wfs.extrapolation = create_wfs_extrapolation(
+                                changed_parameters2[key2])
+                        continue
                     else:
                         raise TypeError('Unknown keyword argument:', key2)
                 continue
@@ -658,6 +678,8 @@ class GPAW(PAW, Calculator):
                                        cell_cv, pbc_c)
         else:
             self.wfs.set_setups(self.setups)
+            # Old wave functions are for another cell or basis:
+            self.wfs.extrapolation.reset()
 
         if not self.wfs.eigensolver:
             self.create_eigensolver(xc, nbands, mode)
@@ -684,7 +706,10 @@ class GPAW(PAW, Calculator):
         # This surely is a bug!
         self.density.initialize(self.setups, self.timer,
                                 magmom_av, par.hund)
-        self.density.set_mixer(par.mixer)
+        igrid = None
+        if self.density.collinear:
+            igrid = self.symmetry.get_irreducible_grid(self.density.gd)
+        self.density.set_mixer(par.mixer, igrid)
         if self.density.mixer.driver.name == 'dummy' or par.fixdensity:
             self.log('No density mixing\n')
         else:
@@ -828,14 +853,37 @@ class GPAW(PAW, Calculator):
             nv)
         self.log(self.scf)
 
-    def create_symmetry(self, magmom_av, cell_cv):
+    def keep_plane_wave_basis(self, atoms, system_changes):
+        """Check if the wave functions can be kept for a new unit cell.
+
+        This is possible in PW-mode with a fixed basis set, if only the
+        unit cell and the positions have changed and the symmetry is the
+        same."""
+        if (self.wfs is None or
+                self.wfs.mode != 'pw' or
+                not self.wfs.fixed_basis or
+                'cell' not in system_changes or
+                not set(system_changes) <= {'cell', 'positions'}):
+            return False
+        symmetry = self.new_symmetry(self.symmetry.id_a,
+                                     atoms.get_cell() / Bohr,
+                                     atoms.get_scaled_positions() % 1.0)
+        return (symmetry.op_scc.shape == self.symmetry.op_scc.shape and
+                (symmetry.op_scc == self.symmetry.op_scc).all() and
+                np.allclose(symmetry.ft_sc, self.symmetry.ft_sc))
+
+    def new_symmetry(self, id_a, cell_cv, spos_ac):
         symm = self.parameters.symmetry
         if symm == 'off':
             symm = {'point_group': False, 'time_reversal': False}
+        symmetry = Symmetry(id_a, cell_cv, self.atoms.pbc, **symm)
+        symmetry.analyze(spos_ac)
+        return symmetry
+
+    def create_symmetry(self, magmom_av, cell_cv):
         m_av = magmom_av.round(decimals=3)  # round off
         id_a = [id + tuple(m_v) for id, m_v in zip(self.setups.id_a, m_av)]
-        self.symmetry = Symmetry(id_a, cell_cv, self.atoms.pbc, **symm)
-        self.symmetry.analyze(self.spos_ac)
+        self.symmetry = self.new_symmetry(id_a, cell_cv, self.spos_ac)
         self.setups.set_symmetry(self.symmetry)
 
     def create_eigensolver(self, xc, nbands, mode):
@@ -940,6 +988,13 @@ class GPAW(PAW, Calculator):
                 **kwargs)
             xc.set_grid_descriptor(self.hamiltonian.xc_gd)
 
+        if dens.collinear:
+            igrid = self.symmetry.get_irreducible_grid(xc.gd)
+            xc.set_irreducible_grid(igrid)
+            if igrid is not None:
+                self.log('XC kernel evaluated on {} of {} grid points\n'
+                         .format(len(igrid), igrid.gd.N_c.prod()))
+
         self.hamiltonian.soc = self.parameters.experimental.get('soc')
         self.log(self.hamiltonian, '\n')
 
@@ -979,6 +1034,12 @@ class GPAW(PAW, Calculator):
 
         kd = self.create_kpoint_descriptor(nspins)
 
+        nthreads = self.parallel['nthreads']
+        if nthreads is not None:
+            # Threads for stencils, restriction/interpolation and FFT's:
+            _gpaw.set_num_threads(nthreads)
+            fftw.set_num_threads(nthreads)
+
         parallelization = mpi.Parallelization(self.world,
                                               nspins * kd.nibzkpts)
 
@@ -1098,6 +1159,9 @@ class GPAW(PAW, Calculator):
         else:
             self.wfs = mode(self, collinear=collinear, **wfs_kwargs)
 
+        self.wfs.extrapolation = create_wfs_extrapolation(
+            par.experimental.get('wfs_extrapolation'))
+
         self.log(self.wfs, '\n')
 
     def dry_run(self):
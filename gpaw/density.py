@@ -368,7 +368,11 @@ class Density:
         self.normalize(comp_charge)
         self.mix(comp_charge)
 
-    def set_mixer(self, mixer):
+    def set_mixer(self, mixer, igrid=None):
+        """Set density mixer.
+
+        igrid: IrreducibleGrid object
+            Mix on the symmetry-irreducible grid points only."""
         if mixer is None:
             mixer = {}
         if isinstance(mixer, dict):
@@ -376,7 +380,7 @@ class Density:
                                             self.ncomponents, **mixer)
         if not hasattr(mixer, 'mix'):
             raise ValueError('Not a mixer: %s' % mixer)
-        self.mixer = MixerWrapper(mixer, self.ncomponents, self.gd)
+        self.mixer = MixerWrapper(mixer, self.ncomponents, self.gd, igrid)
 
     def estimate_magnetic_moments(self):
         magmom_av = np.zeros_like(self.magmom_av)
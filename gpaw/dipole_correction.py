@@ -71,6 +71,10 @@ class DipoleCorrection:
     def initialize(self):
         self.poissonsolver.initialize()
 
+    def set_density_error(self, error):
+        if hasattr(self.poissonsolver, 'set_density_error'):
+            self.poissonsolver.set_density_error(error)
+
     def solve(self, pot, dens, **kwargs):
         if isinstance(dens, np.ndarray):
             # finite-diference Poisson solver:
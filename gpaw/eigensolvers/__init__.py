@@ -6,6 +6,7 @@ from gpaw.eigensolvers.rmmdiis import RMMDIIS
 from gpaw.eigensolvers.cg import CG
 from gpaw.eigensolvers.davidson import Davidson
 from gpaw.eigensolvers.direct import DirectPW
+from gpaw.eigensolvers.lobpcg import LOBPCG
 from gpaw.lcao.eigensolver import DirectLCAO
 
 
@@ -27,7 +28,8 @@ def get_eigensolver(eigensolver, mode, convergence=None):
                        'cg': CG,
                        'dav': Davidson,
                        'lcao': DirectLCAO,
-                       'direct': DirectPW
+                       'direct': DirectPW,
+                       'lobpcg': LOBPCG
                        }[name](**eigensolver)
 
     if isinstance(eigensolver, CG):
@@ -1,11 +1,13 @@
 from functools import partial
 
+from ase.units import Ha
 from ase.utils.timing import timer
 import numpy as np
+from scipy.linalg import eigh
 
 from gpaw import debug
-from gpaw.eigensolvers.eigensolver import Eigensolver
-from gpaw.matrix import matrix_matrix_multiply as mmm
+from gpaw.eigensolvers.eigensolver import Eigensolver, matrix_elements
+from gpaw.matrix import Matrix, matrix_matrix_multiply as mmm
 
 
 class DummyArray:
@@ -25,13 +27,25 @@ class Davidson(Eigensolver):
     * Subspace diagonalization
     * Calculate all residuals
     * Add preconditioned residuals to the subspace and diagonalize
+
+    With locking, only bands with a residual larger than the locking
+    threshold get a correction vector.  The subspace is then nbands plus
+    the number of unlocked bands and the Hamiltonian is only applied
+    to the correction vectors of the unlocked bands.
     """
 
-    def __init__(self, niter=2, smin=None, normalize=True):
+    def __init__(self, niter=2, smin=None, normalize=True, lock=None):
+        """Initialize Davidson eigensolver.
+
+        lock: float or None
+            Lock bands where the norm of the residual, <R|R>, is smaller
+            than this value (in eV^2).  Default is to do no locking.
+        """
         Eigensolver.__init__(self)
         self.niter = niter
         self.smin = smin
         self.normalize = normalize
+        self.lock = lock
 
         if smin is not None:
             raise NotImplementedError(
@@ -43,15 +57,24 @@ class Davidson(Eigensolver):
         self.eps_N = DummyArray()
 
     def __repr__(self):
-        return 'Davidson(niter=%d, smin=%r, normalize=%r)' % (
-            self.niter, self.smin, self.normalize)
+        return 'Davidson(niter=%d, smin=%r, normalize=%r, lock=%r)' % (
+            self.niter, self.smin, self.normalize, self.lock)
 
     def todict(self):
-        return {'name': 'dav', 'niter': self.niter}
+        dct = {'name': 'dav', 'niter': self.niter}
+        if self.lock is not None:
+            dct['lock'] = self.lock
+        return dct
 
     def initialize(self, wfs):
         Eigensolver.initialize(self, wfs)
 
+        if self.lock is not None:
+            if wfs.bd.comm.size > 1:
+                raise NotImplementedError(
+                    'Davidson with locking and band parallelization')
+            return
+
         if wfs.gd.comm.rank == 0 and wfs.bd.comm.rank == 0:
             # Allocate arrays
             B = self.nbands
@@ -71,6 +94,9 @@ class Davidson(Eigensolver):
     @timer('Davidson')
     def iterate_one_k_point(self, ham, wfs, kpt):
         """Do Davidson iterations for the kpoint"""
+        if self.lock is not None:
+            return self.iterate_one_k_point_with_locking(ham, wfs, kpt)
+
         bd = wfs.bd
         B = bd.nbands
 
@@ -169,7 +195,6 @@ class Davidson(Eigensolver):
                     if debug:
                         H_NN[np.triu_indices(2 * B, 1)] = 42.0
                         S_NN[np.triu_indices(2 * B, 1)] = 42.0
-                    from scipy.linalg import eigh
                     eps_N, H_NN[:] = eigh(H_NN, S_NN,
                                           lower=True,
                                           check_finite=debug)
@@ -204,3 +229,120 @@ class Davidson(Eigensolver):
 
         error = wfs.gd.comm.sum(error)
         return error
+
+    def iterate_one_k_point_with_locking(self, ham, wfs, kpt):
+        """Do Davidson iterations for the kpoint with locking of bands.
+
+        Residuals are only recalculated for bands that were unlocked in
+        the previous iteration.  Locked bands keep their residual norm
+        from the iteration where they were locked."""
+        B = wfs.bd.nbands
+        comm = wfs.gd.comm
+        dS = wfs.setups.dS
+        lock = self.lock / Ha**2
+
+        def integrate(a_G):
+            if wfs.collinear:
+                return np.real(wfs.integrate(a_G, a_G, global_integral=False))
+            return sum(np.real(wfs.integrate(b_G, b_G, global_integral=False))
+                       for b_G in a_G)
+
+        self.subspace_diagonalize(ham, wfs, kpt)
+
+        psit = kpt.psit
+        P = kpt.projections
+
+        Ht = partial(wfs.apply_pseudo_hamiltonian, kpt, ham)
+
+        if self.keep_htpsit:
+            R = psit.new(buf=self.Htpsit_nG)
+        else:
+            R = psit.apply(Ht)
+
+        self.calculate_residuals(kpt, wfs, ham, psit, P, kpt.eps_n, R,
+                                 P.new())
+
+        weights = self.weights(kpt)
+        pre = self.preconditioner
+        buf = psit.new(buf=wfs.work_array)
+
+        error_n = np.zeros(B)
+        # Bands for which we have residuals in the first rows of R:
+        n_x = np.arange(B)
+
+        for nit in range(self.niter):
+            e_x = np.array([integrate(R_G) for R_G in R.array[:len(n_x)]])
+            comm.sum(e_x)
+            error_n[n_x] = e_x
+            error = np.dot(weights, error_n)
+
+            # Unlocked bands and their rows in R:
+            x_a = np.arange(len(n_x))[e_x > lock]
+            n_a = n_x[x_a]
+            A = len(n_a)
+            if A == 0:
+                break
+
+            psit2 = buf.view(0, A)
+            for psit2_G, x, n in zip(psit2.array, x_a, n_a):
+                ekin = pre.calculate_kinetic_energy(psit.array[n], kpt)
+                pre(R.array[x], kpt, ekin, out=psit2_G)
+
+            P2 = P.new(nbands=A)
+            psit2.matrix_elements(wfs.pt, out=P2)
+            R2 = R.view(0, A)
+            psit2.apply(Ht, out=R2)
+
+            with self.timer('calc. matrices'):
+                dHP = ham.dH(P)
+                dSP = dS.apply(P)
+                H22 = matrix_elements(psit2, R2, P2, ham.dH(P2), comm)
+                H21 = matrix_elements(R2, psit, P2, dHP, comm)
+                S22 = matrix_elements(psit2, psit2, P2, dS.apply(P2), comm)
+                S21 = matrix_elements(psit2, psit, P2, dSP, comm)
+
+            with self.timer('diagonalize'):
+                N = B + A
+                C_NN = np.empty((N, N), psit.matrix.dtype)
+                eps_N = np.empty(N)
+                if comm.rank == 0:
+                    H_NN = np.zeros((N, N), C_NN.dtype)
+                    S_NN = np.zeros((N, N), C_NN.dtype)
+                    H_NN[:B, :B] = np.diag(kpt.eps_n)
+                    S_NN[:B, :B] = np.eye(B)
+                    H_NN[B:, B:] = H22
+                    S_NN[B:, B:] = S22
+                    H_NN[B:, :B] = H21
+                    S_NN[B:, :B] = S21
+                    H_NN[:B, B:] = H21.T.conj()
+                    S_NN[:B, B:] = S21.T.conj()
+                    eps_N[:], C_NN[:] = eigh(H_NN, S_NN)
+                comm.broadcast(eps_N, 0)
+                comm.broadcast(C_NN, 0)
+                kpt.eps_n[:] = eps_N[:B]
+
+            with self.timer('rotate_psi'):
+                M = wfs.work_matrix_nn
+                M.array[:] = C_NN[:B, :B].T
+                mmm(1.0, M, 'N', psit, 'N', 0.0, R)
+                P3 = P.new()
+                mmm(1.0, M, 'N', P, 'N', 0.0, P3)
+                M2 = Matrix(B, A, M.dtype)
+                M2.array[:] = C_NN[B:, :B].T
+                mmm(1.0, M2, 'N', psit2, 'N', 1.0, R)
+                mmm(1.0, M2, 'N', P2, 'N', 1.0, P3)
+                psit[:] = R
+                P = P3
+                kpt.projections = P
+
+            if nit < self.niter - 1:
+                # Residuals of the unlocked bands only:
+                psit2.array[:] = psit.array[n_a]
+                P2.array[:] = P.array[n_a]
+                R2 = R.view(0, A)
+                psit2.apply(Ht, out=R2)
+                self.calculate_residuals(kpt, wfs, ham, psit2, P2,
+                                         kpt.eps_n[n_a], R2, P2.new(), n_a)
+                n_x = n_a
+
+        return error
@@ -25,7 +25,9 @@ class DirectPW(Eigensolver):
         psit_nG = md.empty(dtype=complex)
         md.general_diagonalize_dc(H_GG, S_GG, psit_nG, eps_n,
                                   iu=wfs.bd.nbands)
-        kpt.eps_n[:] = eps_n[:wfs.bd.nbands]
+        myslice = wfs.bd.get_slice()
+        kpt.eps_n[:] = eps_n[:wfs.bd.nbands][myslice]
+        kpt.psit_nG[:] = psit_nG[:wfs.bd.nbands][myslice]
         wfs.pt.integrate(kpt.psit_nG, kpt.P_ani, kpt.q)
         self.timer.stop('DirectPW')
         error = 0.0
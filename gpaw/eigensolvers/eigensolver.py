@@ -2,6 +2,7 @@
 from functools import partial
 
 import numpy as np
+from ase.units import Ha
 from ase.utils.timing import timer
 
 from gpaw.matrix import matrix_matrix_multiply as mmm
@@ -14,14 +15,45 @@ def reshape(a_x, shape):
     return a_x.ravel()[:np.prod(shape)].reshape(shape)
 
 
+def single_precision(dtype):
+    """Single-precision version of a float or complex dtype."""
+    return {'d': np.float32, 'D': np.complex64}[np.dtype(dtype).char]
+
+
+def matrix_elements(a, b, Pa, Qb, comm):
+    """Calculate matrix elements <a_i|O|b_j> as an ndarray.
+
+    a and b are ArrayWaveFunctions objects and Pa are the projections of
+    a.  Qb are the projections of b with the atomic PAW correction of the
+    operator O applied, for example ham.dH(Pb) or setups.dS.apply(Pb).  The
+    pseudo part of O must already have been applied to b.  The result is
+    summed over the domain communicator comm."""
+    M = a.matrix_elements(b, cc=True, serial=True)
+    M_ij = M.array.conj()
+    M_ij += np.dot(Pa.array.reshape((len(a), -1)).conj(),
+                   Qb.array.reshape((len(b), -1)).T)
+    comm.sum(M_ij)
+    return M_ij
+
+
 class Eigensolver:
-    def __init__(self, keep_htpsit=True, blocksize=1):
+    def __init__(self, keep_htpsit=True, blocksize=1, mixed_precision=None):
+        """Base class for eigensolvers.
+
+        mixed_precision: float or None
+            Keep Htpsit_nG in single precision until the error of the
+            eigenstates is below this value (in eV^2 per valence
+            electron, same unit as the 'eigenstates' convergence
+            criterion).  After that, double precision is used.
+        """
         self.keep_htpsit = keep_htpsit
         self.initialized = False
         self.Htpsit_nG = None
         self.error = np.inf
         self.blocksize = blocksize
         self.orthonormalization_required = True
+        self.mixed_precision = mixed_precision
+        self.low_precision = False
 
     def initialize(self, wfs):
         self.timer = wfs.timer
@@ -32,12 +64,18 @@ class Eigensolver:
         self.bd = wfs.bd
         self.nbands = wfs.bd.nbands
         self.mynbands = wfs.bd.mynbands
+        self.nvalence = wfs.nvalence
+
+        # Start in single precision (if requested) every time we
+        # are (re)initialized, for example after atoms have moved:
+        self.low_precision = self.mixed_precision is not None
 
         if wfs.bd.comm.size > 1:
             self.keep_htpsit = False
 
         if self.keep_htpsit:
-            self.Htpsit_nG = np.empty_like(wfs.work_array)
+            self.Htpsit_nG = np.empty(wfs.work_array.shape,
+                                      self.work_dtype(wfs.work_array.dtype))
 
         # Preconditioner for the electronic gradients:
         self.preconditioner = wfs.make_preconditioner(self.blocksize)
@@ -90,6 +128,28 @@ class Eigensolver:
         wfs.orthonormalized = True
         self.error = self.band_comm.sum(self.kpt_comm.sum(error))
 
+        if self.low_precision:
+            error = self.error * Ha**2 / self.nvalence
+            if error < self.mixed_precision:
+                self.low_precision = False
+                if self.keep_htpsit:
+                    self.Htpsit_nG = np.empty_like(wfs.work_array)
+
+    def work_dtype(self, dtype):
+        """Data type for work arrays that may be kept in single precision."""
+        if self.low_precision:
+            return single_precision(dtype)
+        return dtype
+
+    def htpsit_storage(self, psit):
+        """Htpsit_nG as an array with the layout of psit.matrix.array.
+
+        Used when Htpsit_nG is in single precision and can therefore
+        not be wrapped in a wave-function object."""
+        dtype = self.work_dtype(psit.matrix.array.dtype)
+        return reshape(self.Htpsit_nG.ravel().view(dtype),
+                       psit.matrix.array.shape)
+
     def iterate_one_k_point(self, ham, kpt):
         """Implemented in subclasses."""
         raise NotImplementedError
@@ -173,7 +233,14 @@ class Eigensolver:
             kpt.eps_n = eps_n[wfs.bd.get_slice()]
 
         with self.timer('rotate_psi'):
-            if self.keep_htpsit:
+            if self.keep_htpsit and self.low_precision:
+                # Rotate one block at a time in double precision:
+                Htpsit_nX = self.htpsit_storage(psit)
+                for n1 in range(0, len(psit), self.blocksize):
+                    n2 = n1 + self.blocksize
+                    Htpsit_nX[n1:n2] = np.dot(H.array[n1:n2],
+                                              tmp.matrix.array)
+            elif self.keep_htpsit:
                 Htpsit = psit.new(buf=self.Htpsit_nG)
                 mmm(1.0, H, 'N', tmp, 'N', 0.0, Htpsit)
             mmm(1.0, H, 'N', psit, 'N', 0.0, tmp)
@@ -0,0 +1,243 @@
+"""Locally optimal block preconditioned conjugate gradient eigensolver."""
+from functools import partial
+
+from ase.utils.timing import timer
+import numpy as np
+from scipy.linalg import cholesky, solve_triangular, LinAlgError
+
+from gpaw import debug
+from gpaw.eigensolvers.eigensolver import Eigensolver, matrix_elements
+from gpaw.matrix import Matrix, matrix_matrix_multiply as mmm
+
+
+class LOBPCG(Eigensolver):
+    """LOBPCG eigensolver
+
+    It is expected that the trial wave functions are orthonormal
+    and the integrals of projector functions and wave functions
+    are already calculated.
+
+    Solution steps are:
+
+    * Subspace diagonalization
+    * Calculate all residuals
+    * Rayleigh-Ritz in the space spanned by the wave functions, the
+      preconditioned residuals and the previous search directions
+
+    The Hamiltonian is only applied to the preconditioned residuals.
+    Hamiltonian times wave functions and search directions are
+    updated by the same linear combinations as the vectors themselves.
+    See A. V. Knyazev, SIAM J. Sci. Comput. 23, 517 (2001).
+    """
+
+    # Smallest allowed diagonal element of the Cholesky factor of the
+    # overlap matrix scaled to unit diagonal:
+    cholesky_tolerance = 1e-4
+
+    def __init__(self, niter=3):
+        Eigensolver.__init__(self)
+        self.niter = niter
+        self.orthonormalization_required = True
+
+    def __repr__(self):
+        return 'LOBPCG(niter=%d)' % self.niter
+
+    def todict(self):
+        return {'name': 'lobpcg', 'niter': self.niter}
+
+    def initialize(self, wfs):
+        if wfs.bd.comm.size > 1:
+            raise NotImplementedError(
+                'LOBPCG eigensolver and band parallelization')
+        Eigensolver.initialize(self, wfs)
+
+    def estimate_memory(self, mem, wfs):
+        Eigensolver.estimate_memory(self, mem, wfs)
+        gridmem = wfs.bytes_per_wave_function()
+        nbands = wfs.bd.nbands
+        mem.subnode('Blocks', 5 * nbands * gridmem)
+        mem.subnode('H_3n3n', 9 * nbands * nbands * mem.itemsize[wfs.dtype])
+        mem.subnode('S_3n3n', 9 * nbands * nbands * mem.itemsize[wfs.dtype])
+
+    @timer('LOBPCG')
+    def iterate_one_k_point(self, ham, wfs, kpt):
+        """Do LOBPCG iterations for the kpoint"""
+        B = wfs.bd.nbands
+        comm = wfs.gd.comm
+        dS = wfs.setups.dS
+
+        def integrate(a_G):
+            if wfs.collinear:
+                return np.real(wfs.integrate(a_G, a_G, global_integral=False))
+            return sum(np.real(wfs.integrate(b_G, b_G, global_integral=False))
+                       for b_G in a_G)
+
+        self.subspace_diagonalize(ham, wfs, kpt)
+
+        psit = kpt.psit
+        P = kpt.projections
+
+        Ht = partial(wfs.apply_pseudo_hamiltonian, kpt, ham)
+
+        # Wave functions (X), preconditioned residuals (W) and search
+        # directions (D) with the pseudo Hamiltonian applied (HX, HW, HD):
+        if self.keep_htpsit:
+            HX = psit.new(buf=self.Htpsit_nG)
+        else:
+            HX = psit.apply(Ht)
+        W = psit.new(buf=wfs.work_array)
+        HW = psit.new()
+        D = psit.new()
+        HD = psit.new()
+        tmp = psit.new()
+        PW = P.new()
+        PD = P.new()
+        P2 = P.new()
+
+        weights = self.weights(kpt)
+        pre = self.preconditioner
+        M_i = [Matrix(B, B, psit.matrix.dtype) for i in range(3)]
+
+        for nit in range(self.niter):
+            R = HW
+            R.array[:] = HX.array
+            self.calculate_residuals(kpt, wfs, ham, psit, P, kpt.eps_n, R, P2)
+            error = np.dot(weights, [integrate(R_G) for R_G in R.array])
+
+            for psit_G, R_G, W_G in zip(psit.array, R.array, W.array):
+                ekin = pre.calculate_kinetic_energy(psit_G, kpt)
+                pre(R_G, kpt, ekin, out=W_G)
+
+            W.matrix_elements(wfs.pt, out=PW)
+            W.apply(Ht, out=HW)
+
+            with self.timer('calc. matrices'):
+                vectors = [(psit, HX, P), (W, HW, PW), (D, HD, PD)]
+                if nit == 0:
+                    # No search directions yet:
+                    del vectors[2]
+                N = B * len(vectors)
+                H_NN = np.zeros((N, N), psit.matrix.dtype)
+                S_NN = np.zeros((N, N), psit.matrix.dtype)
+                H_NN[:B, :B] = np.diag(kpt.eps_n)
+                S_NN[:B, :B] = np.eye(B)
+                dHP_i = [ham.dH(Pb) for b, Hb, Pb in vectors]
+                dSP_i = [dS.apply(Pb) for b, Hb, Pb in vectors]
+                for i in range(1, len(vectors)):
+                    a, Ha, Pa = vectors[i]
+                    for j, (b, Hb, Pb) in enumerate(vectors[:i + 1]):
+                        H_NN[i * B:(i + 1) * B, j * B:(j + 1) * B] = \
+                            matrix_elements(a, Hb, Pa, dHP_i[j], comm)
+                        S_NN[i * B:(i + 1) * B, j * B:(j + 1) * B] = \
+                            matrix_elements(a, b, Pa, dSP_i[j], comm)
+
+            with self.timer('diagonalize'):
+                eps_N, C_NN = self.rayleigh_ritz(wfs, H_NN, S_NN)
+                if C_NN is None and len(vectors) == 3:
+                    # Overlap matrix is numerically singular.  Drop the
+                    # search directions and try again:
+                    del vectors[2]
+                    N = 2 * B
+                    eps_N, C_NN = self.rayleigh_ritz(wfs, H_NN[:N, :N],
+                                                     S_NN[:N, :N])
+                if C_NN is None:
+                    # The residuals are (nearly) linearly dependent on
+                    # the wave functions.  Keep the wave functions and
+                    # stop here.  The next iteration would be the same:
+                    break
+                kpt.eps_n[:] = eps_N[:B]
+                for i, M in enumerate(M_i[:len(vectors)]):
+                    M.array[:] = C_NN[i * B:(i + 1) * B, :B].T
+
+            with self.timer('rotate_psi'):
+                # New search directions: D = W C_W + D C_D
+                MW = M_i[1]
+                MD = M_i[2] if len(vectors) == 3 else None
+
+                def combine(w, d, out):
+                    mmm(1.0, MW, 'N', w, 'N', 0.0, out)
+                    if MD is not None:
+                        mmm(1.0, MD, 'N', d, 'N', 1.0, out)
+
+                combine(HW, HD, tmp)
+                HD, tmp = tmp, HD
+                combine(W, D, tmp)
+                D, tmp = tmp, D
+                combine(PW, PD, P2)
+                PD, P2 = P2, PD
+
+                # New wave functions: X = X C_X + D
+                MX = M_i[0]
+                mmm(1.0, MX, 'N', psit, 'N', 0.0, tmp)
+                tmp.array += D.array
+                psit[:] = tmp
+                mmm(1.0, MX, 'N', HX, 'N', 0.0, tmp)
+                tmp.array += HD.array
+                HX[:] = tmp
+                mmm(1.0, MX, 'N', P, 'N', 0.0, P2)
+                P.array[:] = P2.array + PD.array
+
+        error = comm.sum(error)
+        return error
+
+    def rayleigh_ritz(self, wfs, H_NN, S_NN):
+        """Solve generalized eigenvalue problem for the lowest eigenpairs.
+
+        The lower triangles of H_NN and S_NN must be filled in.  The
+        overlap matrix is scaled to unit diagonal and Cholesky
+        decomposed on the master of the domain (like in
+        Matrix.invcholesky()).  The resulting standard eigenvalue
+        problem is distributed to the BLACS grid and solved with
+        ScaLapack if it is configured.  Returns (None, None) if the
+        overlap matrix is not (numerically) positive definite."""
+        comm = wfs.gd.comm
+        N = len(H_NN)
+        ok = np.zeros(1, int)
+        A = Matrix(N, N, H_NN.dtype)
+        A.array[:] = 0.0
+        if comm.rank == 0:
+            d_N = np.diag(S_NN).real**-0.5
+            S_NN = S_NN * np.outer(d_N, d_N)
+            H_NN = H_NN * np.outer(d_N, d_N)
+            try:
+                L_NN = cholesky(S_NN, lower=True, check_finite=debug)
+            except LinAlgError:
+                pass
+            else:
+                # Also give up if the overlap is badly conditioned:
+                ok[0] = abs(L_NN.diagonal()).min() > self.cholesky_tolerance
+            if ok[0]:
+                H_NN = np.tril(H_NN) + np.tril(H_NN, -1).T.conj()
+                # L^-1 H L^-H:
+                X_NN = solve_triangular(L_NN, H_NN, lower=True)
+                A.array[:] = solve_triangular(L_NN, X_NN.T.conj(),
+                                              lower=True).conj()
+        comm.broadcast(ok, 0)
+        if not ok[0]:
+            return None, None
+
+        if comm.size > 1:
+            # Only the domain master has the matrix.  Matrix.eigh()
+            # will sum it there, diagonalize and broadcast the result:
+            A.comm = comm
+            A.state = 'a sum is needed'
+
+        slcomm, r, c, b = wfs.scalapack_parameters
+        if r == c == 1:
+            slcomm = None
+        else:
+            ranks = [rbd * wfs.gd.comm.size + rgd
+                     for rgd in range(wfs.gd.comm.size)
+                     for rbd in range(wfs.bd.comm.size)]
+            slcomm = slcomm.new_communicator(ranks)
+        # Complex conjugate before diagonalizing:
+        eps_N = A.eigh(cc=True, scalapack=(slcomm, r, c, b))
+        # A.array[n, :] now contains the n'th eigenvector
+
+        C_NN = np.empty((N, N), H_NN.dtype)
+        if comm.rank == 0:
+            # C = D L^-H Y, where D is the scaling and Y the eigenvectors:
+            C_NN[:] = d_N[:, np.newaxis] * solve_triangular(
+                L_NN, A.array.T, lower=True, trans='C')
+        comm.broadcast(C_NN, 0)
+        return eps_N, C_NN
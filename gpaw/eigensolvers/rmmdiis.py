@@ -2,6 +2,7 @@
 from functools import partial
 
 import numpy as np
+from ase.units import Ha
 
 from gpaw.utilities.blas import axpy
 from gpaw.eigensolvers.eigensolver import Eigensolver
@@ -22,7 +23,8 @@ class RMMDIIS(Eigensolver):
     * Orthonormalization"""
 
     def __init__(self, keep_htpsit=True, blocksize=None, niter=3, rtol=1e-16,
-                 limit_lambda=False, use_rayleigh=False, trial_step=0.1):
+                 limit_lambda=False, use_rayleigh=False, trial_step=0.1,
+                 mixed_precision=None, lock=None):
         """Initialize RMM-DIIS eigensolver.
 
         Parameters:
@@ -33,10 +35,23 @@ class RMMDIIS(Eigensolver):
             'absolute':True/False limit the absolute value
             'upper':float upper limit for lambda
             'lower':float lower limit for lambda
+        mixed_precision: float or None
+            Store the residuals of all bands and the DIIS history of
+            wave functions and residuals in single precision until the
+            error of the eigenstates is below this value (eV^2 per
+            valence electron).  Each block of bands is converted to
+            double precision before it is used.  Only used with
+            keep_htpsit=True.
+        lock: float or None
+            Do not update bands with a squared norm of the residual
+            below this value (in eV^2).  The value is divided by the
+            occupation of the band (at most by a factor of 100), so
+            that empty bands are locked earlier.  Only used with
+            keep_htpsit=True.  Default is to do no locking.
 
         """
 
-        Eigensolver.__init__(self, keep_htpsit, blocksize)
+        Eigensolver.__init__(self, keep_htpsit, blocksize, mixed_precision)
         self.niter = niter
         self.rtol = rtol
         self.limit_lambda = limit_lambda
@@ -45,10 +60,20 @@ class RMMDIIS(Eigensolver):
             1 / 0
             self.blocksize = 1
         self.trial_step = trial_step
+        self.lock = lock
         self.first = True
 
+        # Number of band updates done and skipped in the last iteration:
+        self.nupdated = 0
+        self.nlocked = 0
+
     def todict(self):
-        return {'name': 'rmm-diis', 'niter': self.niter}
+        dct = {'name': 'rmm-diis', 'niter': self.niter}
+        if self.mixed_precision is not None:
+            dct['mixed_precision'] = self.mixed_precision
+        if self.lock is not None:
+            dct['lock'] = self.lock
+        return dct
 
     def initialize(self, wfs):
         if self.blocksize is None:
@@ -60,6 +85,11 @@ class RMMDIIS(Eigensolver):
                 self.blocksize = 10
         Eigensolver.initialize(self, wfs)
 
+    def iterate(self, ham, wfs):
+        self.nupdated = 0
+        self.nlocked = 0
+        Eigensolver.iterate(self, ham, wfs)
+
     def iterate_one_k_point(self, ham, wfs, kpt):
         """Do a single RMM-DIIS iteration for the kpoint"""
 
@@ -72,21 +102,30 @@ class RMMDIIS(Eigensolver):
         # dMP = P.new()
         # M_nn = wfs.work_matrix_nn
         # dS = wfs.setups.dS
-        R = psit.new(buf=self.Htpsit_nG)
-
-        self.timer.start('RMM-DIIS')
-        if self.keep_htpsit:
-            with self.timer('Calculate residuals'):
-                self.calculate_residuals(kpt, wfs, ham, psit, P, kpt.eps_n,
-                                         R, P2)
 
         def integrate(a_G, b_G):
             return np.real(wfs.integrate(a_G, b_G, global_integral=False))
 
         comm = wfs.gd.comm
 
+        # Residuals of all bands in single precision:
+        low = self.keep_htpsit and self.low_precision
+
+        self.timer.start('RMM-DIIS')
+        if low:
+            R_nX = self.htpsit_storage(psit)
+            with self.timer('Calculate residuals'):
+                error_n = self.calculate_residuals_in_blocks(kpt, wfs, ham,
+                                                             psit, P, R_nX)
+        else:
+            R = psit.new(buf=self.Htpsit_nG)
+            if self.keep_htpsit:
+                with self.timer('Calculate residuals'):
+                    self.calculate_residuals(kpt, wfs, ham, psit, P,
+                                             kpt.eps_n, R, P2)
+
         B = self.blocksize
-        dR = R.new(dist=None, nbands=B)
+        dR = psit.new(dist=None, nbands=B)
         dpsit = dR.new()
         P = P.new(bcomm=None, nbands=B)
         P2 = P.new()
@@ -94,42 +133,80 @@ class RMMDIIS(Eigensolver):
 
         # Arrays needed for DIIS step
         if self.niter > 1:
-            psit_diis_nxG = wfs.empty(B * self.niter, q=kpt.q)
-            R_diis_nxG = wfs.empty(B * self.niter, q=kpt.q)
+            shape = (B * self.niter,) + psit.array.shape[1:]
+            dtype = self.work_dtype(psit.array.dtype)
+            psit_diis_nxG = np.empty(shape, dtype)
+            R_diis_nxG = np.empty(shape, dtype)
 
         weights = self.weights(kpt)
 
         Ht = partial(wfs.apply_pseudo_hamiltonian, kpt, ham)
 
-        error = 0.0
-        for n1 in range(0, wfs.bd.mynbands, B):
-            n2 = n1 + B
-            if n2 > wfs.bd.mynbands:
-                n2 = wfs.bd.mynbands
-                B = n2 - n1
+        mynbands = wfs.bd.mynbands
+        locking = self.lock is not None and self.keep_htpsit
+        if locking:
+            # All residuals are known.  Find the unlocked bands:
+            with self.timer('Lock bands'):
+                if not low:
+                    error_n = np.array([integrate(R_G, R_G)
+                                        for R_G in R.array])
+                comm.sum(error_n)
+                error = np.dot(weights, error_n)
+                active_n = np.nonzero(error_n > self.lock_tolerances(kpt))[0]
+        else:
+            error = 0.0
+            active_n = np.arange(mynbands)
+
+        self.nupdated += len(active_n)
+        self.nlocked += mynbands - len(active_n)
+
+        # Pack the unlocked bands into work arrays if some are locked:
+        packed = len(active_n) < mynbands
+        if packed:
+            psit_work = psit.new(dist=None, nbands=B)
+        if packed or low:
+            R_work = psit.new(dist=None, nbands=B)
+
+        for i1 in range(0, len(active_n), B):
+            n_x = active_n[i1:i1 + B]
+            if len(n_x) < B:
+                B = len(n_x)
                 P = P.new(nbands=B)
                 P2 = P.new()
                 dR = dR.new(nbands=B, dist=None)
                 dpsit = dR.new()
 
-            n_x = np.arange(n1, n2)
-            psitb = psit.view(n1, n2)
+            n1 = n_x[0]
+            n2 = n1 + B
+            if packed:
+                psitb = psit_work.view(0, B)
+                psitb.array[:] = psit.array[n_x]
+            else:
+                psitb = psit.view(n1, n2)
 
             with self.timer('Calculate residuals'):
-                Rb = R.view(n1, n2)
+                if low:
+                    Rb = R_work.view(0, B)
+                    Rb.matrix.array[:] = R_nX[n_x]
+                elif packed:
+                    Rb = R_work.view(0, B)
+                    Rb.array[:] = R.array[n_x]
+                else:
+                    Rb = R.view(n1, n2)
                 if not self.keep_htpsit:
                     psitb.apply(Ht, out=Rb)
                     psitb.matrix_elements(wfs.pt, out=P)
                     self.calculate_residuals(kpt, wfs, ham, psitb,
                                              P, kpt.eps_n[n_x], Rb, P2, n_x)
 
-            errors_x[:] = 0.0
-            for n in range(n1, n2):
-                weight = weights[n]
-                errors_x[n - n1] = weight * integrate(Rb.array[n - n1],
-                                                      Rb.array[n - n1])
-            comm.sum(errors_x)
-            error += np.sum(errors_x)
+            if not locking:
+                errors_x[:] = 0.0
+                for n in range(n1, n2):
+                    weight = weights[n]
+                    errors_x[n - n1] = weight * integrate(Rb.array[n - n1],
+                                                          Rb.array[n - n1])
+                comm.sum(errors_x)
+                error += np.sum(errors_x)
 
             # Insert first vectors and residuals for DIIS step
             if self.niter > 1:
@@ -208,12 +285,16 @@ class RMMDIIS(Eigensolver):
                     for ib in range(B):
                         istart = ib * self.niter
                         iend = istart + nit + 1
+                        psit_iG = psit_diis_nxG[istart:iend]
+                        R_iG = R_diis_nxG[istart:iend]
+                        if R_iG.dtype != Rb.array.dtype:
+                            # History is in single precision:
+                            psit_iG = psit_iG.astype(Rb.array.dtype)
+                            R_iG = R_iG.astype(Rb.array.dtype)
 
                         # Residual matrix
                         self.timer.start('Construct matrix')
-                        R_nn = wfs.integrate(R_diis_nxG[istart:iend],
-                                             R_diis_nxG[istart:iend],
-                                             global_integral=True)
+                        R_nn = wfs.integrate(R_iG, R_iG, global_integral=True)
 
                         # Full matrix
                         A_nn = -np.ones((nit + 2, nit + 2), wfs.dtype)
@@ -226,18 +307,11 @@ class RMMDIIS(Eigensolver):
                             alpha_i = np.linalg.solve(A_nn, x_n)[:-1]
 
                         self.timer.start('Update trial vectors')
-                        psitb.array[ib] = alpha_i[nit] * psit_diis_nxG[istart +
-                                                                       nit]
-                        Rb.array[ib] = alpha_i[nit] * R_diis_nxG[istart + nit]
+                        psitb.array[ib] = alpha_i[nit] * psit_iG[nit]
+                        Rb.array[ib] = alpha_i[nit] * R_iG[nit]
                         for i in range(nit):
-                            # axpy(alpha_i[i], psit_diis_nxG[istart + i],
-                            #      psit_diis_nxG[istart + nit])
-                            # axpy(alpha_i[i], R_diis_nxG[istart + i],
-                            #      R_diis_nxG[istart + nit])
-                            axpy(alpha_i[i], psit_diis_nxG[istart + i],
-                                 psitb.array[ib])
-                            axpy(alpha_i[i], R_diis_nxG[istart + i],
-                                 Rb.array[ib])
+                            axpy(alpha_i[i], psit_iG[i], psitb.array[ib])
+                            axpy(alpha_i[i], R_iG[i], Rb.array[ib])
                         self.timer.stop('Update trial vectors')
 
                 if nit < self.niter - 1:
@@ -268,11 +342,48 @@ class RMMDIIS(Eigensolver):
                 lam_x[:] = self.trial_step
             for lam, psit_G, dpsit_G in zip(lam_x, psitb.array, dpsit.array):
                 axpy(lam, dpsit_G, psit_G)  # psit_G += lam * dpsit_G
+            if packed:
+                psit.array[n_x] = psitb.array
             self.timer.stop('Update psi')
 
         self.timer.stop('RMM-DIIS')
         return error
 
+    def calculate_residuals_in_blocks(self, kpt, wfs, ham, psit, P, R_nX):
+        """Calculate residuals of all bands in single precision.
+
+        On entry, R_nX contains Ht*psit in single precision.  Each block
+        is converted to double precision, the residual is calculated and
+        stored back in R_nX.  Returns the squared norms of the residuals
+        (not summed over domains)."""
+        error_n = np.empty(len(psit))
+        for n1 in range(0, len(psit), self.blocksize):
+            n2 = min(n1 + self.blocksize, len(psit))
+            psitb = psit.view(n1, n2)
+            Rb = psitb.new(dist=None)
+            Rb.matrix.array[:] = R_nX[n1:n2]
+            Pb = P.new(bcomm=None, nbands=n2 - n1)
+            Pb.array[:] = P.array[n1:n2]
+            self.calculate_residuals(kpt, wfs, ham, psitb, Pb,
+                                     kpt.eps_n[n1:n2], Rb, Pb.new(),
+                                     np.arange(n1, n2))
+            R_nX[n1:n2] = Rb.matrix.array
+            for n, R_G in enumerate(Rb.array, n1):
+                error_n[n] = np.real(wfs.integrate(R_G, R_G,
+                                                   global_integral=False))
+        return error_n
+
+    def lock_tolerances(self, kpt):
+        """Locking tolerance for the squared norm of each residual.
+
+        Fully occupied bands use self.lock.  The tolerance grows with
+        decreasing occupation up to a factor of 100."""
+        tol = self.lock / Ha**2
+        if kpt.f_n is None:
+            return np.ones(self.bd.mynbands) * tol
+        occ_n = kpt.f_n / kpt.weight
+        return tol / np.clip(occ_n, 0.01, 1.0)
+
     def __repr__(self):
         repr_string = 'RMM-DIIS eigensolver\n'
         repr_string += '       keep_htpsit: %s\n' % self.keep_htpsit
@@ -280,5 +391,7 @@ class RMMDIIS(Eigensolver):
         repr_string += '       Threshold for DIIS: %5.1e\n' % self.rtol
         repr_string += '       Limit lambda: %s\n' % self.limit_lambda
         repr_string += '       use_rayleigh: %s\n' % self.use_rayleigh
-        repr_string += '       trial_step: %s' % self.trial_step
+        repr_string += '       trial_step: %s\n' % self.trial_step
+        repr_string += '       mixed_precision: %s\n' % self.mixed_precision
+        repr_string += '       lock: %s' % self.lock
         return repr_string
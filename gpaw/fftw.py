@@ -1,5 +1,6 @@
 """Python wrapper for FFTW3 library."""
 
+import atexit
 import os
 
 import numpy as np
@@ -50,16 +51,99 @@ def get_efficient_fft_size(N, n=1):
     return N
 
 
+# Process-wide cache of FFTW plans.  FFTW plans are tied to the arrays
+# they were created for, but they can be executed on other arrays with the
+# same shape, strides and alignment using the new-array execute functions.
+_plans = {}
+
+# Has the in-memory wisdom grown since it was imported?
+_new_wisdom = False
+
+# Number of threads used for new plans:
+_nthreads = 1
+
+
+def set_num_threads(nthreads):
+    """Use nthreads threads for plans created from now on.
+
+    Does nothing if the FFTW library was compiled without threads."""
+    global _nthreads
+    if lib is None or not hasattr(lib, 'fftw_plan_with_nthreads'):
+        return
+    lib.fftw_plan_with_nthreads(nthreads)
+    _nthreads = nthreads
+
+
+def alignment_of(a):
+    """Alignment of array as seen by FFTW."""
+    if hasattr(lib, 'fftw_alignment_of'):
+        return lib.fftw_alignment_of(a.ctypes.data)
+    return a.ctypes.data % 16
+
+
+def plan_key(in_R, out_R, sign, flags):
+    """Key for plan cache.
+
+    Two plans with same key can be used interchangeably."""
+    return (in_R.shape, in_R.strides, in_R.dtype.char, alignment_of(in_R),
+            out_R.shape, out_R.strides, out_R.dtype.char, alignment_of(out_R),
+            in_R.ctypes.data == out_R.ctypes.data,
+            sign, flags, _nthreads)
+
+
+def embedding(a):
+    """Layout of 4-d array for fftw_plan_many_dft() and friends.
+
+    Returns the embedding (physical size of each of the last three
+    dimensions), the stride between elements and the distance between
+    the individual 3-d arrays (all in units of elements)."""
+    s0, s1, s2, s3 = (s // a.itemsize for s in a.strides)
+    embed = np.array([a.shape[1], s1 // s2, s2 // s3], dtype=np.intc)
+    return embed, s3, s0
+
+
+def clear_plan_cache():
+    """Destroy all cached FFTW plans."""
+    for plan in _plans.values():
+        lib.fftw_destroy_plan(plan)
+    _plans.clear()
+
+
 class FFTWPlan:
-    """FFTW3 3d transform."""
+    """FFTW3 3d transform.
+
+    If in_R and out_R are 4-d arrays, the first dimension runs over
+    several 3-d transforms that are done in one go.  Plans are cached,
+    so creating a new plan for arrays of the same shape, strides and
+    alignment as seen before is very cheap.  Note that
+    planning with anything other than ESTIMATE will overwrite the
+    contents of in_R and out_R unless the plan comes from the cache."""
     def __init__(self, in_R, out_R, sign, flags=MEASURE):
+        global _new_wisdom
+        self.in_R = in_R
+        self.out_R = out_R
+
         if in_R.dtype == float:
             assert sign == -1
+            self._execute = lib.fftw_execute_dft_r2c
+        elif out_R.dtype == float:
+            assert sign == 1
+            self._execute = lib.fftw_execute_dft_c2r
+        else:
+            self._execute = lib.fftw_execute_dft
+
+        key = plan_key(in_R, out_R, sign, flags)
+        self.plan = _plans.get(key)
+        if self.plan is not None:
+            return
+
+        if in_R.ndim == 4:
+            self.plan = self.plan_many(in_R, out_R, sign, flags)
+        elif in_R.dtype == float:
             n0, n1, n2 = in_R.shape
             self.plan = lib.fftw_plan_dft_r2c_3d(n0, n1, n2,
                                                  in_R, out_R, flags)
         elif out_R.dtype == float:
-            assert sign == 1
             n0, n1, n2 = out_R.shape
             self.plan = lib.fftw_plan_dft_c2r_3d(n0, n1, n2,
                                                  in_R, out_R, flags)
@@ -67,14 +151,34 @@ class FFTWPlan:
             n0, n1, n2 = in_R.shape
             self.plan = lib.fftw_plan_dft_3d(n0, n1, n2,
                                              in_R, out_R, sign, flags)
+        _plans[key] = self.plan
+        if flags != ESTIMATE:
+            _new_wisdom = True
 
-    def execute(self):
-        lib.fftw_execute(self.plan)
+    @staticmethod
+    def plan_many(in_xR, out_xR, sign, flags):
+        """Plan for several 3-d transforms at once.
 
-    def __del__(self, lib=lib):
-        # We keep a reference to lib so that it's not GC'ed before we have
-        # cleaned up.
-        lib.fftw_destroy_plan(self.plan)
+        The first dimension of in_xR and out_xR runs over the
+        individual transforms."""
+        assert len(in_xR) == len(out_xR)
+        if in_xR.dtype == float:
+            n_c = np.array(in_xR.shape[1:], dtype=np.intc)
+        else:
+            n_c = np.array(out_xR.shape[1:], dtype=np.intc)
+        inembed, istride, idist = embedding(in_xR)
+        onembed, ostride, odist = embedding(out_xR)
+        args = (3, n_c, len(in_xR),
+                in_xR.ctypes.data, inembed, istride, idist,
+                out_xR.ctypes.data, onembed, ostride, odist)
+        if in_xR.dtype == float:
+            return lib.fftw_plan_many_dft_r2c(*args + (flags,))
+        if out_xR.dtype == float:
+            return lib.fftw_plan_many_dft_c2r(*args + (flags,))
+        return lib.fftw_plan_many_dft(*args + (sign, flags))
+
+    def execute(self):
+        self._execute(self.plan, self.in_R.ctypes.data, self.out_R.ctypes.data)
 
 
 class NumpyFFTPlan:
@@ -85,16 +189,51 @@ class NumpyFFTPlan:
         self.sign = sign
 
     def execute(self):
+        axes = (-3, -2, -1)
         if self.in_R.dtype == float:
-            self.out_R[:] = np.fft.rfftn(self.in_R)
+            self.out_R[:] = np.fft.rfftn(self.in_R, axes=axes)
         elif self.out_R.dtype == float:
-            self.out_R[:] = np.fft.irfftn(self.in_R, self.out_R.shape)
-            self.out_R *= self.out_R.size
+            shape = self.out_R.shape[-3:]
+            self.out_R[:] = np.fft.irfftn(self.in_R, shape, axes=axes)
+            self.out_R *= np.prod(shape)
         elif self.sign == 1:
-            self.out_R[:] = np.fft.ifftn(self.in_R, self.out_R.shape)
-            self.out_R *= self.out_R.size
+            shape = self.out_R.shape[-3:]
+            self.out_R[:] = np.fft.ifftn(self.in_R, shape, axes=axes)
+            self.out_R *= np.prod(shape)
         else:
-            self.out_R[:] = np.fft.fftn(self.in_R)
+            self.out_R[:] = np.fft.fftn(self.in_R, axes=axes)
+
+
+def import_wisdom(filename):
+    """Read FFTW wisdom from file.
+
+    Returns True if the wisdom was imported."""
+    if lib is None or not hasattr(lib, 'fftw_import_wisdom_from_filename'):
+        return False
+    return bool(lib.fftw_import_wisdom_from_filename(filename.encode()))
+
+
+def export_wisdom(filename):
+    """Write accumulated FFTW wisdom to file.
+
+    The file is written to a temporary file first and then renamed so that
+    several processes can share the same wisdom file."""
+    if lib is None or not hasattr(lib, 'fftw_export_wisdom_to_filename'):
+        return False
+    tmpfilename = '{}.{}.tmp'.format(filename, os.getpid())
+    if not lib.fftw_export_wisdom_to_filename(tmpfilename.encode()):
+        return False
+    os.rename(tmpfilename, filename)
+    return True
+
+
+def _export_wisdom_at_exit(filename):
+    from gpaw.mpi import rank
+    if _new_wisdom and rank == 0:
+        try:
+            export_wisdom(filename)
+        except OSError:
+            pass
 
 
 def empty(shape, dtype=float):
@@ -113,8 +252,11 @@ if lib is None:
 else:
     FFTPlan = FFTWPlan
 
-    lib.fftw_execute.argtypes = [ctypes.c_void_p]
     lib.fftw_destroy_plan.argtypes = [ctypes.c_void_p]
+    for name in ['fftw_execute_dft',
+                 'fftw_execute_dft_r2c',
+                 'fftw_execute_dft_c2r']:
+        getattr(lib, name).argtypes = [ctypes.c_void_p] * 3
 
     lib.fftw_plan_dft_3d.argtypes = [
         ctypes.c_int, ctypes.c_int, ctypes.c_int,
@@ -137,6 +279,18 @@ else:
         ctypes.c_uint]
     lib.fftw_plan_dft_c2r_3d.restype = ctypes.c_void_p
 
+    intarray = np.ctypeslib.ndpointer(dtype=np.intc, ndim=1)
+    many = [ctypes.c_int, intarray, ctypes.c_int,
+            ctypes.c_void_p, intarray, ctypes.c_int, ctypes.c_int,
+            ctypes.c_void_p, intarray, ctypes.c_int, ctypes.c_int]
+    lib.fftw_plan_many_dft.argtypes = many + [ctypes.c_int, ctypes.c_uint]
+    lib.fftw_plan_many_dft_r2c.argtypes = many + [ctypes.c_uint]
+    lib.fftw_plan_many_dft_c2r.argtypes = many + [ctypes.c_uint]
+    for name in ['fftw_plan_many_dft',
+                 'fftw_plan_many_dft_r2c',
+                 'fftw_plan_many_dft_c2r']:
+        getattr(lib, name).restype = ctypes.c_void_p
+
     try:
         lib.fftw_plan_with_nthreads.argtypes = [ctypes.c_int]
     except AttributeError:
@@ -144,3 +298,22 @@ else:
     else:
         if not lib.fftw_init_threads():
             raise RuntimeError('fftw_init_threads failed')
+
+    try:
+        lib.fftw_alignment_of.argtypes = [ctypes.c_void_p]
+    except AttributeError:
+        pass
+
+    try:
+        lib.fftw_import_wisdom_from_filename.argtypes = [ctypes.c_char_p]
+        lib.fftw_export_wisdom_to_filename.argtypes = [ctypes.c_char_p]
+    except AttributeError:
+        pass  # MKL or old FFTW without wisdom files
+    else:
+        wisdom = os.environ.get('GPAW_FFTW_WISDOM')
+        if wisdom:
+            if os.path.isfile(wisdom):
+                import_wisdom(wisdom)
+            atexit.register(_export_wisdom_at_exit, wisdom)
+
+    atexit.register(clear_plan_cache)
@@ -619,6 +619,8 @@ class RealSpaceHamiltonian(Hamiltonian):
         self.timer.stop('XC 3D grid')
 
         self.timer.start('Poisson')
+        if hasattr(self.poisson, 'set_density_error'):
+            self.poisson.set_density_error(dens.error)
         # npoisson is the number of iterations:
         self.npoisson = self.poisson.solve(self.vHt_g, dens.rhot_g,
                                            charge=-dens.charge,
@@ -271,7 +271,7 @@ class HGHSetupData:
         n = len(self.vbar_g)
         return self.rgd.spline(self.vbar_g, self.rgd.r_g[n - 1], l=0)
 
-    def build(self, xcfunc, lmax, basis, filter=None):
+    def build(self, xcfunc, lmax, basis, filter=None, world=None):
         if basis is None:
             basis = self.create_basis_functions()
         setup = PseudoPotential(self, basis)
@@ -1,3 +1,8 @@
+import os
+
+import numpy as np
+
+
 def Reader(filename):
     import ase.io.ulm as ulm
     try:
@@ -13,3 +18,130 @@ def Writer(filename, world, mode='w', tag='GPAW'):
     if world.rank == 0:
         return ulm.Writer(filename, mode=mode, tag=tag)
     return ulm.DummyWriter()
+
+
+def contiguous_runs(shape, start, bshape):
+    """Contiguous pieces of a block of a C-ordered array.
+
+    The block starts at index start and has shape bshape.  Yields
+    (position, n) tuples, where position is the flat index of the first
+    element of a piece and n is the number of elements in the piece.
+    The pieces come in the same order as the elements of the block."""
+    nd = len(shape)
+    j = nd - 1
+    n = bshape[j]
+    while j > 0 and bshape[j] == shape[j]:
+        # Full last axes: merge with the axis before
+        j -= 1
+        n *= bshape[j]
+    stride_i = [int(np.prod(shape[i + 1:])) for i in range(nd)]
+    pos0 = sum(start[i] * stride_i[i] for i in range(j, nd))
+    for x in np.ndindex(*bshape[:j]):
+        yield (pos0 + sum((start[i] + x[i]) * stride_i[i] for i in range(j)),
+               n)
+
+
+def reserve_ulm_array(writer, name, shape, dtype):
+    """Add array to ULM writer and leave room for its data in the file.
+
+    Returns the offset of the data in the file.  The data must be written
+    there by other means, because the writer will consider the array done.
+
+    This relies on the layout used by ase.io.ulm.Writer: add_array()
+    aligns the file position, records it as the offset of the array, and
+    fill() writes the data from there."""
+    writer.add_array(name, shape, dtype)
+    offset = writer.fd.tell()
+    assert writer.data[name + '.']['ndarray'][2] == offset, \
+        'unexpected ULM layout'
+    assert offset % 8 == 0, 'unexpected ULM layout'
+    nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    writer.fd.seek(offset + nbytes)
+    # No data will come through fill():
+    writer.nmissing = 0
+    return offset
+
+
+def parallel_array_writer(writer, world, name, shape, dtype):
+    """Add array to writer and let all ranks write their own parts of it.
+
+    The master adds the array to the ULM file and leaves room for it.
+    Returns a ParallelArrayWriter object on all ranks, or None (also on
+    all ranks) if this is not possible (single process or not writing
+    to a named file).  In that case, nothing has been done and the
+    array must be written in the usual way by the master."""
+    if world.size == 1:
+        return None
+    import ase.io.ulm as ulm
+    from gpaw.mpi import broadcast
+    info = None
+    if world.rank == 0:
+        filename = None
+        if isinstance(writer, ulm.Writer):
+            filename = getattr(writer.fd, 'name', None)
+        if isinstance(filename, str) and os.path.isfile(filename):
+            # All ranks fill in the data:
+            offset = reserve_ulm_array(writer, name, shape, dtype)
+            info = (filename, offset)
+        else:
+            info = (None, 0)
+    filename, offset = broadcast(info, 0, world)
+    if filename is None:
+        return None
+    return ParallelArrayWriter(filename, offset, shape, dtype, world)
+
+
+class ParallelArrayWriter:
+    """Write blocks of an array directly into a file.
+
+    Every rank opens the file and writes its own blocks at the right
+    offsets, so nothing is gathered on the master."""
+
+    def __init__(self, filename, offset, shape, dtype, comm):
+        self.offset = offset
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.comm = comm
+        self.fd = open(filename, 'r+b')
+
+    def write(self, start, a):
+        """Write a to the block starting at index start.
+
+        The shape of a must match the last dimensions of the block."""
+        a = np.ascontiguousarray(a, self.dtype)
+        bshape = (1,) * (len(self.shape) - a.ndim) + a.shape
+        a = a.ravel()
+        i = 0
+        for pos, n in contiguous_runs(self.shape, start, bshape):
+            self.fd.seek(self.offset + pos * self.dtype.itemsize)
+            self.fd.write(a[i:i + n].tobytes())
+            i += n
+
+    def close(self):
+        """Close file and wait for all ranks to finish."""
+        self.fd.close()
+        self.comm.barrier()
+
+
+def can_read_blocks(array):
+    """Check if read_block() can be used for an array in a ULM file."""
+    import ase.io.ulm as ulm
+    return (isinstance(array, ulm.NDArrayReader) and
+            array.hasfileno and
+            array.little_endian == np.little_endian)
+
+
+def read_block(array, start, bshape):
+    """Read block of shape bshape starting at index start.
+
+    Only the elements of the block are read from the file."""
+    a = np.empty(bshape, array.dtype)
+    a_x = a.reshape(-1)
+    i = 0
+    for pos, n in contiguous_runs(array.shape, start, bshape):
+        array.fd.seek(array.offset + pos * array.itemsize)
+        a_x[i:i + n] = np.fromfile(array.fd, array.dtype, n)
+        i += n
+    if array.scale != 1.0:
+        a *= array.scale
+    return a
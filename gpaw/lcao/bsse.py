@@ -102,7 +102,7 @@ class GhostSetupData:
         self.symbol = symbol + '.ghost'
         self.Z = atomic_numbers[symbol]
 
-    def build(self, xcfunc, lmax, basis, filter=None):
+    def build(self, xcfunc, lmax, basis, filter=None, world=None):
         if basis is None:
             raise ValueError('Loading partial waves not supported right now')
         setup = GhostSetup(basis, self)
@@ -5,12 +5,15 @@
 See Kresse, Phys. Rev. B 54, 11169 (1996)
 """
 
+from math import pi
+
 import numpy as np
-from numpy.fft import fftn, ifftn
+from numpy.fft import fftn, ifftn, rfftn, irfftn, fftfreq
 
 from gpaw.utilities.blas import axpy
 from gpaw.fd_operators import FDOperator
 from gpaw.utilities.tools import construct_reciprocal
+from gpaw.symmetry import IrreducibleGrid
 
 """About mixing-related classes.
 
@@ -33,6 +36,7 @@ relevant objects are instantiated automatically."""
 
 class BaseMixer:
     name = 'pulay'
+    irreducible_grid = True  # can mix on symmetry-irreducible grid points
 
     """Pulay density mixer."""
     def __init__(self, beta, nmaxold, weight):
@@ -57,10 +61,18 @@ class BaseMixer:
 
     def initialize_metric(self, gd):
         self.gd = gd
+        reduced = isinstance(gd, IrreducibleGrid)
 
-        if self.weight == 1:
+        if self.weight == 1 and not reduced:
             self.metric = None
 
+        elif self.weight == 1:
+            # Weight the irreducible points by the size of their orbits:
+            def metric(R_x, mR_x):
+                np.multiply(R_x, gd.weight_x, mR_x)
+            self.metric = metric
+            self.mR_G = gd.empty()
+
         else:
             a = 0.125 * (self.weight + 7)
             b = 0.0625 * (self.weight - 1)
@@ -81,7 +93,9 @@ class BaseMixer:
                                       (1, 1, 1), (1, 1, -1), (1, -1, 1),  # d
                                       (-1, 1, 1), (1, -1, -1), (-1, -1, 1),
                                       (-1, 1, -1), (-1, -1, -1)],
-                                     gd, float).apply
+                                     gd.gd if reduced else gd, float).apply
+            if reduced:
+                self.metric = gd.operator(self.metric)
             self.mR_G = gd.empty()
 
     def reset(self):
@@ -226,6 +240,7 @@ class ReciprocalMetric:
 
 class FFTBaseMixer(BaseMixer):
     name = 'fft'
+    irreducible_grid = False
 
     """Mix the density in Fourier space"""
     def __init__(self, beta, nmaxold, weight):
@@ -252,8 +267,229 @@ class FFTBaseMixer(BaseMixer):
         return dNt
 
 
+class KerkerBaseMixer(BaseMixer):
+    name = 'kerker'
+    irreducible_grid = False
+
+    """Pulay mixer with Kerker preconditioning.
+
+    The residuals are preconditioned in reciprocal space with
+    q^2 / (q^2 + q_0^2), where the screening wave vector q_0 is estimated
+    from the response of the output density to the changes in the
+    input density at the longest wave lengths.  This gives strong
+    damping for metals.  For insulators (q_0^2 smaller than the
+    smallest q^2 on the grid), q_0 = 0 is used, so there is no damping.
+    The initial guess for q_0 is the Thomas-Fermi wave vector.
+
+    Only the plane-wave components with the smallest q (a fraction
+    history_fraction of them) are stored in the history and used for
+    the Pulay extrapolation.  The remaining components are mixed
+    linearly.  The mixing parameter is adjusted between iterations:
+    it is increased while the residual decreases and halved when the
+    residual grows."""
+
+    # Fraction of plane-wave components kept in the history:
+    history_fraction = 0.125
+    # Limits for the adaptive mixing parameter relative to beta:
+    beta_range = (0.25, 20.0)
+
+    def __init__(self, beta, nmaxold, weight):
+        BaseMixer.__init__(self, beta, nmaxold, weight)
+        self.beta0 = beta
+        self.q02 = None  # squared screening wave vector
+        self.metallic = None
+
+    def initialize_metric(self, gd):
+        self.gd = gd
+
+        if gd.comm.size > 1:
+            raise NotImplementedError(
+                'Kerker mixer and domain decomposition')
+
+        n_c = gd.n_c
+        icell_cv = 2 * pi * np.linalg.inv(gd.h_cv * n_c[:, np.newaxis]).T
+        m_Qc = np.indices((n_c[0], n_c[1], n_c[2] // 2 + 1)).transpose(
+            (1, 2, 3, 0))
+        for c in range(2):
+            m_Qc[..., c] = (fftfreq(n_c[c]) * n_c[c])[m_Qc[..., c]]
+        q2_Q = (np.dot(m_Qc, icell_cv)**2).sum(-1)
+        self.q2_Q = q2_Q
+
+        # Components with 0 < m_2 < n_2 / 2 represent two plane waves:
+        w_Q = np.ones_like(q2_Q)
+        w_Q[..., 1:(n_c[2] + 1) // 2] = 2.0
+
+        # Compressed history: the components with the smallest q
+        q2_q = q2_Q.ravel()
+        # (q and -q must both be included):
+        n = max(int(self.history_fraction * len(q2_q)), 2)
+        q2max = np.sort(q2_q)[n - 1] * (1 + 1e-10)
+        self.index_x = np.nonzero(q2_q <= q2max)[0]
+        q2_x = q2_q[self.index_x]
+        self.q2min = q2_x[q2_x > 0].min()
+        q2_x = np.maximum(q2_x, self.q2min)
+        self.metric_x = w_Q.ravel()[self.index_x] * (
+            1.0 + (self.weight - 1) * self.q2min / q2_x)
+
+        # Components used for estimating the screening:
+        q2_x = q2_q[self.index_x]
+        self.shell_x = (q2_x > 0) & (q2_x < 10 * self.q2min)
+
+    def reset(self):
+        self.nt_G = None  # last input density
+        self.nt_ix = []  # compressed input densities
+        self.R_ix = []  # compressed residuals
+        self.A_ii = np.zeros((0, 0))
+        self.D_iap = []
+        self.dD_iap = []
+        self.beta = self.beta0
+        self.dNt = None  # last charge sloshing
+
+    def estimate_memory(self, mem, gd):
+        gridbytes = gd.bytecount()
+        mem.subnode('nt_G', gridbytes)
+        mem.subnode('nt_ix, R_ix',
+                    2 * self.nmaxold * self.history_fraction * gridbytes)
+
+    def thomas_fermi(self, nt_G):
+        """Squared Thomas-Fermi wave vector for the average density."""
+        n_G = nt_G.clip(0.0, None)
+        n = self.gd.integrate(n_G**2) / max(self.gd.integrate(n_G), 1e-10)
+        return 4 / pi * (3 * pi**2 * n)**(1.0 / 3)
+
+    def estimate_screening(self):
+        """Estimate q_0^2 from the last two steps.
+
+        For each of the smallest q's, the dielectric function is
+        estimated from the change in input density dn(q) and the change
+        in residual dR(q) as eps(q) = -dR(q) / dn(q).  A fit
+        to eps(q) = 1 + a + q_0^2 / q^2 gives the squared screening wave
+        vector for a metal and q_0 = 0 for an insulator, where
+        1 + a is the macroscopic dielectric constant."""
+        dn_x = self.nt_ix[-1] - self.nt_ix[-2]
+        dn2 = np.dot(self.metric_x, abs(dn_x)**2)
+        n2 = np.dot(self.metric_x, abs(self.nt_ix[-1])**2)
+        s = self.shell_x & (dn_x != 0.0)
+        dn_x = dn_x[s]
+        dR_x = (self.R_ix[-1] - self.R_ix[-2])[s]
+        w_x = self.metric_x[s] * abs(dn_x)**2
+        if w_x.sum() <= max(1e-3 * dn2, 1e-20 * n2):
+            # Too little information about long wave lengths
+            return
+        y_x = -(dR_x / dn_x).real - 1.0
+        u_x = 1.0 / self.q2_Q.ravel()[self.index_x][s]
+        B_ij = np.array([[w_x.sum(), np.dot(w_x, u_x)],
+                         [np.dot(w_x, u_x), np.dot(w_x, u_x**2)]])
+        b_i = np.array([np.dot(w_x, y_x), np.dot(w_x, u_x * y_x)])
+        if np.linalg.det(B_ij) <= 1e-10 * B_ij[0, 0] * B_ij[1, 1]:
+            # Only one q: assume metal
+            q02 = b_i[1] / B_ij[1, 1]
+        else:
+            a, q02 = np.linalg.solve(B_ij, b_i)
+        q02 = min(max(q02, 0.0), self.q2_Q.max())
+        self.metallic = q02 > self.q2min
+        # No screening at long wave lengths in an insulator:
+        self.q02 = q02 if self.metallic else 0.0
+
+    def describe_screening(self):
+        if self.metallic is None:
+            return 'Kerker screening: Thomas-Fermi estimate'
+        if self.metallic:
+            return ('Kerker screening: metallic, q0 = %.3f 1/Bohr' %
+                    self.q02**0.5)
+        return 'Kerker screening: insulating, no preconditioning'
+
+    def mix_single_density(self, nt_G, D_ap):
+        if self.q02 is None:
+            self.q02 = self.thomas_fermi(nt_G)
+
+        if self.nt_G is None:
+            self.nt_G = nt_G.copy()
+            self.nt_ix.append(rfftn(nt_G).ravel()[self.index_x])
+            self.D_iap.append([D_p.copy() for D_p in D_ap])
+            return np.inf
+
+        iold = len(self.nt_ix)
+        if iold > self.nmaxold:
+            # Throw away too old stuff:
+            del self.nt_ix[0]
+            del self.R_ix[0]
+            del self.D_iap[0]
+            del self.dD_iap[0]
+            iold = self.nmaxold
+
+        # Residual:
+        R_G = nt_G - self.nt_G
+        dNt = self.calculate_charge_sloshing(R_G)
+        R_Q = rfftn(R_G)
+        R_x = R_Q.ravel()[self.index_x]
+        self.R_ix.append(R_x)
+        self.dD_iap.append([D_p - D_ip
+                            for D_p, D_ip in zip(D_ap, self.D_iap[-1])])
+
+        # Update matrix:
+        A_ii = np.zeros((iold, iold))
+        i2 = iold - 1
+        mR_x = self.metric_x * R_x
+        for i1, R_1x in enumerate(self.R_ix):
+            a = np.vdot(R_1x, mR_x).real
+            A_ii[i1, i2] = a
+            A_ii[i2, i1] = a
+        A_ii[:i2, :i2] = self.A_ii[-i2:, -i2:]
+        self.A_ii = A_ii
+
+        # Adapt mixing parameter and screening:
+        bmin, bmax = self.beta_range
+        if self.dNt is not None:
+            if dNt < self.dNt:
+                self.beta = min(1.2 * self.beta, bmax * self.beta0, 1.0)
+            else:
+                self.beta = max(0.5 * self.beta, bmin * self.beta0)
+        self.dNt = dNt
+        if len(self.R_ix) >= 2:
+            self.estimate_screening()
+
+        try:
+            alpha_i = np.linalg.solve(A_ii, np.ones(iold))
+        except np.linalg.LinAlgError:
+            alpha_i = np.zeros(iold)
+            alpha_i[-1] = 1.0
+        else:
+            alpha_i /= alpha_i.sum()
+
+        # Kerker preconditioner:
+        P_Q = self.q2_Q / np.maximum(self.q2_Q + self.q02, 1e-20)
+        P_Q[0, 0, 0] = 1.0
+        beta = self.beta
+
+        # Linear mixing for all components ...
+        dn_Q = beta * P_Q * R_Q
+        # ... and Pulay mixing for the compressed history:
+        P_x = P_Q.ravel()[self.index_x]
+        dn_x = -self.nt_ix[-1]
+        for alpha, nt_x, R_x in zip(alpha_i, self.nt_ix, self.R_ix):
+            dn_x = dn_x + alpha * (nt_x + beta * P_x * R_x)
+        dn_Q.ravel()[self.index_x] = dn_x
+
+        nt_G[:] = self.nt_G + irfftn(dn_Q, nt_G.shape)
+
+        for D_p in D_ap:
+            D_p[:] = 0.0
+        for alpha, D_ap1, dD_ap1 in zip(alpha_i, self.D_iap, self.dD_iap):
+            for D_p, D_ip, dD_ip in zip(D_ap, D_ap1, dD_ap1):
+                axpy(alpha, D_ip, D_p)
+                axpy(alpha * beta, dD_ip, D_p)
+
+        # Store new input density (and new atomic density matrices):
+        self.nt_G[:] = nt_G
+        self.nt_ix.append(self.nt_ix[-1] + dn_x)
+        self.D_iap.append([D_p.copy() for D_p in D_ap])
+        return dNt
+
+
 class BroydenBaseMixer:
     name = 'broyden'
+    irreducible_grid = True
 
     def __init__(self, beta, nmaxold, weight):
         self.verbose = False
@@ -534,7 +770,7 @@ class SpinDifferenceMixerDriver:
 # Dictionaries to get mixers by name:
 _backends = {}
 _methods = {}
-for cls in [FFTBaseMixer, BroydenBaseMixer, BaseMixer]:
+for cls in [FFTBaseMixer, BroydenBaseMixer, BaseMixer, KerkerBaseMixer]:
     _backends[cls.name] = cls
 for cls in [SeparateSpinMixerDriver, SpinSumMixerDriver, SpinSumMixerDriver2,
             SpinDifferenceMixerDriver, DummyMixer]:
@@ -585,7 +821,12 @@ def get_mixer_from_keywords(pbc, nspins, **mixerkwargs):
 
 # This is the only object which will be used by Density, sod the others
 class MixerWrapper:
-    def __init__(self, driver, nspins, gd):
+    def __init__(self, driver, nspins, gd, igrid=None):
+        """Wrap mixer driver.
+
+        If igrid (an IrreducibleGrid object) is given and the backend
+        supports it, the densities are mixed on the symmetry-irreducible
+        grid points only."""
         self.driver = driver
 
         self.beta = driver.beta
@@ -593,14 +834,28 @@ class MixerWrapper:
         self.weight = driver.weight
         assert self.weight is not None, driver
 
+        basemixerclass = getattr(driver, 'basemixerclass', None)
+        if not getattr(basemixerclass, 'irreducible_grid', False):
+            igrid = None
+        self.igrid = igrid
+        if igrid is not None:
+            gd = igrid
+
         self.basemixers = self.driver.get_basemixers(nspins)
         for basemixer in self.basemixers:
             basemixer.initialize_metric(gd)
 
     def mix(self, nt_sG, D_asp):
-        return self.driver.mix(self.basemixers, nt_sG, D_asp)
+        if self.igrid is None:
+            return self.driver.mix(self.basemixers, nt_sG, D_asp)
+        nt_sx = self.igrid.reduce(nt_sG)
+        dNt = self.driver.mix(self.basemixers, nt_sx, D_asp)
+        self.igrid.expand(nt_sx, nt_sG)
+        return dNt
 
     def estimate_memory(self, mem, gd):
+        if self.igrid is not None:
+            gd = self.igrid
         for i, basemixer in enumerate(self.basemixers):
             basemixer.estimate_memory(mem.subnode('Mixer %d' % i), gd)
 
@@ -618,6 +873,12 @@ class MixerWrapper:
             lines.append('No damping of long wave oscillations')
         else:
             lines.append('Damping of long wave oscillations: %g' % self.weight)
+        if self.igrid is not None:
+            lines.append('Mixing on %d irreducible grid points' %
+                         len(self.igrid))
+        for basemixer in self.basemixers:
+            if isinstance(basemixer, KerkerBaseMixer):
+                lines.append(basemixer.describe_screening())
         return '\n  '.join(lines)
 
 
@@ -644,3 +905,7 @@ BroydenMixer = _definemixerfunc('separate', 'broyden')
 BroydenMixerSum = _definemixerfunc('sum', 'broyden')
 BroydenMixerSum2 = _definemixerfunc('sum2', 'broyden')
 BroydenMixerDif = _definemixerfunc('difference', 'broyden')
+KerkerMixer = _definemixerfunc('separate', 'kerker')
+KerkerMixerSum = _definemixerfunc('sum', 'kerker')
+KerkerMixerSum2 = _definemixerfunc('sum2', 'kerker')
+KerkerMixerDif = _definemixerfunc('difference', 'kerker')
@@ -4,10 +4,12 @@
 """Occupation number objects."""
 
 import warnings
+from itertools import permutations
 from math import pi
 
 import numpy as np
 from ase.units import Hartree
+from scipy.sparse import csr_matrix
 
 from gpaw.utilities import erf
 from gpaw.mpi import serial_comm
@@ -18,6 +20,8 @@ def create_occupation_number_object(name, **kwargs):
         return FermiDirac(**kwargs)
     if name == 'methfessel-paxton':
         return MethfesselPaxton(**kwargs)
+    if name == 'tetrahedron-method':
+        return TetrahedronMethod(**kwargs)
     if name == 'orbital-free':
         return TFOccupations()
     raise ValueError('Unknown occupation number object name: ' + name)
@@ -140,6 +144,108 @@ def findroot(func, x, tol=1e-10):
         niter += 1
 
 
+def tetrahedra(N_c, icell_cv):
+    """Divide a Monkhorst-Pack grid of k-points into tetrahedra.
+
+    Each subcell of the grid is split into six tetrahedra that share
+    the shortest of the four main diagonals of the subcell (P. E.
+    Bloechl et al., Phys. Rev. B 49, 16223 (1994)).  Returns indices
+    into the flattened grid for the four corners of all tetrahedra."""
+    # Start-corners of the four main diagonals:
+    s_ic = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1]])
+    d_ic = 1 - 2 * s_ic
+    length_i = (np.dot(d_ic / N_c, icell_cv)**2).sum(1)
+    i = length_i.argmin()
+    s_c = s_ic[i]
+    d_c = d_ic[i]
+
+    # Walk along the three axes in all possible orders:
+    corners_tic = np.empty((6, 4, 3), int)
+    for t, axes in enumerate(permutations(range(3))):
+        corner_c = s_c.copy()
+        corners_tic[t, 0] = corner_c
+        for i, c in enumerate(axes):
+            corner_c[c] += d_c[c]
+            corners_tic[t, i + 1] = corner_c
+
+    i_gc = np.indices(N_c).reshape((3, -1)).T
+    i_gtic = (i_gc[:, np.newaxis, np.newaxis] + corners_tic) % N_c
+    i_tic = i_gtic.reshape((-1, 4, 3))
+    return np.ravel_multi_index(tuple(i_tic.transpose((2, 0, 1))), N_c)
+
+
+def tetrahedron_weights(e_xi, fermilevel, bloechl=True):
+    """Integration weights for the corners of tetrahedra.
+
+    The energies e_xi of the four corners must be sorted.  Returns the
+    weights (adding up to one for a completely filled tetrahedron) and
+    the density of states at the Fermi level.  With bloechl=True,
+    Bloechl's correction for the curvature of the bands is included.
+    The correction does not change the number of electrons."""
+    x = fermilevel
+    w_xi = np.zeros_like(e_xi)
+    dos_x = np.zeros(len(e_xi))
+    e1, e2, e3, e4 = e_xi.T
+    w_xi[x >= e4] = 0.25
+    m1 = (e1 <= x) & (x < e2)
+    m2 = (e2 <= x) & (x < e3)
+    m3 = (e3 <= x) & (x < e4)
+
+    m = m1
+    if m.any():
+        e1, e2, e3, e4 = e_xi[m].T
+        e21 = e2 - e1
+        e31 = e3 - e1
+        e41 = e4 - e1
+        x1 = x - e1
+        C = 0.25 * x1**3 / (e21 * e31 * e41)
+        w_xi[m] = C[:, np.newaxis] * np.array(
+            [4 - x1 * (1 / e21 + 1 / e31 + 1 / e41),
+             x1 / e21, x1 / e31, x1 / e41]).T
+        dos_x[m] = 3 * x1**2 / (e21 * e31 * e41)
+
+    m = m2
+    if m.any():
+        e1, e2, e3, e4 = e_xi[m].T
+        e31 = e3 - e1
+        e32 = e3 - e2
+        e41 = e4 - e1
+        e42 = e4 - e2
+        x1 = x - e1
+        x2 = x - e2
+        x3 = e3 - x
+        x4 = e4 - x
+        C1 = 0.25 * x1**2 / (e41 * e31)
+        C2 = 0.25 * x1 * x2 * x3 / (e41 * e32 * e31)
+        C3 = 0.25 * x2**2 * x4 / (e42 * e32 * e41)
+        w_xi[m] = np.array(
+            [C1 + (C1 + C2) * x3 / e31 + (C1 + C2 + C3) * x4 / e41,
+             C1 + C2 + C3 + (C2 + C3) * x3 / e32 + C3 * x4 / e42,
+             (C1 + C2) * x1 / e31 + (C2 + C3) * x2 / e32,
+             (C1 + C2 + C3) * x1 / e41 + C3 * x2 / e42]).T
+        dos_x[m] = (3 * (e2 - e1) + 6 * x2 -
+                    3 * (e31 + e42) * x2**2 / (e32 * e42)) / (e31 * e41)
+
+    m = m3
+    if m.any():
+        e1, e2, e3, e4 = e_xi[m].T
+        e41 = e4 - e1
+        e42 = e4 - e2
+        e43 = e4 - e3
+        x4 = e4 - x
+        C = 0.25 * x4**3 / (e41 * e42 * e43)
+        w_xi[m] = 0.25 - C[:, np.newaxis] * np.array(
+            [x4 / e41, x4 / e42, x4 / e43,
+             4 - x4 * (1 / e41 + 1 / e42 + 1 / e43)]).T
+        dos_x[m] = 3 * x4**2 / (e41 * e42 * e43)
+
+    if bloechl:
+        w_xi += (dos_x[:, np.newaxis] / 40 *
+                 (e_xi.sum(1)[:, np.newaxis] - 4 * e_xi))
+
+    return w_xi, dos_x
+
+
 class OccupationNumbers:
     """Base class for all occupation number objects."""
     def __init__(self, fixmagmom):
@@ -511,29 +617,77 @@ class SmoothDistribution(ZeroKelvin):
         return wfs.kptband_comm.sum(fermilevel)
 
     def find_fermi_level(self, wfs, ne, fermilevel, spins={0, 1, None}):
-        niter = 0
-
         x = self.fermilevel
         if not np.isfinite(x):
             x = self.guess_fermi_level(wfs)
 
+        kpts = [kpt for kpt in wfs.kpt_u if kpt.s in spins]
+        if kpts:
+            eps_un = np.array([kpt.eps_n for kpt in kpts])
+        else:
+            eps_un = np.empty((0, 0))
+        weight_u = np.array([kpt.weight for kpt in kpts])
+        sign_u = np.array([0.0 if kpt.s is None else 1 - 2 * kpt.s
+                           for kpt in kpts])
+
+        fermilevel, f_un, magmom, e_entropy = self.find_fermi_level_arrays(
+            eps_un, weight_u, sign_u, ne, x, wfs.kptband_comm)
+
+        for kpt, f_n in zip(kpts, f_un):
+            kpt.f_n[:] = f_n
+
+        return fermilevel, magmom, e_entropy
+
+    def find_fermi_level_arrays(self, eps_un, weight_u, sign_u, ne, x,
+                                comm=serial_comm):
+        """Find Fermi level for eigenvalues stored in one array.
+
+        eps_un: ndarray
+            Eigenvalues for all k-points and spins on this process.
+        weight_u: ndarray
+            Weights of k-points (including spin-degeneracy).
+        sign_u: ndarray
+            1.0 for spin-up, -1.0 for spin-down and 0.0 for spin-paired.
+        ne: float
+            Number of electrons.
+        x: float
+            Initial guess for the Fermi level.
+        comm: communicator
+            Contributions from all processes of comm are added up.  This
+            is the only communication needed in each iteration.
+
+        Returns Fermi level, occupation numbers, magnetic moment and
+        entropy (-ST)."""
+
+        f_un = np.empty_like(eps_un)
         data = np.empty(4)
 
-        def f(x, data=data):
-            data[:] = 0.0
-            for kpt in wfs.kpt_u:
-                if kpt.s in spins:
-                    data += self.distribution(kpt, x)
-            wfs.kptband_comm.sum(data)
+        def f(x):
+            data[:] = self.distributions(eps_un, weight_u, sign_u, x, f_un)
+            comm.sum(data)
             n, dnde = data[:2]
-            dn = n - ne
-            return dn, dnde
-
-        fermilevel, niter = findroot(f, x)
+            return n - ne, dnde
 
-        self.niter = niter
+        fermilevel, self.niter = findroot(f, x)
         magmom, e_entropy = data[2:]
-        return fermilevel, magmom, e_entropy
+        return fermilevel, f_un, magmom, e_entropy
+
+    def distribution(self, kpt, fermilevel):
+        """Calculate occupation numbers for a single k-point.
+
+        Returns number of electrons, derivative with respect to the
+        Fermi level, magnetic moment and entropy (-ST)."""
+        sign = 1 - kpt.s * 2 if kpt.s is not None else 0.0
+        f_n = kpt.f_n.reshape((1, -1))
+        return self.distributions(kpt.eps_n.reshape((1, -1)),
+                                  np.array([kpt.weight]), np.array([sign]),
+                                  fermilevel, f_n)
+
+    def distributions(self, eps_un, weight_u, sign_u, fermilevel, f_un):
+        """Vectorized version of distribution().
+
+        Occupation numbers for all k-points are written to f_un."""
+        raise NotImplementedError
 
 
 class FermiDirac(SmoothDistribution):
@@ -549,20 +703,21 @@ class FermiDirac(SmoothDistribution):
         s = '  Fermi-Dirac: width={0:.4f} eV\n'.format(self.width * Hartree)
         return SmoothDistribution.__str__(self) + s
 
-    def distribution(self, kpt, fermilevel):
-        x = (kpt.eps_n - fermilevel) / self.width
+    def distributions(self, eps_un, weight_u, sign_u, fermilevel, f_un):
+        w_un = weight_u[:, np.newaxis]
+        x = (eps_un - fermilevel) / self.width
         x = x.clip(-100, 100)
         y = np.exp(x)
         z = y + 1.0
-        kpt.f_n[:] = kpt.weight / z
-        n = kpt.f_n.sum()
-        dnde = (n - (kpt.f_n**2).sum() / kpt.weight) / self.width
+        np.divide(w_un, z, f_un)
+        n_u = f_un.sum(axis=1)
+        n = n_u.sum()
+        dnde = (n - np.dot(weight_u**-1, (f_un**2).sum(axis=1))) / self.width
         y *= x
         y /= z
         y -= np.log(z)
-        e_entropy = kpt.weight * y.sum() * self.width
-        sign = 1 - kpt.s * 2 if kpt.s is not None else 0.0
-        return np.array([n, dnde, n * sign, e_entropy])
+        e_entropy = np.dot(weight_u, y.sum(axis=1)) * self.width
+        return np.array([n, dnde, np.dot(n_u, sign_u), e_entropy])
 
     def extrapolate_energy_to_zero_width(self, E):
         return E - 0.5 * self.e_entropy
@@ -584,29 +739,29 @@ class MethfesselPaxton(SmoothDistribution):
             self.width * Hartree, self.order)
         return SmoothDistribution.__str__(self) + s
 
-    def distribution(self, kpt, fermilevel):
-        x = (kpt.eps_n - fermilevel) / self.width
+    def distributions(self, eps_un, weight_u, sign_u, fermilevel, f_un):
+        x = (eps_un - fermilevel) / self.width
         x = x.clip(-100, 100)
+        g = np.exp(-x**2)
 
         z = 0.5 * (1 - erf(x))
         for i in range(self.order):
             z += (self.coff_function(i + 1) *
-                  self.hermite_poly(2 * i + 1, x) * np.exp(-x**2))
-        kpt.f_n[:] = kpt.weight * z
-        n = kpt.f_n.sum()
+                  self.hermite_poly(2 * i + 1, x) * g)
+        np.multiply(weight_u[:, np.newaxis], z, f_un)
+        n_u = f_un.sum(axis=1)
+        n = n_u.sum()
 
-        dnde = 1 / np.sqrt(pi) * np.exp(-x**2)
+        dnde = 1 / np.sqrt(pi) * g
         for i in range(self.order):
             dnde += (self.coff_function(i + 1) *
-                     self.hermite_poly(2 * i + 2, x) * np.exp(-x**2))
-        dnde = dnde.sum()
-        dnde *= kpt.weight / self.width
+                     self.hermite_poly(2 * i + 2, x) * g)
+        dnde = np.dot(weight_u, dnde.sum(axis=1)) / self.width
         e_entropy = (0.5 * self.coff_function(self.order) *
-                     self.hermite_poly(2 * self.order, x) * np.exp(-x**2))
-        e_entropy = -kpt.weight * e_entropy.sum() * self.width
+                     self.hermite_poly(2 * self.order, x) * g)
+        e_entropy = -np.dot(weight_u, e_entropy.sum(axis=1)) * self.width
 
-        sign = 1 - kpt.s * 2
-        return np.array([n, dnde, n * sign, e_entropy])
+        return np.array([n, dnde, np.dot(n_u, sign_u), e_entropy])
 
     def coff_function(self, n):
         return (-1)**n / (np.product(np.arange(1, n + 1)) *
@@ -625,6 +780,189 @@ class MethfesselPaxton(SmoothDistribution):
         return E - self.e_entropy / (self.order + 2)
 
 
+class TetrahedronMethod(ZeroKelvin):
+    def __init__(self, bloechl=True, fixmagmom=False):
+        """Linear tetrahedron method.
+
+        The full Monkhorst-Pack grid of k-points is divided into
+        tetrahedra and the eigenvalues are interpolated linearly inside
+        each tetrahedron.  There is no smearing and no entropy term, so
+        the total energy does not need to be extrapolated.
+
+        bloechl: bool
+            Include Bloechl's correction for the curvature of the
+            bands.
+        fixmagmom: bool
+            Fix spin moment calculations.  A separate Fermi level for
+            spin up and down electrons is found.
+        """
+
+        ZeroKelvin.__init__(self, fixmagmom)
+        self.bloechl = bloechl
+        self.kd = None
+        self.ibz_ti = None  # IBZ indices of corners of tetrahedra
+
+    def todict(self):
+        dct = {'name': 'tetrahedron-method', 'bloechl': self.bloechl}
+        if self.fixmagmom:
+            dct['fixmagmom'] = True
+        return dct
+
+    def __str__(self):
+        s = 'Occupation numbers:\n'
+        if self.fixmagmom:
+            s += '  Fixed magnetic moment\n'
+        if self.fixed_fermilevel:
+            s += '  Fixed Fermi level\n'
+        s += '  Tetrahedron method'
+        if self.bloechl:
+            s += ' with Bloechl corrections'
+        return s + '\n'
+
+    def initialize_tetrahedra(self, wfs):
+        kd = wfs.kd
+        if not kd.monkhorst or kd.refine_info is not None:
+            raise ValueError('The tetrahedron method needs a Monkhorst-Pack '
+                             'grid of k-points')
+        N_c = kd.N_c
+        i_kc = np.around((kd.bzk_kc - kd.offset_c) * N_c +
+                         0.5 * (N_c - 1)).astype(int) % N_c
+        g_k = np.ravel_multi_index(tuple(i_kc.T), N_c)
+        ibz_g = np.empty(N_c.prod(), int)
+        ibz_g[g_k] = kd.bz2ibz_k
+        self.ibz_ti = ibz_g[tetrahedra(N_c, wfs.gd.icell_cv)]
+        self.kd = kd
+
+    def calculate_occupation_numbers(self, wfs):
+        if self.kd is not wfs.kd:
+            self.initialize_tetrahedra(wfs)
+
+        kd = wfs.kd
+        bd = wfs.bd
+
+        eps_un = [bd.collect(kpt.eps_n) for kpt in wfs.kpt_u]
+        if bd.comm.rank == 0:
+            eps_skn = kd.collect(np.array(eps_un), broadcast=True)
+            f_skn = self.occupy_tetrahedra(wfs, eps_skn)
+        else:
+            f_skn = None
+            self.fermilevel = np.nan
+
+        for kpt in wfs.kpt_u:
+            if f_skn is None:
+                f_n = None
+            else:
+                f_n = f_skn[kpt.s or 0, kpt.k]
+            bd.distribute(f_n, kpt.f_n)
+
+        self.e_entropy = 0.0
+
+    def occupy_tetrahedra(self, wfs, eps_skn):
+        """Calculate occupation numbers from all eigenvalues.
+
+        Returns occupation numbers including k-point weights and
+        spin-degeneracy and sets Fermi level and magnetic moment."""
+        nspins, nibzkpts, nbands = eps_skn.shape
+        T = len(self.ibz_ti)
+        degeneracy = 2.0 / nspins if wfs.collinear else 1.0
+
+        # Matrix that adds up the weights of all corners belonging to
+        # the same IBZ k-point:
+        M_kx = csr_matrix((np.ones(4 * T) * degeneracy / T,
+                           (self.ibz_ti.ravel(), np.arange(4 * T))),
+                          shape=(nibzkpts, 4 * T))
+
+        # Sorted energies of corners:
+        e_sxi = []
+        order_sxi = []
+        for eps_kn in eps_skn:
+            e_xi = eps_kn[self.ibz_ti].transpose((0, 2, 1)).reshape((-1, 4))
+            order_xi = e_xi.argsort(axis=1)
+            x_x = np.arange(len(e_xi))[:, np.newaxis]
+            e_sxi.append(e_xi[x_x, order_xi])
+            order_sxi.append(order_xi)
+
+        if self.fixmagmom and nspins == 2:
+            groups = [([0], 0.5 * (self.nvalence + self.magmom)),
+                      ([1], 0.5 * (self.nvalence - self.magmom))]
+        else:
+            groups = [(range(nspins), self.nvalence)]
+
+        f_skn = np.empty_like(eps_skn)
+        fermilevels = []
+        for spins, ne in groups:
+            fermilevel, w_sxi = self.find_fermi_level(
+                [e_sxi[s] for s in spins], ne * T / degeneracy)
+            fermilevels.append(fermilevel)
+
+            for s, w_xi in zip(spins, w_sxi):
+                x_x = np.arange(len(w_xi))[:, np.newaxis]
+                w_xi[x_x, order_sxi[s]] = w_xi.copy()
+                w_ix = w_xi.reshape((T, nbands, 4)).transpose((0, 2, 1))
+                f_skn[s] = M_kx.dot(w_ix.reshape((4 * T, nbands)))
+
+        if len(fermilevels) == 2:
+            self.fermilevel = np.mean(fermilevels)
+            self.split = fermilevels[0] - fermilevels[1]
+        else:
+            self.fermilevel = fermilevels[0]
+
+        if nspins == 2:
+            self.magmom = f_skn[0].sum() - f_skn[1].sum()
+        else:
+            self.magmom = 0.0
+
+        return f_skn
+
+    def find_fermi_level(self, e_sxi, ne, tol=1e-10):
+        """Find Fermi level by bisection.
+
+        ne is the number of electrons in all tetrahedra counting each
+        tetrahedron with a weight of one.  The number of electrons can
+        jump at energies where all four corners of a tetrahedron are
+        degenerate (typically symmetry-equivalent k-points).  In that
+        case, the weights on either side of the jump are interpolated
+        to get the right number of electrons.  Returns the Fermi level
+        and the weights of the corners."""
+
+        def weights(x, bloechl):
+            return [tetrahedron_weights(e_xi, x, bloechl)[0]
+                    for e_xi in e_sxi]
+
+        def count(x):
+            return sum(w_xi.sum() for w_xi in weights(x, False))
+
+        xmin = min(e_xi[:, 0].min() for e_xi in e_sxi)
+        xmax = max(e_xi[:, 3].max() for e_xi in e_sxi)
+        nmin = 0.0
+        nmax = count(xmax)
+        if nmax < ne - tol:
+            raise ValueError('Not enough bands for the tetrahedron method')
+
+        self.niter = 0
+        while True:
+            x = 0.5 * (xmin + xmax)
+            if x == xmin or x == xmax:
+                break
+            n = count(x)
+            if abs(n - ne) < tol:
+                return x, weights(x, self.bloechl)
+            if n < ne:
+                xmin = x
+                nmin = n
+            else:
+                xmax = x
+                nmax = n
+            self.niter += 1
+
+        # Interpolate across the jump:
+        a = (ne - nmin) / (nmax - nmin)
+        w_sxi = [(1 - a) * wmin_xi + a * wmax_xi
+                 for wmin_xi, wmax_xi in zip(weights(xmin, self.bloechl),
+                                             weights(xmax, self.bloechl))]
+        return x, w_sxi
+
+
 class FixedOccupations(ZeroKelvin):
     def __init__(self, occupation):
         self.occupation = np.array(occupation)
@@ -180,13 +180,13 @@ class PAW:
         self.density.fixed = fixed
 
     def diagonalize_full_hamiltonian(self, nbands=None, ecut=None, scalapack=None,
-                                     expert=False):
+                                     expert=False, outofcore=None):
         if not self.initialized:
             self.initialize()
         nbands = self.wfs.diagonalize_full_hamiltonian(
             self.hamiltonian, self.atoms,
             self.occupations, self.log,
-            nbands, ecut, scalapack, expert)
+            nbands, ecut, scalapack, expert, outofcore)
         self.parameters.nbands = nbands
 
     def get_number_of_bands(self):
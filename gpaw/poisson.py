@@ -59,6 +59,9 @@ def create_poisson_solver(name='fast', **kwargs):
         return FDPoissonSolverWrapper(**kwargs)
     elif name == 'fast':
         return FastPoissonSolver(**kwargs)
+    elif name == 'free':
+        from gpaw.poisson_freeboundary import FreeBoundaryPoissonSolver
+        return FreeBoundaryPoissonSolver(**kwargs)
     elif name == 'ExtraVacuumPoissonSolver':
         from gpaw.poisson_extravacuum import ExtraVacuumPoissonSolver
         return ExtraVacuumPoissonSolver(**kwargs)
@@ -96,16 +99,25 @@ class _PoissonSolver(object):
     def get_description(self):
         return self.__class__.__name__
 
+    def set_density_error(self, error):
+        """Tell the solver how well converged the density is.
+
+        Only used by solvers with an adaptive tolerance."""
+        pass
+
     def estimate_memory(self, mem):
         raise NotImplementedError()
 
 
 class BasePoissonSolver(_PoissonSolver):
-    def __init__(self, eps=None, remove_moment=None, use_charge_center=False):
+    def __init__(self, eps=None, remove_moment=None, use_charge_center=False,
+                 adaptive_eps=None):
         self.gd = None
         self.remove_moment = remove_moment
         self.use_charge_center = use_charge_center
         self.eps = eps
+        self.adaptive_eps = adaptive_eps
+        self.density_error = None
 
     def todict(self):
         d = {'name': 'basepoisson'}
@@ -115,8 +127,26 @@ class BasePoissonSolver(_PoissonSolver):
             d['remove_moment'] = self.remove_moment
         if self.use_charge_center:
             d['use_charge_center'] = self.use_charge_center
+        if self.adaptive_eps is not None:
+            d['adaptive_eps'] = self.adaptive_eps
         return d
 
+    def set_density_error(self, error):
+        self.density_error = error
+
+    def get_tolerance(self):
+        """Convergence criterion for the next solve.
+
+        With adaptive_eps, the criterion is loosened while the density
+        is far from converged: the norm of the residual is required to
+        be adaptive_eps times the density error (integral of absolute
+        density change) per volume, but never looser than needed to
+        reach eps."""
+        if self.adaptive_eps is None or self.density_error is None:
+            return self.eps
+        return max(self.eps, (self.adaptive_eps * self.density_error)**2 /
+                   self.gd.volume)
+
     def get_description(self):
         # The idea is that the subclass writes a header and main parameters,
         # then adds the below string.
@@ -128,6 +158,9 @@ class BasePoissonSolver(_PoissonSolver):
         if self.use_charge_center:
             lines.append('    Compensate for charged system using center of '
                          'majority charge')
+        if self.adaptive_eps is not None:
+            lines.append('    Adaptive tolerance: %g x density error'
+                         % self.adaptive_eps)
         return '\n'.join(lines)
 
     def solve(self, phi, rho, charge=None, eps=None, maxcharge=1e-6,
@@ -137,7 +170,7 @@ class BasePoissonSolver(_PoissonSolver):
         assert np.all(rho.shape == self.gd.n_c)
 
         if eps is None:
-            eps = self.eps
+            eps = self.get_tolerance()
         actual_charge = self.gd.integrate(rho)
         background = (actual_charge / self.gd.dv /
                       self.gd.get_size_of_global_array().prod())
@@ -243,16 +276,41 @@ class BasePoissonSolver(_PoissonSolver):
 
 
 class FDPoissonSolver(BasePoissonSolver):
+    # Switch from V- to W-cycles if one V-cycle reduces the squared
+    # norm of the residual by less than this factor:
+    wcycle_threshold = 0.25
+
     def __init__(self, nn=3, relax='J', eps=2e-10, maxiter=1000,
-                 remove_moment=None, use_charge_center=False):
+                 remove_moment=None, use_charge_center=False,
+                 cycle='auto', fmg=True, adaptive_eps=None):
+        """Multigrid Poisson solver.
+
+        cycle: str
+            Multigrid cycle: 'V', 'W' or 'auto'.  With 'auto', V-cycles
+            are used until one converges too slowly and W-cycles
+            from then on.
+        fmg: bool
+            Start from a full-multigrid (FMG) solution when the initial
+            guess for the potential is zero.
+        adaptive_eps: float
+            Loosen the convergence criterion while the SCF density is
+            far from converged (see get_tolerance()).
+        """
         super(FDPoissonSolver, self).__init__(
             eps=eps,
             remove_moment=remove_moment,
-            use_charge_center=use_charge_center)
+            use_charge_center=use_charge_center,
+            adaptive_eps=adaptive_eps)
         self.relax = relax
         self.nn = nn
         self.charged_periodic_correction = None
         self.maxiter = maxiter
+        if cycle not in ['V', 'W', 'auto']:
+            raise ValueError('Unknown multigrid cycle: %s' % cycle)
+        self.cycle = cycle
+        self.fmg = fmg
+        # Number of coarse-grid corrections per level: 1=V, 2=W
+        self.cycle_index = 2 if cycle == 'W' else 1
 
         # Relaxation method
         if relax == 'GS':
@@ -270,6 +328,10 @@ class FDPoissonSolver(BasePoissonSolver):
     def todict(self):
         d = super(FDPoissonSolver, self).todict()
         d.update({'name': 'fd', 'nn': self.nn, 'relax': self.relax})
+        if self.cycle != 'auto':
+            d['cycle'] = self.cycle
+        if not self.fmg:
+            d['fmg'] = False
         return d
 
     def get_stencil(self):
@@ -325,6 +387,8 @@ class FDPoissonSolver(BasePoissonSolver):
 
         self.levels = level
 
+        self.cycle_index = 2 if self.cycle == 'W' else 1
+
         if self.operators[-1].gd.N_c.max() > 36:
             # Try to warn exactly once no matter how one uses the solver.
             if gd.comm.parent is None:
@@ -362,7 +426,11 @@ class FDPoissonSolver(BasePoissonSolver):
             # one that we print when things are really bad.
             lines.extend(['    Warning: Coarse grid has more than 24 points.',
                           '             More multi-grid levels recommended.'])
+        cycle = {'V': 'V', 'W': 'W', 'auto': 'V (W if slow)'}[self.cycle]
+        if self.fmg:
+            cycle += ' with full-multigrid start'
         lines.extend(['    Stencil: %s' % self.operators[0].description,
+                      '    Cycle: %s' % cycle,
                       '    Max iterations: %d' % self.maxiter])
         lines.append(super(FDPoissonSolver, self).get_description())
         return '\n'.join(lines)
@@ -399,10 +467,20 @@ class FDPoissonSolver(BasePoissonSolver):
         else:
             self.B.apply(rho, self.rhos[0])
 
+        if self.fmg and not self.gd.comm.max(int(phi.any())):
+            self.full_multigrid()
+
         niter = 1
         maxiter = self.maxiter
-        while self.iterate2(self.step) > eps and niter < maxiter:
+        error = self.iterate2(self.step)
+        while error > eps and niter < maxiter:
+            olderror = error
+            error = self.iterate2(self.step)
             niter += 1
+            if (self.cycle == 'auto' and self.cycle_index == 1 and
+                    error > self.wcycle_threshold * olderror):
+                # V-cycles converge too slowly for this grid:
+                self.cycle_index = 2
         if niter == maxiter:
             msg = 'Poisson solver did not converge in %d iterations!' % maxiter
             raise PoissonConvergenceError(msg)
@@ -416,6 +494,23 @@ class FDPoissonSolver(BasePoissonSolver):
 
         return niter
 
+    def full_multigrid(self):
+        """Initial guess from the full-multigrid (FMG) algorithm.
+
+        The density is restricted to all levels.  Starting from the
+        coarsest grid, the solution of each level is interpolated to
+        the next finer level and improved there with one cycle."""
+        for level in range(self.levels):
+            self.restrictors[level].apply(self.rhos[level],
+                                          self.rhos[level + 1])
+        self.phis[self.levels][:] = 0.0
+        step = self.step * 4**self.levels
+        for level in range(self.levels, 0, -1):
+            self.iterate2(step, level)
+            self.interpolators[level - 1].apply(self.phis[level],
+                                                self.phis[level - 1])
+            step /= 4
+
     def iterate2(self, step, level=0):
         """Smooths the solution in every multigrid level"""
         self._init()
@@ -434,7 +529,8 @@ class FDPoissonSolver(BasePoissonSolver):
             self.restrictors[level].apply(residual,
                                           self.rhos[level + 1])
             self.phis[level + 1][:] = 0.0
-            self.iterate2(4.0 * step, level + 1)
+            for i in range(self.cycle_index):
+                self.iterate2(4.0 * step, level + 1)
             self.interpolators[level].apply(self.phis[level + 1], residual)
             self.phis[level] -= residual
 
@@ -931,16 +1027,63 @@ def itransform2(A_g, axes=None, pbc=[True, True]):
                           axis=axes[1], pbc=pbc[1])
 
 
+def banded_cholesky(a_x, b_d, n):
+    """Cholesky factorize many symmetric banded Toeplitz-like matrices.
+
+    Matrix number x is n by n with a_x[x] on the diagonal and b_d[d - 1]
+    on the d'th sub- and super-diagonal.  Returns L_dix with L_dix[d, i]
+    being element (i, i - d) of the lower triangular factors, except
+    for d=0 where the inverse of the diagonal is stored."""
+    D = len(b_d)
+    L_dix = np.zeros((D + 1, n, len(a_x)))
+    for i in range(n):
+        for d in range(min(D, i), 0, -1):
+            j = i - d
+            s_x = np.zeros_like(a_x) + b_d[d - 1]
+            for e in range(d + 1, min(D, i) + 1):
+                s_x -= L_dix[e, i] * L_dix[e - d, j]
+            L_dix[d, i] = s_x * L_dix[0, j]
+        s_x = a_x - (L_dix[1:min(D, i) + 1, i]**2).sum(0)
+        if (s_x <= 0.0).any():
+            raise np.linalg.LinAlgError('Matrix not positive definite')
+        L_dix[0, i] = s_x**-0.5
+    return L_dix
+
+
+def banded_cholesky_solve(L_dix, b_ix):
+    """Solve L L^T x = b in place using factors from banded_cholesky()."""
+    D = len(L_dix) - 1
+    n = len(b_ix)
+    for i in range(n):
+        for d in range(1, min(D, i) + 1):
+            b_ix[i] -= L_dix[d, i] * b_ix[i - d]
+        b_ix[i] *= L_dix[0, i]
+    for i in range(n - 1, -1, -1):
+        for d in range(1, min(D, n - 1 - i) + 1):
+            b_ix[i] -= L_dix[d, i + d] * b_ix[i + d]
+        b_ix[i] *= L_dix[0, i]
+
+
 class BadAxesError(ValueError):
     pass
 
 
 class FastPoissonSolver(BasePoissonSolver):
-    def __init__(self, nn=3,  **kwargs):
+    def __init__(self, nn=3, use_cholesky=True, **kwargs):
+        """Direct Poisson solver.
+
+        Periodic axes are diagonalized with FFTs and non-periodic axes
+        with fast sine transforms (FSTs).  With use_cholesky=True, the
+        longest non-periodic axis is instead solved by a banded Cholesky
+        decomposition.  This is exact for the zero boundary conditions
+        of the finite-difference stencil also for nn > 1, where the
+        sine transform is only approximate near the boundary."""
+        if kwargs.get('adaptive_eps') is not None:
+            raise ValueError('adaptive_eps can only be used with '
+                             'iterative Poisson solvers')
         BasePoissonSolver.__init__(self, **kwargs)
         self.nn = nn
-        # We may later enable this to work with Cholesky, but not now:
-        self.use_cholesky = False
+        self.use_cholesky = use_cholesky
 
     def _init(self):
         pass
@@ -967,8 +1110,6 @@ class FastPoissonSolver(BasePoissonSolver):
         orthogonal_c = (np.abs(dotprods) > 1e-10).sum(axis=0) == 1
         assert sum(orthogonal_c) in [0, 1, 3]
 
-        non_orthogonal_axes = axes[np.logical_not(orthogonal_c)]
-
         if not all(pbc_c | orthogonal_c):
             raise BadAxesError('Each axis must be periodic or orthogonal '
                                'to other axes.  But we have pbc={} '
@@ -977,21 +1118,13 @@ class FastPoissonSolver(BasePoissonSolver):
                                        orthogonal_c.astype(int)))
 
         # We sort them, and pick the longest non-periodic axes as the
-        # cholesky axis.
+        # cholesky axis.  Non-periodic axes are always orthogonal
+        # (see above).
         sorted_non_periodic_axes = sorted(non_periodic_axes,
                                           key=lambda c: gd.N_c[c])
-        if self.use_cholesky:
-            if len(sorted_non_periodic_axes) > 0:
-                cholesky_axes = [ sorted_non_periodic_axes[-1] ]
-                if cholesky_axes[0] in non_orthogonal_axes:
-                    msg = ('Cholesky axis cannot be non-orthogonal. '
-                           'Do you really want a non-orthogonal non-periodic '
-                           'axis? If so, run with use_cholesky=False.')
-                    raise NotImplementedError(msg)
-                fst_axes = sorted_non_periodic_axes[0:-1]
-            else:
-                cholesky_axes = []
-                fst_axes = []
+        if self.use_cholesky and len(sorted_non_periodic_axes) > 0:
+            cholesky_axes = [sorted_non_periodic_axes[-1]]
+            fst_axes = sorted_non_periodic_axes[0:-1]
         else:
             cholesky_axes = []
             fst_axes = sorted_non_periodic_axes
@@ -1050,14 +1183,31 @@ class FastPoissonSolver(BasePoissonSolver):
         assert np.linalg.norm(fft_lambdas.imag) < 1e-10
         fft_lambdas = fft_lambdas.real.copy()  # arr.real is not contiguous
 
-        # If there is no Cholesky decomposition, the system is already
-        # fully diagonal and we can directly invert the linear problem
-        # by dividing with the eigenvalues.
-        assert len(cholesky_axes) == 0
-        # if len(cholesky_axes) == 0:
-        with np.errstate(divide='ignore'):
-            self.inv_fft_lambdas = np.where(
-                np.abs(fft_lambdas) > 1e-10, 1.0 / fft_lambdas, 0)
+        if len(cholesky_axes) == 0:
+            # If there is no Cholesky decomposition, the system is already
+            # fully diagonal and we can directly invert the linear problem
+            # by dividing with the eigenvalues.
+            with np.errstate(divide='ignore'):
+                self.inv_fft_lambdas = np.where(
+                    np.abs(fft_lambdas) > 1e-10, 1.0 / fft_lambdas, 0)
+            return
+
+        # For each FFT/FST wave vector, the remaining problem along the
+        # Cholesky axis is a symmetric banded matrix with the stencil
+        # coefficients as off-diagonals.  Outside the grid, the
+        # potential is zero, so the matrix is simply truncated:
+        axis = cholesky_axes[0]
+        offset_pc = np.array(laplace.offset_pc)
+        b_d = np.zeros(abs(offset_pc[:, axis]).max())
+        for coeff, offset_c in zip(laplace.coef_p, offset_pc):
+            if offset_c[axis] < 0:
+                if np.delete(offset_c, axis).any():
+                    assert abs(coeff) < 1e-12
+                    continue
+                b_d[-offset_c[axis] - 1] += coeff
+        a_x = np.moveaxis(fft_lambdas, axis, 0)[0].ravel() - 2 * b_d.sum()
+        self.cholesky_L_dix = banded_cholesky(a_x, b_d,
+                                              gd_x[-1].n_c[axis])
 
     def solve_neutral(self, phi_g, rho_g, eps=None, timer=None):
         gd1 = self.gd
@@ -1084,7 +1234,8 @@ class FastPoissonSolver(BasePoissonSolver):
                                         pbc=gd1.pbc_c[self.axes[2]])
                     timer.stop('fft')
                 else:
-                    raise NotImplementedError
+                    # The remaining problem is 1D along the Cholesky axis
+                    work1_g = work2_g
             else:
                 raise NotImplementedError
             gd1 = gd2
@@ -1095,8 +1246,14 @@ class FastPoissonSolver(BasePoissonSolver):
             work1_g *= self.inv_fft_lambdas
         else:
             assert len(self.cholesky_axes) == 1
-            #axis = self.cholesky_axes[0]
-            raise NotImplementedError
+            timer.start('Cholesky')
+            axis = self.cholesky_axes[0]
+            b_ix = np.moveaxis(work1_g, axis, 0)
+            shape = b_ix.shape
+            b_ix = b_ix.reshape((shape[0], -1))
+            banded_cholesky_solve(self.cholesky_L_dix, b_ix)
+            work1_g = np.moveaxis(b_ix.reshape(shape), 0, axis)
+            timer.stop('Cholesky')
 
         for c in [1, 0]:
             gd2 = self.gd_x[c]
@@ -1115,7 +1272,7 @@ class FastPoissonSolver(BasePoissonSolver):
                                          pbc=gd1.pbc_c[self.axes[2]])
                     timer.stop('fft')
                 else:
-                    raise NotImplementedError
+                    work2_g = np.ascontiguousarray(work1_g)
             else:
                 raise NotImplementedError
 
@@ -1131,6 +1288,8 @@ class FastPoissonSolver(BasePoissonSolver):
     def todict(self):
         d = super(FastPoissonSolver, self).todict()
         d.update({'name': 'fast', 'nn': self.nn})
+        if not self.use_cholesky:
+            d['use_cholesky'] = False
         return d
 
     def estimate_memory(self, mem):
@@ -1141,6 +1300,7 @@ class FastPoissonSolver(BasePoissonSolver):
 FastPoissonSolver using
     %s stencil;
     FFT axes: %s;
-    FST axes: %s.
+    FST axes: %s;
+    Cholesky axes: %s.
 """ % (self.stencil_description,
-       self.fft_axes, self.fst_axes)
+       self.fft_axes, self.fst_axes, self.cholesky_axes)
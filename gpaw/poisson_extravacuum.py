@@ -143,6 +143,11 @@ class ExtraVacuumPoissonSolver(_PoissonSolver):
 
         self._initialized = False
 
+    def set_density_error(self, error):
+        self.ps_large_coar.set_density_error(error)
+        if self.use_coarse:
+            self.ps_small_fine.set_density_error(error)
+
     def _init(self):
         if self._initialized:
             return
@@ -0,0 +1,121 @@
+"""Poisson solver for isolated systems without periodic images."""
+from math import pi
+
+import numpy as np
+from ase.utils import seterr
+
+from gpaw.fftw import get_efficient_fft_size
+from gpaw.poisson import BasePoissonSolver
+from gpaw.utilities import erf
+from gpaw.utilities.timing import NullTimer
+
+
+class FreeBoundaryPoissonSolver(BasePoissonSolver):
+    """Free-boundary FFT Poisson solver.
+
+    The density is zero-padded to twice the size of the grid and
+    convoluted with the Coulomb kernel 1/r using FFTs (Hockney and
+    Eastwood).  The kernel is split into a smooth long-range part,
+    erf(ar)/r, which is sampled on the padded grid, and a short-range
+    part, erfc(ar)/r, which is added in reciprocal space (like in
+    gpaw.response.wstc).
+
+    There are no periodic images, so molecules and clusters can use
+    tight cells and charged systems need no compensating charge.  The
+    method is not iterative.  The FFTs are done on the master process
+    of the domain.
+    """
+
+    # Range-separation parameter times the largest grid spacing.  Smaller
+    # values make the sampled long-range part smoother:
+    ah = 0.3
+
+    def __init__(self):
+        BasePoissonSolver.__init__(self)
+        self.N_c = None  # size of padded grid
+        self.K_Q = None  # kernel in reciprocal space
+
+    def todict(self):
+        return {'name': 'free'}
+
+    def get_description(self):
+        if self.N_c is None:
+            return 'Free-boundary FFT'
+        return ('Free-boundary FFT\n'
+                '    Padded grid: %d x %d x %d points' % tuple(self.N_c))
+
+    def set_grid_descriptor(self, gd):
+        if gd.pbc_c.any():
+            raise ValueError('Free-boundary Poisson solver requires '
+                             'non-periodic boundary conditions, not pbc={}'
+                             .format(gd.pbc_c.astype(int)))
+        self.gd = gd
+        n_c = gd.get_size_of_global_array()
+        self.N_c = np.array([get_efficient_fft_size(2 * n) for n in n_c])
+        self.K_Q = None
+
+    def _init(self):
+        if self.K_Q is not None or self.gd.comm.rank != 0:
+            return
+
+        gd = self.gd
+        N_c = self.N_c
+        h_c = (gd.h_cv**2).sum(1)**0.5
+        # The short-range part must vanish before it reaches the periodic
+        # images of the padded grid:
+        a = max(self.ah / h_c.max(),
+                6.0 / (h_c * gd.get_size_of_global_array()).min())
+
+        # Long-range part sampled at the grid-point separations:
+        m_c = [(np.arange(N) + N // 2) % N - N // 2 for N in N_c]
+        v_Q = np.empty(N_c)
+        for m0, v_jk in zip(m_c[0], v_Q):
+            r_jkv = (m0 * gd.h_cv[0] +
+                     m_c[1][:, np.newaxis, np.newaxis] * gd.h_cv[1] +
+                     m_c[2][:, np.newaxis] * gd.h_cv[2])
+            r_jk = (r_jkv**2).sum(2)**0.5
+            # Ignore division by zero (in 0,0,0 corner):
+            with seterr(invalid='ignore', divide='ignore'):
+                v_jk[:] = erf(a * r_jk) / r_jk
+        v_Q[0, 0, 0] = 2 * a / pi**0.5
+        K_Q = np.fft.rfftn(v_Q).real * gd.dv
+        v_Q = None
+
+        # Short-range part:
+        B_cv = 2 * pi * np.linalg.inv(N_c[:, np.newaxis] * gd.h_cv).T
+        i0, i1 = [np.fft.fftfreq(N, 1.0 / N) for N in N_c[:2]]
+        i2 = np.arange(N_c[2] // 2 + 1)
+        k2_Q = np.zeros_like(K_Q)
+        for B0, B1, B2 in B_cv.T:
+            k2_Q += (i0[:, np.newaxis, np.newaxis] * B0 +
+                     i1[:, np.newaxis] * B1 + i2 * B2)**2
+        k2_Q[0, 0, 0] = 1.0  # avoid division by zero
+        sr_Q = 4 * pi / k2_Q * (1 - np.exp(-k2_Q / (4 * a**2)))
+        sr_Q[0, 0, 0] = pi / a**2
+        K_Q += sr_Q
+        self.K_Q = K_Q
+
+    def solve(self, phi, rho, charge=None, eps=None, maxcharge=1e-6,
+              zero_initial_phi=False, timer=NullTimer()):
+        # Charged systems are handled directly by the kernel:
+        return self.solve_neutral(phi, rho, timer=timer)
+
+    def solve_neutral(self, phi_g, rho_g, eps=None, timer=NullTimer()):
+        self._init()
+        gd = self.gd
+        rho_R = gd.collect(rho_g)
+        if gd.comm.rank == 0:
+            N_c = tuple(self.N_c)
+            timer.start('fft')
+            phi_R = np.fft.irfftn(np.fft.rfftn(rho_R, N_c) * self.K_Q, N_c)
+            timer.stop('fft')
+            n0, n1, n2 = rho_R.shape
+            phi_R = phi_R[:n0, :n1, :n2].copy()
+        else:
+            phi_R = None
+        gd.distribute(phi_R, phi_g)
+        return 1  # Non-iterative method, return 1 iteration
+
+    def estimate_memory(self, mem):
+        N0, N1, N2 = self.N_c
+        mem.subnode('Kernel', N0 * N1 * (N2 // 2 + 1) * 8)
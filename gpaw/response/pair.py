@@ -23,6 +23,7 @@ from gpaw.utilities.blas import gemm
 from gpaw.utilities.progressbar import ProgressBar
 from gpaw.wavefunctions.pw import PWLFC
 from gpaw.bztools import get_reduced_bz, unique_rows
+from gpaw.symmetry import KPointLattice
 
 
 class KPoint:
@@ -86,6 +87,26 @@ class KPointPair:
         return df_nm
 
 
+class KPointFinder:
+    """Find the index of a k-point in the full BZ.
+
+    Uses an integer-lattice index if the k-points form a (shifted)
+    uniform grid and a k-d tree otherwise."""
+    def __init__(self, bzk_kc):
+        try:
+            self.lattice = KPointLattice(bzk_kc)
+        except ValueError:
+            self.lattice = None
+        self.kdtree = cKDTree(np.mod(np.mod(bzk_kc, 1).round(6), 1))
+
+    def find(self, k_c):
+        if self.lattice is not None:
+            K = self.lattice.find(k_c)
+            if K >= 0:
+                return int(K)
+        return self.kdtree.query(np.mod(np.mod(k_c, 1).round(6), 1))[1]
+
+
 class PWSymmetryAnalyzer:
     """Class for handling planewave symmetries."""
     def __init__(self, kd, pd, txt=sys.stdout,
@@ -149,7 +170,7 @@ class PWSymmetryAnalyzer:
         # Which timer to use
         self.timer = timer or Timer()
 
-        self.KDTree = cKDTree(np.mod(np.mod(kd.bzk_kc, 1).round(6), 1))
+        self.kptfinder = KPointFinder(kd.bzk_kc)
 
         # Initialize
         self.initialize()
@@ -186,7 +207,7 @@ class PWSymmetryAnalyzer:
         self.print_symmetries()
 
     def find_kpoint(self, k_c):
-        return self.KDTree.query(np.mod(np.mod(k_c, 1).round(6), 1))[1]
+        return self.kptfinder.find(k_c)
 
     def print_symmetries(self):
         """Handsome print function for symmetry operations."""
@@ -697,11 +718,11 @@ class PairDensity:
         self.vol = abs(np.linalg.det(calc.wfs.gd.cell_cv))
 
         kd = self.calc.wfs.kd
-        self.KDTree = cKDTree(np.mod(np.mod(kd.bzk_kc, 1).round(6), 1))
+        self.kptfinder = KPointFinder(kd.bzk_kc)
         print('Number of blocks:', nblocks, file=self.fd)
 
     def find_kpoint(self, k_c):
-        return self.KDTree.query(np.mod(np.mod(k_c, 1).round(6), 1))[1]
+        return self.kptfinder.find(k_c)
 
     def add_gate_voltage(self, gate_voltage=0):
         """Shifts the Fermi-level by e * Vg. By definition e = 1."""
@@ -9,7 +9,20 @@ from gpaw.forces import calculate_forces
 
 
 class SCFLoop:
-    """Self-consistent field loop."""
+    """Self-consistent field loop.
+
+    After each run, self.history contains one dictionary per iteration
+    with the errors, the predicted number of remaining iterations and
+    the time (in seconds) spent on each convergence criterion.
+    """
+
+    # Number of iterations used for estimating the convergence rate:
+    nfit = 4
+
+    # Calculate forces only when the other criteria are converged or are
+    # predicted to converge within this number of iterations:
+    force_lookahead = 2
+
     def __init__(self, eigenstates=0.1, energy=0.1, density=0.1, force=np.inf,
                  maxiter=100, niter_fixdensity=None, nvalence=None):
         self.max_errors = {'eigenstates': eigenstates,
@@ -25,6 +38,7 @@ class SCFLoop:
         self.converged = False
 
         self.niter = None
+        self.history = []
 
         self.reset()
 
@@ -58,13 +72,19 @@ class SCFLoop:
 
     def run(self, wfs, ham, dens, occ, log, callback):
         self.niter = 1
+        self.history = []
         while self.niter <= self.maxiter:
+            times = dict.fromkeys(self.max_errors, 0.0)
+            t1 = time.time()
             wfs.eigensolver.iterate(ham, wfs)
             occ.calculate(wfs)
+            t2 = time.time()
+            times['eigenstates'] += t2 - t1
 
             energy = ham.get_energy(occ)
             self.old_energies.append(energy)
-            errors = self.collect_errors(dens, ham, wfs)
+            times['energy'] += time.time() - t2
+            errors = self.collect_errors(dens, ham, wfs, times)
 
             # Converged?
             for kind, error in errors.items():
@@ -74,6 +94,13 @@ class SCFLoop:
             else:
                 self.converged = True
 
+            entry = {'iter': self.niter, 'errors': errors, 'times': times}
+            self.history.append(entry)
+            # Ignore forces until they have been calculated twice:
+            kinds = [kind for kind in self.max_errors
+                     if kind != 'force' or errors['force'] < np.inf]
+            entry['remaining'] = self.estimate_remaining(kinds=kinds)
+
             callback(self.niter)
             self.log(log, self.niter, wfs, ham, dens, occ, errors)
 
@@ -81,8 +108,12 @@ class SCFLoop:
                 break
 
             if self.niter > self.niter_fixdensity and not dens.fixed:
+                t1 = time.time()
                 dens.update(wfs)
+                t2 = time.time()
                 ham.update(dens)
+                times['density'] += t2 - t1
+                times['energy'] += time.time() - t2
             else:
                 ham.npoisson = 0
             self.niter += 1
@@ -90,13 +121,19 @@ class SCFLoop:
         # Don't fix the density in the next step:
         self.niter_fixdensity = 0
 
+        self.log_timing(log)
+
         if not self.converged:
             log(oops)
             raise KohnShamConvergenceError(
                 'Did not converge!  See text output for help.')
 
-    def collect_errors(self, dens, ham, wfs):
-        """Check convergence of eigenstates, energy and density."""
+    def collect_errors(self, dens, ham, wfs, times=None):
+        """Check convergence of eigenstates, energy, density and forces.
+
+        Forces are only calculated when the other criteria are close to
+        convergence (see force_lookahead).  Time spent on forces is
+        added to times['force']."""
 
         errors = {'eigenstates': wfs.eigensolver.error,
                   'density': dens.error,
@@ -109,14 +146,78 @@ class SCFLoop:
         if len(self.old_energies) >= 3:
             errors['energy'] = np.ptp(self.old_energies[-3:])
 
+        remaining = np.inf
         if self.max_errors['force'] < np.inf:
+            remaining = self.estimate_remaining(
+                errors, ['eigenstates', 'density', 'energy'])
+        if remaining <= self.force_lookahead:
+            t1 = time.time()
             F_av = calculate_forces(wfs, dens, ham)
             if self.old_F_av is not None:
                 errors['force'] = ((F_av - self.old_F_av)**2).sum(1).max()**0.5
             self.old_F_av = F_av
+            if times is not None:
+                times['force'] += time.time() - t1
 
         return errors
 
+    def estimate_remaining(self, errors=None, kinds=None):
+        """Predict number of iterations needed to converge.
+
+        A straight line is fitted to the logarithm of the errors of the
+        last nfit iterations (using errors for the current iteration
+        if given).  Returns infinity if an error does not decrease or
+        if there is too little information."""
+        if kinds is None:
+            kinds = list(self.max_errors)
+        history = [entry['errors'] for entry in self.history[-self.nfit:]]
+        if errors is not None:
+            history = history[1 - self.nfit:] + [errors]
+        if not history:
+            return np.inf
+
+        remaining = 0
+        for kind in kinds:
+            maxerror = self.max_errors[kind]
+            error = history[-1][kind]
+            if error is None:
+                return np.inf
+            if error <= maxerror:
+                continue
+            # Use the latest unbroken sequence of finite errors:
+            y_i = []
+            for e in history[::-1]:
+                if e[kind] is None or not 0 < e[kind] < np.inf:
+                    break
+                y_i.insert(0, ln(e[kind]))
+            if len(y_i) < 2 or maxerror <= 0:
+                return np.inf
+            slope, y = np.polyfit(np.arange(len(y_i)), y_i, 1)
+            if slope >= 0:
+                return np.inf
+            n = (ln(maxerror) - y - slope * (len(y_i) - 1)) / slope
+            remaining = max(remaining, int(np.ceil(n)))
+        return remaining
+
+    def log_timing(self, log):
+        """Write time spent on each convergence criterion."""
+        if not self.history:
+            return
+        niter = len(self.history)
+        log('Time spent on convergence criteria (seconds):')
+        log('                    total  per iteration')
+        for kind in ['eigenstates', 'density', 'energy', 'force']:
+            if kind == 'force' and self.max_errors['force'] == np.inf:
+                continue
+            t = sum(entry['times'][kind] for entry in self.history)
+            log('  {0:12} {1:10.3f} {2:10.3f}'
+                .format(kind + ':', t, t / niter))
+        remaining = self.history[-1]['remaining']
+        if not self.converged and remaining < np.inf:
+            log('Estimated number of missing iterations: {0}'
+                .format(remaining))
+        log()
+
     def log(self, log, niter, wfs, ham, dens, occ, errors):
         """Output from each iteration."""
 
@@ -170,7 +271,7 @@ class SCFLoop:
              denserr), end='')
 
         if self.max_errors['force'] < np.inf:
-            if errors['force'] is not None:
+            if errors['force'] is not None and errors['force'] < np.inf:
                 log('  %+.2f' %
                     (ln(errors['force']) / ln(10)), end='')
             else:
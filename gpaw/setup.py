@@ -10,7 +10,8 @@ import ase.units as units
 from ase.data import chemical_symbols
 from ase.utils import basestring, StringIO
 
-from gpaw.setup_data import SetupData, search_for_file
+from gpaw.setup_data import (SetupData, search_for_file,
+                             get_setup_cache)
 from gpaw.basis_data import Basis
 from gpaw.overlap import OverlapCorrections
 from gpaw.gaunt import gaunt, nabla
@@ -88,7 +89,7 @@ def create_setup(symbol, xc='LDA', lmax=0,
                                   type, True,
                                   world=world)
     if hasattr(setupdata, 'build'):
-        setup = LeanSetup(setupdata.build(xc, lmax, basis, filter))
+        setup = LeanSetup(setupdata.build(xc, lmax, basis, filter, world))
         if U is not None:
             setup.set_hubbard_u(U, l, scale)
         return setup
@@ -751,7 +752,8 @@ class Setup(BaseSetup):
     ``tauct``  Pseudo core kinetic energy density
     ========== ============================================
     """
-    def __init__(self, data, xc, lmax=0, basis=None, filter=None):
+    def __init__(self, data, xc, lmax=0, basis=None, filter=None,
+                 world=None):
         self.type = data.name
 
         self.HubU = None
@@ -924,41 +926,98 @@ class Setup(BaseSetup):
          self.N0_p) = self.get_compensation_charges(phi_jg, phit_jg, _np,
                                                     self.local_corr.T_Lqp)
 
+        rdr_g = r_g * dr_g
+        dv_g = r_g * rdr_g
+        self.MB = -np.dot(dv_g * nct_g, vbar_g)
+
+        AB_q = -np.dot(self.local_corr.nt_qg, dv_g * vbar_g)
+        self.MB_p = np.dot(AB_q, self.local_corr.T_Lqp[0])
+
+        # The radial Coulomb integrals and the nabla matrix elements
+        # do not depend on the filter, so they can be cached:
+        cache = None
+        if self.fingerprint is not None and xc.type != 'GLLB':
+            cache = get_setup_cache()
+        cache_suffix = '-lmax{0}'.format(lmax)
+
+        radial = None
+        if cache is not None:
+            radial = cache.read(self.fingerprint, cache_suffix, world)
+
+        if radial is None:
+            radial = self.calculate_radial_integrals(xc, phi_jg, phit_jg)
+            if cache is not None and (world is None or world.rank == 0):
+                cache.write(self.fingerprint, radial, cache_suffix)
+
+        self.wg_lg = list(radial['wg_lg'])
+        self.M = radial['M'].item()
+        self.dEH0 = radial['dEH0'].item()
+        self.dEH_p = radial['dEH_p']
+        self.M_p = radial['M_p']
+        self.M_pp = radial['M_pp']
+        self.nabla_iiv = radial['nabla_iiv']
+        self.rnabla_iiv = radial['rnabla_iiv']
+        self.rxnabla_iiv = radial.get('rxnabla_iiv')
+
+        self.Kc = data.e_kinetic_core - data.e_kinetic
+        self.M -= data.e_electrostatic
+        self.E = data.e_total
+
+        Delta0_ii = unpack(self.Delta_pL[:, 0].copy())
+        self.dO_ii = data.get_overlap_correction(Delta0_ii)
+        self.dC_ii = self.get_inverse_overlap_coefficients(self.B_ii,
+                                                           self.dO_ii)
+
+        self.Delta_iiL = np.zeros((ni, ni, self.Lmax))
+        for L in range(self.Lmax):
+            self.Delta_iiL[:, :, L] = unpack(self.Delta_pL[:, L].copy())
+
+        self.Nct = data.get_smooth_core_density_integral(self.Delta0)
+        self.K_p = data.get_linear_kinetic_correction(self.local_corr.T_Lqp[0])
+
+        r = 0.02 * rcut2 * np.arange(51, dtype=float)
+        alpha = data.rcgauss**-2
+        self.ghat_l = data.get_ghat(lmax, alpha, r, rcut2)
+        self.rcgauss = data.rcgauss
+
+        self.xc_correction = data.get_xc_correction(rgd2, xc, gcut2, lcut)
+
+    def calculate_radial_integrals(self, xc, phi_jg, phit_jg):
+        """Calculate Coulomb corrections and nabla matrix elements.
+
+        Returns dictionary of arrays."""
+        rgd2 = self.local_corr.rgd2
+        r_g = rgd2.r_g
+        dr_g = rgd2.dr_g
+        nc_g = self.local_corr.nc_g
+        nct_g = self.local_corr.nct_g
+
         # Solves the radial poisson equation for density n_g
         def H(self, n_g, l):
             return rgd2.poisson(n_g, l) * r_g * dr_g
 
         (wg_lg, wn_lqg, wnt_lqg, wnc_g, wnct_g, wmct_g) = \
             self.calculate_integral_potentials(H)
-        self.wg_lg = wg_lg
 
         rdr_g = r_g * dr_g
-        dv_g = r_g * rdr_g
         A = 0.5 * np.dot(nc_g, wnc_g)
         A -= sqrt(4 * pi) * self.Z * np.dot(rdr_g, nc_g)
         mct_g = nct_g + self.Delta0 * self.g_lg[0]
         # wmct_g = wnct_g + self.Delta0 * wg_lg[0]
         A -= 0.5 * np.dot(mct_g, wmct_g)
-        self.M = A
-        self.MB = -np.dot(dv_g * nct_g, vbar_g)
-
-        AB_q = -np.dot(self.local_corr.nt_qg, dv_g * vbar_g)
-        self.MB_p = np.dot(AB_q, self.local_corr.T_Lqp[0])
 
         # Correction for average electrostatic potential:
         #
         #   dEH = dEH0 + dot(D_p, dEH_p)
         #
-        self.dEH0 = sqrt(4 * pi) * (wnc_g - wmct_g -
-                                    sqrt(4 * pi) * self.Z * r_g * dr_g).sum()
+        dEH0 = sqrt(4 * pi) * (wnc_g - wmct_g -
+                               sqrt(4 * pi) * self.Z * r_g * dr_g).sum()
         dEh_q = (wn_lqg[0].sum(1) - wnt_lqg[0].sum(1) -
                  self.local_corr.Delta_lq[0] * wg_lg[0].sum())
-        self.dEH_p = np.dot(dEh_q, self.local_corr.T_Lqp[0]) * sqrt(4 * pi)
+        dEH_p = np.dot(dEh_q, self.local_corr.T_Lqp[0]) * sqrt(4 * pi)
 
         M_p, M_pp = self.calculate_coulomb_corrections(wn_lqg, wnt_lqg,
                                                        wg_lg, wnc_g, wmct_g)
-        self.M_p = M_p
-        self.M_pp = M_pp
 
         if xc.type == 'GLLB':
             if 'core_f' in self.extra_xc_data:
@@ -970,39 +1029,22 @@ class Setup(BaseSetup):
                 if self.njcore > 0:
                     self.uc_jg = self.extra_xc_data['core_states'].reshape(
                         (self.njcore, -1))
-                    self.uc_jg = self.uc_jg[:, :gcut2]
+                    self.uc_jg = self.uc_jg[:, :self.gcut2]
                 self.phi_jg = phi_jg
 
-        self.Kc = data.e_kinetic_core - data.e_kinetic
-        self.M -= data.e_electrostatic
-        self.E = data.e_total
-
-        Delta0_ii = unpack(self.Delta_pL[:, 0].copy())
-        self.dO_ii = data.get_overlap_correction(Delta0_ii)
-        self.dC_ii = self.get_inverse_overlap_coefficients(self.B_ii,
-                                                           self.dO_ii)
-
-        self.Delta_iiL = np.zeros((ni, ni, self.Lmax))
-        for L in range(self.Lmax):
-            self.Delta_iiL[:, :, L] = unpack(self.Delta_pL[:, L].copy())
-
-        self.Nct = data.get_smooth_core_density_integral(self.Delta0)
-        self.K_p = data.get_linear_kinetic_correction(self.local_corr.T_Lqp[0])
-
-        r = 0.02 * rcut2 * np.arange(51, dtype=float)
-        alpha = data.rcgauss**-2
-        self.ghat_l = data.get_ghat(lmax, alpha, r, rcut2)
-        self.rcgauss = data.rcgauss
-
-        self.xc_correction = data.get_xc_correction(rgd2, xc, gcut2, lcut)
-        self.nabla_iiv = self.get_derivative_integrals(rgd2, phi_jg, phit_jg)
-        self.rnabla_iiv = self.get_magnetic_integrals(rgd2, phi_jg, phit_jg)
+        radial = dict(wg_lg=np.array(wg_lg), M=np.array(A),
+                      dEH0=np.array(dEH0), dEH_p=dEH_p, M_p=M_p, M_pp=M_pp)
+        radial['nabla_iiv'] = self.get_derivative_integrals(rgd2,
+                                                            phi_jg, phit_jg)
+        radial['rnabla_iiv'] = self.get_magnetic_integrals(rgd2,
+                                                           phi_jg, phit_jg)
         try:
             from gpaw.lrtddft2.rxnabla import get_magnetic_integrals_new
-            self.rxnabla_iiv = get_magnetic_integrals_new(self, rgd2,
-                                                          phi_jg, phit_jg)
+            radial['rxnabla_iiv'] = get_magnetic_integrals_new(self, rgd2,
+                                                               phi_jg, phit_jg)
         except NotImplementedError:
-            self.rxnabla_iiv = None
+            pass
+        return radial
 
     def create_projectors(self, pt_jg, rcut):
         pt_j = []
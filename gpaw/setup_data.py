@@ -6,6 +6,7 @@ import os
 import re
 import sys
 import xml.sax
+import zipfile
 from glob import glob
 from math import sqrt, pi, factorial as fac
 from distutils.version import LooseVersion
@@ -384,9 +385,9 @@ class SetupData:
             print('  <yukawa_exchange gamma="%r"/>' % self.X_gamma, file=xml)
         print('</paw_setup>', file=xml)
 
-    def build(self, xcfunc, lmax, basis, filter=None):
+    def build(self, xcfunc, lmax, basis, filter=None, world=None):
         from gpaw.setup import Setup
-        setup = Setup(self, xcfunc, lmax, basis, filter)
+        setup = Setup(self, xcfunc, lmax, basis, filter, world)
         return setup
 
 
@@ -438,6 +439,112 @@ for details."""
     return filename, source
 
 
+def get_setup_cache():
+    """Return SetupCache object or None if caching is disabled.
+
+    The cache is enabled by setting the GPAW_SETUP_CACHE environment
+    variable to the path of a directory."""
+    directory = os.environ.get('GPAW_SETUP_CACHE')
+    if not directory:
+        return None
+    return SetupCache(directory)
+
+
+class SetupCache:
+    """On-disk cache of parsed setups and derived radial quantities.
+
+    Entries are .npz files named after the MD5 fingerprint of the setup
+    file, so a modified setup file will never match an old entry."""
+
+    version = 1
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def filename(self, fingerprint, suffix=''):
+        return os.path.join(self.directory,
+                            'v{0}-{1}{2}.npz'.format(self.version,
+                                                     fingerprint, suffix))
+
+    def read(self, fingerprint, suffix='', world=None):
+        """Read dictionary of arrays.
+
+        Returns None if there is no (usable) entry."""
+        data = None
+        if world is None or world.rank == 0:
+            try:
+                with np.load(self.filename(fingerprint, suffix)) as npz:
+                    data = dict(npz.items())
+            except (IOError, OSError, ValueError, zipfile.BadZipfile):
+                pass
+        if world is not None:
+            data = broadcast(data, 0, world)
+        return data
+
+    def write(self, fingerprint, data, suffix=''):
+        """Write dictionary of arrays.
+
+        The file is first written under a temporary name and then moved
+        into place so that concurrent jobs never see half-written files.
+        Failures are ignored: the cache is only an optimization."""
+        filename = self.filename(fingerprint, suffix)
+        tmpfilename = '{0}.{1}.tmp'.format(filename, os.getpid())
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            with open(tmpfilename, 'wb') as fd:
+                np.savez(fd, **data)
+            os.rename(tmpfilename, filename)
+        except (IOError, OSError):
+            pass
+
+
+# Attributes of SetupData set by PAWXMLParser:
+_scalar_attributes = ['version', 'Z', 'Nc', 'Nv', 'xcname', 'orbital_free',
+                      'e_total', 'e_kinetic', 'e_electrostatic', 'e_xc',
+                      'e_kinetic_core', 'rcgauss', 'ExxC', 'X_gamma',
+                      'has_corehole', 'fcorehole', 'lcorehole',
+                      'core_hole_e', 'core_hole_e_kin', 'r0', 'nderiv0',
+                      'e0', 'l0', 'type', 'generator_version']
+_list_attributes = ['n_j', 'l_j', 'f_j', 'eps_j', 'rcut_j', 'id_j']
+_array_attributes = ['nc_g', 'nct_g', 'e_kin_jj', 'tauc_g', 'nvt_g',
+                     'tauct_g', 'vbar_g', 'X_p', 'X_pg', 'phicorehole_g',
+                     'phi_jg', 'phit_jg', 'pt_jg']
+
+
+def setup_data_to_arrays(setup):
+    """Convert parsed SetupData attributes to dictionary of arrays."""
+    data = {}
+    for name in _scalar_attributes + _list_attributes + _array_attributes:
+        value = getattr(setup, name, None)
+        if value is not None:
+            data[name] = np.asarray(value)
+    rgd = setup.rgd
+    data['rgd'] = np.array([rgd.a, rgd.b, rgd.N])
+    for name, x_g in setup.extra_xc_data.items():
+        data['extra_xc_data:' + name] = x_g
+    return data
+
+
+def setup_data_from_arrays(setup, data):
+    """Inverse of setup_data_to_arrays()."""
+    for name, value in data.items():
+        if name.startswith('extra_xc_data:'):
+            setup.extra_xc_data[name[14:]] = value
+        elif name == 'rgd':
+            a, b, N = value
+            setup.rgd = AERadialGridDescriptor(a, b, int(N))
+        elif name in _list_attributes:
+            # Extend in place: l_orb_j is the same list as l_j!
+            getattr(setup, name).extend(value.tolist())
+        elif name in _scalar_attributes:
+            setattr(setup, name, value.item())
+        elif name.endswith('_jg'):
+            setattr(setup, name, list(value))
+        else:
+            setattr(setup, name, value)
+
+
 class PAWXMLParser(xml.sax.handler.ContentHandler):
     def __init__(self, setup):
         xml.sax.handler.ContentHandler.__init__(self)
@@ -452,10 +559,24 @@ class PAWXMLParser(xml.sax.handler.ContentHandler):
 
         setup.fingerprint = hashlib.md5(source).hexdigest()
 
-        # XXXX There must be a better way!
-        # We don't want to look at the dtd now.  Remove it:
-        source = re.compile(b'<!DOCTYPE .*?>', re.DOTALL).sub(b'', source, 1)
-        xml.sax.parseString(source, self)
+        cache = get_setup_cache()
+        if extra_parameters.get('mggapscore'):
+            cache = None  # parsing modifies tauct_g
+
+        data = None
+        if cache is not None:
+            data = cache.read(setup.fingerprint, world=world)
+
+        if data is not None:
+            setup_data_from_arrays(setup, data)
+        else:
+            # XXXX There must be a better way!
+            # We don't want to look at the dtd now.  Remove it:
+            source = re.compile(b'<!DOCTYPE .*?>', re.DOTALL).sub(b'', source,
+                                                                  1)
+            xml.sax.parseString(source, self)
+            if cache is not None and (world is None or world.rank == 0):
+                cache.write(setup.fingerprint, setup_data_to_arrays(setup))
 
         if setup.zero_reference:
             setup.e_total = 0.0
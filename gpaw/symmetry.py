@@ -41,7 +41,8 @@ class Symmetry:
                  point_group=True, time_reversal=True, symmorphic=True,
                  do_not_symmetrize_the_density=False,
                  rotate_aperiodic_directions=False,
-                 translate_aperiodic_directions=False):
+                 translate_aperiodic_directions=False,
+                 irreducible_grid=False):
         """Construct symmetry object.
 
         Parameters:
@@ -64,6 +65,9 @@ class Symmetry:
             Use time-reversal symmetry.
         tolerance: float
             Relative tolerance.
+        irreducible_grid: bool
+            Evaluate the XC kernel and mix the density on the
+            symmetry-irreducible grid points only.
 
         Attributes:
 
@@ -88,6 +92,7 @@ class Symmetry:
         self.do_not_symmetrize_the_density = do_not_symmetrize_the_density
         self.rotate_aperiodic_directions = rotate_aperiodic_directions
         self.translate_aperiodic_directions = translate_aperiodic_directions
+        self.irreducible_grid = irreducible_grid
 
         # Disable fractional translations for non-periodic boundary conditions:
         if not (self.translate_aperiodic_directions or self.pbc_c.all()):
@@ -262,8 +267,8 @@ class Symmetry:
         nsym = len(U_scc)
 
         time_reversal = self.time_reversal and not self.has_inversion
-        bz2bz_ks = map_k_points_fast(bzk_kc, U_scc, time_reversal,
-                                     comm, self.tol)
+        bz2bz_ks = map_k_points_lattice(bzk_kc, U_scc, time_reversal,
+                                        comm, self.tol)
 
         bz2bz_k = -np.ones(nbzkpts + 1, int)
         ibz2bz_k = []
@@ -334,6 +339,20 @@ class Symmetry:
         if not self.do_not_symmetrize_the_density:
             gd.symmetrize(a, self.op_scc, self.ft_sc)
 
+    def get_irreducible_grid(self, gd):
+        """Create IrreducibleGrid object for gd.
+
+        Returns None if the irreducible_grid option is off or if it can
+        not be used: no symmetries, density not symmetrized, domain
+        decomposition or non-periodic boundary conditions."""
+        if (not self.irreducible_grid or
+                self.do_not_symmetrize_the_density or
+                len(self.op_scc) == 1 or
+                gd.comm.size > 1 or
+                not gd.pbc_c.all()):
+            return None
+        return IrreducibleGrid(gd, self.op_scc, self.ft_sc)
+
     def symmetrize_positions(self, spos_ac):
         """Symmetrizes the atomic positions."""
         spos_tmp_ac = np.zeros_like(spos_ac)
@@ -432,6 +451,97 @@ class Symmetry:
         return '\n'.join(lines)
 
 
+class IrreducibleGrid:
+    """Symmetry-irreducible points of a uniform grid.
+
+    The grid points are divided into orbits under the symmetry
+    operations and each orbit is represented by one irreducible point.
+    Arrays with the symmetry of the crystal can then be stored and
+    manipulated using the irreducible points only (index x)::
+
+        a_x = igrid.reduce(a_g)
+        a_g = igrid.expand(a_x)
+
+    The object can stand in for a GridDescriptor in simple operations
+    (integrate(), empty(), zeros() and bytecount()), where each
+    irreducible point is weighted by the size of its orbit.
+    """
+    def __init__(self, gd, op_scc, ft_sc):
+        assert gd.comm.size == 1 and gd.pbc_c.all()
+        self.gd = gd
+        self.comm = gd.comm
+        self.dv = gd.dv
+        self.shape = tuple(gd.N_c)
+
+        N_c = gd.N_c[:, np.newaxis]
+        g_cg = np.indices(self.shape).reshape((3, -1))
+        r_g = np.arange(g_cg.shape[1])  # representative of each point
+        for op_cc, ft_c in zip(op_scc, ft_sc):
+            t_c = (ft_c[:, np.newaxis] * N_c).round().astype(int)
+            p_cg = (np.dot(op_cc.T, g_cg) - t_c) % N_c
+            p_g = np.ravel_multi_index(p_cg, self.shape)
+            np.minimum(r_g, p_g, r_g)
+
+        self.g_x, self.x_g, self.weight_x = np.unique(
+            r_g, return_inverse=True, return_counts=True)
+
+    def __len__(self):
+        return len(self.g_x)
+
+    def reduce(self, a_xg):
+        """Average real values over each orbit.
+
+        Arrays that are only approximately symmetric (like the
+        interpolated density) are symmetrized this way."""
+        shape = a_xg.shape[:-3]
+        a_yg = a_xg.reshape((-1, len(self.x_g)))
+        a_yx = np.empty((len(a_yg), len(self)))
+        for a_g, a_x in zip(a_yg, a_yx):
+            a_x[:] = np.bincount(self.x_g, a_g, len(self)) / self.weight_x
+        return a_yx.reshape(shape + (len(self),))
+
+    def expand(self, a_xx, out=None):
+        """Expand values at the irreducible points to the full grid."""
+        if out is None:
+            out = self.gd.empty(a_xx.shape[:-1], a_xx.dtype)
+        out.reshape(out.shape[:-3] + (-1,))[:] = a_xx[..., self.x_g]
+        return out
+
+    def integrate(self, a_xx, b_xx=None, global_integral=True):
+        if b_xx is not None:
+            a_xx = a_xx * b_xx
+        return np.dot(a_xx, self.weight_x) * self.dv
+
+    def empty(self, n=(), dtype=float):
+        if isinstance(n, int):
+            n = (n,)
+        return np.empty(n + (len(self),), dtype)
+
+    def zeros(self, n=(), dtype=float):
+        a_xx = self.empty(n, dtype)
+        a_xx.fill(0.0)
+        return a_xx
+
+    def bytecount(self, dtype=float):
+        return len(self) * np.array(1, dtype).itemsize
+
+    def operator(self, apply):
+        """Make operator acting on reduced arrays from full-grid operator.
+
+        The result is multiplied by the orbit weights so that a plain
+        scalar product with the result gives the full-grid scalar
+        product."""
+        a_g = self.gd.empty()
+        b_g = self.gd.empty()
+
+        def reduced_apply(a_x, b_x):
+            self.expand(a_x, a_g)
+            apply(a_g, b_g)
+            b_x[:] = self.reduce(b_g) * self.weight_x
+
+        return reduced_apply
+
+
 def map_k_points(bzk_kc, U_scc, time_reversal, comm=None, tol=1e-11):
     """Find symmetry relations between k-points.
 
@@ -532,6 +642,87 @@ def map_k_points_fast(bzk_kc, U_scc, time_reversal, comm=None, tol=1e-7):
     return bz2bz_ks
 
 
+class KPointLattice:
+    """Integer-lattice index for k-points.
+
+    All k-points must be of the form (i_c + o_c) / N_c, where i_c are
+    integers and o_c is a common offset (Monkhorst-Pack and
+    Gamma-centered grids and subsets of those).  Any k-point can then
+    be looked up in constant time by rounding to the nearest lattice
+    point.  Raises ValueError if the k-points are not on a lattice or
+    if the lattice has more than maxsize times as many points as
+    there are k-points.
+    """
+    def __init__(self, bzk_kc, tol=1e-7, maxsize=8):
+        bzk_kc = np.asarray(bzk_kc, float)
+        nbzkpts = len(bzk_kc)
+        self.tol = tol
+        self.o_c = bzk_kc[0].copy()
+
+        d_kc = bzk_kc - self.o_c
+        N_c = np.ones(3, int)
+        for c in range(3):
+            x_k = np.sort(d_kc[:, c] % 1.0)
+            dx_k = np.diff(x_k)
+            dx_k = dx_k[dx_k > tol]
+            if len(dx_k):
+                N_c[c] = int(round(1 / dx_k.min()))
+
+        if N_c.prod() > maxsize * nbzkpts:
+            raise ValueError('Too few k-points for a lattice')
+        self.N_c = N_c
+
+        q_k = self.lattice_index(bzk_kc)
+        if (q_k == -1).any():
+            raise ValueError('k-points are not on a lattice')
+
+        # First k-point wins in case of duplicates:
+        self.table_q = -np.ones(N_c.prod(), int)
+        self.table_q[q_k[::-1]] = np.arange(nbzkpts)[::-1]
+
+    def lattice_index(self, k_xc):
+        """Flat lattice index of k-points (-1 for points off the lattice)."""
+        i_xc = (k_xc - self.o_c) * self.N_c
+        ok_x = (abs(i_xc - i_xc.round()) <= self.tol * self.N_c).all(-1)
+        i_xc = i_xc.round().astype(int) % self.N_c
+        q_x = np.ravel_multi_index(i_xc.T, self.N_c)
+        return np.where(ok_x, q_x, -1)
+
+    def find(self, k_xc):
+        """Indices of k-points (-1 for points not found)."""
+        q_x = self.lattice_index(k_xc)
+        return np.where(q_x >= 0, self.table_q[q_x], -1)
+
+
+def map_k_points_lattice(bzk_kc, U_scc, time_reversal, comm=None, tol=1e-7):
+    """Find symmetry relations between k-points.
+
+    Performs the same task as map_k_points(), but in O(N_k N_sym) time
+    using a KPointLattice.  The work is distributed over comm.  Falls
+    back to map_k_points_fast() if the k-points are not on a lattice.
+    """
+    try:
+        lattice = KPointLattice(bzk_kc, tol)
+    except ValueError:
+        return map_k_points_fast(bzk_kc, U_scc, time_reversal, comm, tol)
+
+    if comm is None or isinstance(comm, mpi.DryRunCommunicator):
+        comm = mpi.serial_comm
+
+    nbzkpts = len(bzk_kc)
+    ka = nbzkpts * comm.rank // comm.size
+    kb = nbzkpts * (comm.rank + 1) // comm.size
+
+    if time_reversal:
+        U_scc = np.concatenate([U_scc, -U_scc])
+
+    bz2bz_ks = np.zeros((nbzkpts, len(U_scc)), int)
+    for s, U_cc in enumerate(U_scc):
+        bz2bz_ks[ka:kb, s] = lattice.find(np.dot(bzk_kc[ka:kb], U_cc.T))
+    comm.sum(bz2bz_ks)
+    return bz2bz_ks
+
+
 def aglomerate_points(k_kc, tol):
     nd = k_kc.shape[1]
     nbzkpts = len(k_kc)
@@ -81,6 +81,8 @@ tests = [
     'pathological/numpy_core_multiarray_dot.py',
     'eigen/cg2.py',
     'fd_ops/laplace.py',
+    'fd_ops/threads.py',
+    'fd_ops/pipeline.py',
     'linalg/lapack.py',
     'linalg/eigh.py',
     'parallel/submatrix_redist.py',
@@ -116,16 +118,22 @@ tests = [
     'lfc/derivatives.py',
     # 'parallel/realspace_blacs.py',
     'pw/reallfc.py',
+    'pw/fftw_plans.py',
+    'pw/block_fft.py',
     'parallel/pblas.py',
     'fd_ops/non_periodic.py',
     'spectrum.py',
     'pw/lfc.py',
+    'pw/lfc_cache.py',
+    'pw/realspace_lfc.py',
     'gauss_func.py',
     'multipoletest.py',
     'cluster.py',
     'poisson/poisson.py',
     'poisson/fastpoisson.py',
     'poisson/poisson_asym.py',
+    'poisson/adaptive_eps.py',
+    'poisson/freeboundary.py',
     'parallel/arraydict_redist.py',
     'parallel/scalapack.py',
     'gauss_wave.py',
@@ -136,6 +144,7 @@ tests = [
     'ext_potential/harmonic.py',
     'atoms_mismatch.py',
     'setup_basis_spec.py',
+    'setups/cache.py',
     'pw/direct.py',
     'libelpa.py',
     'vdw/libvdwxc_spin.py',                 # ~1s
@@ -144,8 +153,10 @@ tests = [
     'lcao/density.py',                      # ~1s
     'pw/stresstest.py',                     # ~1s
     'pw/fftmixer.py',                       # ~1s
+    'pw/kerkermixer.py',                    # ~2s
     'lcao/fftmixer.py',                     # ~1s
     'symmetry/usesymm.py',                  # ~1s
+    'symmetry/irreducible_grid.py',         # ~3s
     'coulomb.py',                           # ~1s
     'xc/xcatom.py',                         # ~1s
     'force_as_stop.py',                     # ~1s
@@ -241,7 +252,13 @@ tests = [
     'linalg/gemm.py',                       # ~6s
     'generic/al_chain.py',                  # ~6s
     'fileio/parallel.py',                   # ~6s
+    'fileio/parallel_wfs_io.py',            # ~6s
     'fixmom.py',                            # ~6s
+    'rmmdiis_mixed_precision.py',           # ~8s
+    'davidson_locking.py',                  # ~8s
+    'rmmdiis_locking.py',                   # ~8s
+    'lobpcg.py',                            # ~8s
+    'parallel/lobpcg.py',                   # ~16s
     'exx/unocc.py',                         # ~6s
     'eigen/davidson.py',                    # ~6s
     'vdw/H_Hirshfeld.py',                   # ~6s
@@ -258,6 +275,8 @@ tests = [
     'fdtd/ed_inducedfield.py',              # ~16s
     'inducedfield_td.py',                   # ~9s
     'pw/bulk.py',                           # ~7s
+    'tetrahedron.py',                       # ~10s
+    'pw/fixed_basis.py',                    # ~8s
     'gllb/ne.py',                           # ~7s
     'lcao/force.py',                        # ~7s
     'xc/pplda.py',                          # ~7s
@@ -293,6 +312,7 @@ tests = [
     'kpt_refine.py',                        # ~10s
     'lcao/bulk.py',                         # ~11s
     'reuse_wfs.py',                         # ~11s
+    'wfs_extrapolation.py',                 # ~11s
     'generic/2Al.py',                       # ~11s
     'lrtddft/kssingles_Be.py',              # ~11s
     'generic/relax.py',                     # ~11s
@@ -0,0 +1,19 @@
+"""Test Davidson eigensolver with locking of converged bands."""
+from ase.build import molecule
+from gpaw import GPAW
+from gpaw.eigensolvers import Davidson
+from gpaw.test import equal
+
+for mode in ['fd', 'pw']:
+    results = []
+    for lock in [None, 1e-7]:
+        atoms = molecule('H2O', vacuum=2.5)
+        atoms.calc = GPAW(mode=mode, h=0.24, nbands=10,
+                          eigensolver=Davidson(niter=3, lock=lock),
+                          convergence={'bands': 'all'},
+                          txt=None)
+        e = atoms.get_potential_energy()
+        results.append((e, atoms.calc.get_eigenvalues()))
+    (e1, eps1_n), (e2, eps2_n) = results
+    equal(e1, e2, 1e-4)
+    equal(abs(eps1_n - eps2_n).max(), 0.0, 1e-3)
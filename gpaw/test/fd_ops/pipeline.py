@@ -0,0 +1,61 @@
+"""Check that pipelined halo exchanges give the same results."""
+import os
+
+import numpy as np
+
+from gpaw.fd_operators import Laplace
+from gpaw.grid_descriptor import GridDescriptor
+from gpaw.mpi import world
+from gpaw.transformers import Transformer
+
+# Orthorhombic cell (cfd stencil) and non-orthogonal cell (the stencil
+# has cross terms, so corners are passed on between directions):
+cells = [[4.0, 3.0, 5.0],
+         [[4.0, 0.0, 0.0], [2.0, 3.5, 0.0], [0.0, 0.0, 5.0]]]
+rng = np.random.RandomState(42)
+phase_cd = np.exp(2j * np.pi * rng.rand(3, 2))
+nbands = 5
+
+for cell in cells:
+    gd = GridDescriptor((16, 16, 20), cell, comm=world)
+    for dtype in [float, complex]:
+        lap = Laplace(gd, 1.0, 2, dtype)
+        assert lap.cfd == (np.ndim(cell) == 1)
+        ops = [lap.apply,
+               Transformer(gd, gd.coarsen(), 3, dtype).apply,
+               Transformer(gd, gd.refine(), 3, dtype).apply]
+        outputs = [gd.empty(nbands, dtype),
+                   gd.coarsen().empty(nbands, dtype),
+                   gd.refine().empty(nbands, dtype)]
+        a_xg = gd.empty(nbands, dtype)
+        a_xg.real = rng.rand(*a_xg.shape)
+        if dtype == complex:
+            a_xg.imag = rng.rand(*a_xg.shape)
+        phases = phase_cd if dtype == complex else None
+
+        def calculate():
+            for op, b_xg in zip(ops, outputs):
+                b_xg[:] = 0.0
+                op(a_xg, b_xg, phases)
+            return [b_xg.copy() for b_xg in outputs]
+
+        env = {}
+        for name in ['GPAW_PIPELINE', 'GPAW_CHUNK_SIZE']:
+            env[name] = os.environ.pop(name, None)
+        try:
+            results0 = calculate()
+            for chunksize in [1, 2, nbands]:
+                os.environ['GPAW_CHUNK_SIZE'] = str(chunksize)
+                os.environ.pop('GPAW_PIPELINE', None)
+                results1 = calculate()
+                os.environ['GPAW_PIPELINE'] = '1'
+                results2 = calculate()
+                for x0, x1, x2 in zip(results0, results1, results2):
+                    assert (x1 == x0).all()
+                    assert (x2 == x0).all()
+        finally:
+            for name, value in env.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
@@ -0,0 +1,36 @@
+"""Check that threaded stencils give the same results as serial ones."""
+import numpy as np
+
+import _gpaw
+from gpaw.fd_operators import Laplace
+from gpaw.grid_descriptor import GridDescriptor
+from gpaw.transformers import Transformer
+
+gd = GridDescriptor((16, 12, 20), (4.0, 3.0, 5.0))
+lap = Laplace(gd, 1.0, 3)
+restrictor = Transformer(gd, gd.coarsen(), 3)
+a_xg = gd.zeros(5)
+a_xg[:] = np.random.RandomState(1).rand(*a_xg.shape)
+s_g = a_xg[0].copy()
+
+
+def calculate():
+    b_xg = gd.zeros(5)
+    lap.apply(a_xg, b_xg)
+    c_g = a_xg[1].copy()
+    lap.relax(2, c_g, s_g, 4, 2 / 3)
+    return b_xg, c_g, restrictor.apply(a_xg[2])
+
+
+nthreads = _gpaw.get_num_threads()
+try:
+    _gpaw.set_num_threads(1)
+    results1 = calculate()
+    _gpaw.set_num_threads(3)
+    assert _gpaw.get_num_threads() == 3
+    results3 = calculate()
+finally:
+    _gpaw.set_num_threads(nthreads)
+
+for x1, x3 in zip(results1, results3):
+    assert abs(x1 - x3).max() == 0.0
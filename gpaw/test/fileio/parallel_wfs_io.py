@@ -0,0 +1,30 @@
+"""Test writing and reading of domain-distributed wave functions."""
+import numpy as np
+from ase import Atoms
+
+from gpaw import GPAW, PW
+from gpaw.mpi import world, serial_comm
+
+h2 = Atoms('H2', [(0, 0, 0), (0, 0, 0.74)], pbc=True)
+h2.center(vacuum=2.0)
+
+for mode in ['fd', PW(250)]:
+    h2.calc = GPAW(mode=mode, h=0.25, nbands=4, txt=None,
+                   parallel={'domain': world.size})
+    h2.get_potential_energy()
+    w_n = [h2.calc.get_pseudo_wave_function(n) for n in range(4)]
+    h2.calc.write('h2.gpw', 'all')
+    world.barrier()
+
+    # Each rank reads its own part of the wave functions:
+    calc = GPAW('h2.gpw', txt=None, parallel={'domain': world.size})
+    for n in range(4):
+        w = calc.get_pseudo_wave_function(n)
+        assert abs(w - w_n[n]).max() < 1e-10, (mode, n)
+
+    # Everything read by one process:
+    calc = GPAW('h2.gpw', txt=None, communicator=serial_comm)
+    for n in range(4):
+        w = calc.get_pseudo_wave_function(n)
+        if world.rank == 0:
+            assert np.allclose(w, w_n[n], rtol=0, atol=1e-10), (mode, n)
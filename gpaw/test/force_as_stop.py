@@ -1,3 +1,4 @@
+import numpy as np
 from ase import Atoms
 from gpaw import GPAW
 
@@ -12,3 +13,12 @@ H2.set_calculator(calc)
 H2.get_potential_energy()
 n = calc.get_number_of_iterations()
 assert 7 <= n <= 11, n
+
+# Forces are only calculated when the other criteria are (almost) converged:
+history = calc.scf.history
+assert len(history) == n
+assert np.isinf(history[0]['errors']['force'])
+assert history[-1]['remaining'] == 0
+for entry in history:
+    assert set(entry['times']) == {'eigenstates', 'density', 'energy',
+                                   'force'}
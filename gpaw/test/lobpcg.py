@@ -0,0 +1,45 @@
+"""Test LOBPCG eigensolver against Davidson."""
+from ase.build import molecule
+from gpaw import GPAW
+from gpaw.eigensolvers.lobpcg import LOBPCG
+from gpaw.test import equal
+
+
+class SingularLOBPCG(LOBPCG):
+    """LOBPCG where every other overlap matrix looks singular."""
+    def __init__(self):
+        LOBPCG.__init__(self)
+        self.calls = 0
+        self.failures = 0
+
+    def rayleigh_ritz(self, wfs, H_NN, S_NN):
+        self.calls += 1
+        if self.calls % 2 == 0:
+            self.failures += 1
+            return None, None
+        return LOBPCG.rayleigh_ritz(self, wfs, H_NN, S_NN)
+
+
+for mode in ['fd', 'pw']:
+    results = []
+    for eigensolver in ['dav', 'lobpcg']:
+        atoms = molecule('H2O', vacuum=2.5)
+        atoms.calc = GPAW(mode=mode, h=0.24, nbands=8,
+                          eigensolver=eigensolver,
+                          convergence={'bands': 'all'},
+                          txt=None)
+        e = atoms.get_potential_energy()
+        results.append((e, atoms.calc.get_eigenvalues()))
+    (e1, eps1_n), (e2, eps2_n) = results
+    equal(e1, e2, 1e-4)
+    equal(abs(eps1_n - eps2_n).max(), 0.0, 1e-3)
+
+# Failing [X, W, D] and [X, W] blocks must not break the SCF loop:
+atoms = molecule('H2O', vacuum=2.5)
+es = SingularLOBPCG()
+atoms.calc = GPAW(mode=mode, h=0.24, nbands=8,
+                  eigensolver=es,
+                  txt=None)
+e3 = atoms.get_potential_energy()
+assert es.failures > 0
+equal(e3, results[0][0], 1e-4)
@@ -50,3 +50,27 @@ for eps_skn, weight_k, n in [
     f_skn, fl, m, s = occupation_numbers(occ, eps_skn, weight_k, n)
     print(f_skn, fl, m, s)
     assert abs(f_skn.sum() - n) < 1e-14, f_skn
+
+# Vectorized distributions must agree with the k-point by k-point version:
+rng = np.random.RandomState(42)
+eps_un = rng.rand(6, 5) - 0.5
+weight_u = rng.rand(6)
+sign_u = np.array([1.0, -1.0, 1.0, -1.0, 1.0, -1.0])
+for occ in [FermiDirac(0.1), MethfesselPaxton(0.1, 2)]:
+    f_un = np.empty_like(eps_un)
+    data = occ.distributions(eps_un, weight_u, sign_u, 0.05, f_un)
+    data0 = 0.0
+    for u, (eps_n, weight) in enumerate(zip(eps_un, weight_u)):
+        k.eps_n = eps_n
+        k.f_n = np.empty(5)
+        k.weight = weight
+        k.s = u % 2
+        data0 += occ.distribution(k, 0.05)
+        assert abs(k.f_n - f_un[u]).max() < 1e-14
+    assert abs(data - data0).max() < 1e-12, data - data0
+
+    ne = 12.3
+    fermilevel, f_un, magmom, e_entropy = occ.find_fermi_level_arrays(
+        eps_un, weight_u, sign_u, ne, 0.0)
+    assert abs(f_un.sum() - ne) < 1e-9
+    assert abs(magmom - np.dot(f_un.sum(1), sign_u)) < 1e-12
@@ -0,0 +1,27 @@
+"""Test LOBPCG eigensolver with domain decomposition."""
+import numpy as np
+from ase.build import molecule
+from gpaw import GPAW
+from gpaw.mpi import world
+from gpaw.test import equal
+
+for mode in ['fd', 'pw']:
+    results = []
+    for eigensolver in ['dav', 'lobpcg']:
+        atoms = molecule('H2O', vacuum=2.5)
+        atoms.calc = GPAW(mode=mode, h=0.24, nbands=8,
+                          eigensolver=eigensolver,
+                          convergence={'bands': 'all'},
+                          parallel={'domain': world.size, 'band': 1},
+                          txt=None)
+        e = atoms.get_potential_energy()
+        eps_n = atoms.calc.get_eigenvalues()
+        # All ranks must agree:
+        eps0_n = eps_n.copy()
+        world.broadcast(eps0_n, 0)
+        assert abs(eps_n - eps0_n).max() == 0.0
+        results.append((e, eps_n))
+    (e1, eps1_n), (e2, eps2_n) = results
+    equal(e1, e2, 1e-4)
+    equal(abs(eps1_n - eps2_n).max(), 0.0, 1e-3)
+    assert np.isfinite(eps2_n).all()
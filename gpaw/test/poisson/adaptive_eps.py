@@ -0,0 +1,33 @@
+from ase.build import molecule
+from gpaw import GPAW
+from gpaw.poisson import FDPoissonSolver, FastPoissonSolver
+from gpaw.test import equal
+
+energies = []
+niters = []
+for adaptive_eps in [None, 0.01]:
+    atoms = molecule('H2O')
+    atoms.center(vacuum=2.5)
+    atoms.calc = GPAW(mode='fd', h=0.25, txt=None,
+                      poissonsolver=FDPoissonSolver(
+                          adaptive_eps=adaptive_eps))
+    npoisson = []
+
+    def count():
+        npoisson.append(atoms.calc.hamiltonian.npoisson)
+
+    atoms.calc.attach(count, 1)
+    energies.append(atoms.get_potential_energy())
+    niters.append(sum(n for n in npoisson if n))
+
+print(energies, niters)
+equal(energies[0], energies[1], 1e-5)
+assert niters[1] < niters[0]
+
+# Direct solvers have no tolerance to adapt:
+try:
+    FastPoissonSolver(adaptive_eps=0.01)
+except ValueError:
+    pass
+else:
+    assert False
@@ -0,0 +1,24 @@
+"""Test the free-boundary Poisson solver on a charged Gaussian."""
+import numpy as np
+from gpaw.grid_descriptor import GridDescriptor
+from gpaw.poisson import PoissonSolver
+from gpaw.utilities import erf
+
+# Tight, slightly anisotropic cell:
+gd = GridDescriptor((48, 52, 44), (9.6, 10.4, 8.8), pbc_c=False)
+r_vg = gd.get_grid_point_coordinates()
+center_v = np.array([4.9, 5.1, 4.3])
+r_g = ((r_vg - center_v[:, np.newaxis, np.newaxis, np.newaxis])**2).sum(0)
+r_g **= 0.5
+s = 0.8
+rho_g = np.exp(-r_g**2 / (2 * s**2)) / (2 * np.pi * s**2)**1.5
+r_g[r_g == 0.0] = 1e-10
+phi0_g = erf(r_g / (2**0.5 * s)) / r_g
+
+ps = PoissonSolver('free')
+ps.set_grid_descriptor(gd)
+phi_g = gd.zeros()
+ps.solve(phi_g, rho_g)
+err = gd.comm.max(abs(phi_g - phi0_g).max())
+print(err)
+assert err < 1e-6
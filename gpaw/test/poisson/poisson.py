@@ -44,3 +44,9 @@ b4 = f(8, FFTPoissonSolver())
 err4 = abs(b4[0, 0, 0] - b4[8, 8, 8])
 print(err4)
 assert err4 < 6e-16
+
+# W-cycles without full-multigrid start must give the same potential:
+b5 = f(8, FDPoissonSolver(nn=1, relax='J', cycle='W', fmg=False))
+err5 = abs(b5 - b1).max()
+print(err5)
+assert err5 < 1e-10
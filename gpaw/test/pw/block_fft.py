@@ -0,0 +1,22 @@
+import numpy as np
+
+from gpaw.grid_descriptor import GridDescriptor
+from gpaw.mpi import serial_comm
+from gpaw.wavefunctions.pw import PWDescriptor
+
+gd = GridDescriptor((10, 12, 9), (2.0, 2.2, 1.9), comm=serial_comm)
+rng = np.random.RandomState(17)
+for dtype in [float, complex]:
+    pd = PWDescriptor(2.0, gd, dtype)
+    a_xR = rng.rand(3, 10, 12, 9)
+    if dtype == complex:
+        a_xR = a_xR + 1j * rng.rand(3, 10, 12, 9)
+    c_xG = np.array([pd.fft(a_R) for a_R in a_xR])
+    c2_xG = pd.block_fft(a_xR)
+    assert abs(c_xG - c2_xG).max() < 1e-11
+    b_xR = np.array([pd.ifft(c_G) for c_G in c_xG])
+    b2_xR = pd.block_ifft(c_xG)
+    assert abs(b_xR - b2_xR).max() < 1e-12
+    # Feed the result of block_ifft() directly back in:
+    b2_xR *= 2.0
+    assert abs(pd.block_fft(b2_xR) - 2 * c_xG).max() < 1e-11
@@ -1,3 +1,6 @@
+import os
+
+import numpy as np
 from ase import Atoms
 from gpaw import GPAW, PW
 from gpaw.mpi import world
@@ -6,7 +9,18 @@ if world.size == 1:
     atoms = Atoms('H', cell=(2, 2, 2), pbc=True)
     atoms.calc = GPAW(mode=PW(300, force_complex_dtype=True),
                       eigensolver='direct')
-    atoms.get_potential_energy()
+    e1 = atoms.get_potential_energy()
+
+    # Keep the wave functions in memory-mapped files:
+    os.environ['GPAW_OUTOFCORE'] = 'scratch'
+    try:
+        atoms.calc = GPAW(mode=PW(300, force_complex_dtype=True),
+                          eigensolver='direct')
+        e2 = atoms.get_potential_energy()
+    finally:
+        del os.environ['GPAW_OUTOFCORE']
+    assert isinstance(atoms.calc.wfs.kpt_u[0].psit_nG, np.memmap)
+    assert abs(e2 - e1) < 1e-10
 
 if world.size == 2:
     atoms = Atoms('H', cell=(2, 2, 2), pbc=True)
@@ -0,0 +1,44 @@
+import os
+from unittest import SkipTest
+
+import numpy as np
+
+import gpaw.fftw as fftw
+
+if fftw.FFTPlan is fftw.NumpyFFTPlan:
+    raise SkipTest
+
+N_c = (12, 10, 9)
+a_Q = fftw.empty(N_c, complex)
+b_Q = fftw.empty(N_c, complex)
+n = len(fftw._plans)
+plan1 = fftw.FFTPlan(a_Q, a_Q, -1, fftw.MEASURE)
+assert len(fftw._plans) == n + 1
+plan2 = fftw.FFTPlan(b_Q, b_Q, -1, fftw.MEASURE)
+if fftw.alignment_of(a_Q) == fftw.alignment_of(b_Q):
+    # Second plan must come from the cache:
+    assert plan2.plan == plan1.plan
+    assert len(fftw._plans) == n + 1
+
+x_Q = np.random.RandomState(42).rand(*N_c) + 1j
+a_Q[:] = x_Q
+b_Q[:] = 2 * x_Q
+plan1.execute()
+plan2.execute()
+assert abs(a_Q - np.fft.fftn(x_Q)).max() < 1e-10
+assert abs(b_Q - 2 * np.fft.fftn(x_Q)).max() < 1e-10
+
+# Real-to-complex and back:
+c_Q = fftw.empty((12, 10, 5), complex)
+c_R = c_Q.view(float)[:, :, :9]
+fplan = fftw.FFTPlan(c_R, c_Q, -1, fftw.ESTIMATE)
+iplan = fftw.FFTPlan(c_Q, c_R, 1, fftw.ESTIMATE)
+c_R[:] = x_Q.real
+fplan.execute()
+assert abs(c_Q - np.fft.rfftn(x_Q.real)).max() < 1e-10
+iplan.execute()
+assert abs(c_R / c_R.size - x_Q.real).max() < 1e-10
+
+if fftw.export_wisdom('fftw-wisdom.txt'):
+    assert os.path.isfile('fftw-wisdom.txt')
+    assert fftw.import_wisdom('fftw-wisdom.txt')
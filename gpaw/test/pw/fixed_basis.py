@@ -0,0 +1,41 @@
+"""Test keeping the plane-wave basis when the unit cell changes."""
+import numpy as np
+from ase.build import bulk
+from gpaw import GPAW, PW
+from gpaw.grid_descriptor import GridDescriptor
+from gpaw.mpi import serial_comm
+from gpaw.wavefunctions.pw import PWDescriptor
+
+# Descriptor for strained cell must agree with a new descriptor
+# for the plane waves they have in common:
+cell_cv = np.array([[4.0, 0.5, -1], [0, 4.5, 2], [-1, 0, 5.0]])
+gd1 = GridDescriptor((20, 20, 24), cell_cv, comm=serial_comm)
+gd2 = GridDescriptor((20, 20, 24), cell_cv * [1.02, 0.99, 1.01],
+                     comm=serial_comm)
+pd1 = PWDescriptor(10.0, gd1, complex)
+pd2 = pd1.new_cell(gd2)
+pd3 = PWDescriptor(10.0, gd2, complex)
+assert (pd2.Q_qG[0] == pd1.Q_qG[0]).all()
+Q_G, G1, G3 = np.intersect1d(pd2.Q_qG[0], pd3.Q_qG[0], return_indices=True)
+assert abs(pd2.G2_qG[0][G1] - pd3.G2_qG[0][G3]).max() < 1e-10
+assert abs(pd2.get_reciprocal_vectors()[G1] -
+           pd3.get_reciprocal_vectors()[G3]).max() < 1e-10
+
+# Wave functions are reused:
+niter = []
+energies = []
+for fixed_basis in [True, False]:
+    si = bulk('Si')
+    si.calc = GPAW(mode=PW(200, fixed_basis=fixed_basis),
+                   kpts=(2, 2, 2),
+                   txt='si-fixed-basis-{}.txt'.format(fixed_basis))
+    si.get_potential_energy()
+    ng = si.calc.wfs.pd.ngmax
+    si.set_cell(si.cell * 1.01, scale_atoms=True)
+    energies.append(si.get_potential_energy())
+    niter.append(si.calc.scf.niter)
+    if fixed_basis:
+        assert si.calc.wfs.pd.ngmax == ng
+print(niter, energies)
+assert niter[0] < niter[1]
+assert abs(energies[0] - energies[1]) < 0.05
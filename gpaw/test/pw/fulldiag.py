@@ -1,3 +1,6 @@
+import os
+
+import numpy as np
 from ase import Atoms
 from gpaw import GPAW, PW
 from gpaw.mpi import world, serial_comm
@@ -48,3 +51,14 @@ for e in [e2, e3, e4]:
     assert err < 1e-9, err
     err = abs(e[-1] - e2[-1])
     assert err < 1e-10, err
+
+# Keep the wave functions in memory-mapped files:
+calc = GPAW('H2', txt=None, parallel={'domain': 1})
+calc.diagonalize_full_hamiltonian(nbands=120, scalapack=scalapack,
+                                  outofcore='scratch')
+assert isinstance(calc.wfs.kpt_u[0].psit_nG, np.memmap)
+assert os.listdir('scratch') == []  # files are already unlinked
+w5 = calc.get_pseudo_wave_function(0)
+e5 = calc.get_eigenvalues()
+assert abs(abs(w5) - abs(w3)).max() < 1e-10
+assert abs(e5 - e3).max() < 1e-10
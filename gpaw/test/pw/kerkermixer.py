@@ -0,0 +1,21 @@
+from ase import Atoms
+from gpaw import GPAW
+from gpaw.mixer import KerkerMixer
+from gpaw.wavefunctions.pw import PW
+from gpaw.test import equal
+
+bulk = Atoms('Li', pbc=True,
+             cell=[2.6, 2.6, 2.6])
+k = 4
+e = {}
+for name, mixer in [('pulay', None), ('kerker', KerkerMixer())]:
+    bulk.calc = GPAW(mode=PW(200),
+                     kpts=(k, k, k),
+                     mixer=mixer,
+                     txt=name + '.txt')
+    e[name] = bulk.get_potential_energy()
+    if name == 'kerker':
+        mixer = bulk.calc.density.mixer
+        assert mixer.basemixers[0].metallic is not None
+        assert 'Kerker screening' in str(mixer)
+equal(e['kerker'], e['pulay'], 2e-5)
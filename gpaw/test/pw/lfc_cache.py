@@ -0,0 +1,49 @@
+"""Test caching of plane-wave expansions in PWLFC."""
+import numpy as np
+
+from gpaw.grid_descriptor import GridDescriptor
+from gpaw.spline import Spline
+import gpaw.mpi as mpi
+from gpaw.wavefunctions.pw import PWDescriptor, PWLFC
+
+x = 2.0
+rc = 3.5
+r = np.linspace(0, rc, 100)
+splines = [Spline(ell, rc, 2 * x**1.5 / np.pi * np.exp(-x * r**2))
+           for ell in range(3)]
+
+gd = GridDescriptor((30, 30, 30), (7.0, 7.0, 7.0), comm=mpi.serial_comm)
+spos_ac = np.array([(0.15, 0.5, 0.95), (0.5, 0.5, 0.5)])
+
+for dtype in [float, complex]:
+    pd = PWDescriptor(20, gd, dtype)
+    rng = np.random.RandomState(42)
+    a_xG = pd.zeros(3)
+    a_xG.real = rng.rand(*a_xG.shape)
+    if dtype == complex:
+        a_xG.imag = rng.rand(*a_xG.shape)
+
+    results = []
+    for cache_size in [0, 2**30, 2**10 * 80]:
+        lfc = PWLFC([splines, splines[:1]], pd, blocksize=200,
+                    cache_size=cache_size)
+        lfc.set_positions(spos_ac)
+        for i in range(3):
+            c_axi = lfc.dict(3)
+            lfc.integrate(a_xG, c_axi)
+            c_axiv = lfc.dict(3, derivative=True)
+            lfc.derivative(a_xG, c_axiv)
+            b_xG = pd.zeros(3)
+            lfc.add(b_xG, c_axi)
+        assert lfc.cache_nbytes <= cache_size
+        results.append((c_axi, c_axiv, b_xG))
+        if cache_size == 2**30:
+            assert lfc.cache_hit_rate() > 0.8
+        print(dtype, cache_size, lfc.cache_hits, lfc.cache_misses)
+
+    c0_axi, c0_axiv, b0_xG = results[0]
+    for c_axi, c_axiv, b_xG in results[1:]:
+        for a in c0_axi:
+            assert abs(c_axi[a] - c0_axi[a]).max() < 1e-12
+            assert abs(c_axiv[a] - c0_axiv[a]).max() < 1e-12
+        assert abs(b_xG - b0_xG).max() < 1e-12
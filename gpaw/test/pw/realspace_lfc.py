@@ -0,0 +1,44 @@
+"""Test real-space application of plane-wave projector functions."""
+import numpy as np
+
+from gpaw.grid_descriptor import GridDescriptor
+from gpaw.kpt_descriptor import KPointDescriptor
+from gpaw.spline import Spline
+import gpaw.mpi as mpi
+from gpaw.wavefunctions.pw import PWDescriptor, PWLFC, RealSpacePWLFC
+
+x = 2.0
+rc = 3.5
+r = np.linspace(0, rc, 100)
+splines = [Spline(ell, rc, 2 * x**1.5 / np.pi * np.exp(-x * r**2))
+           for ell in range(3)]
+
+gd = GridDescriptor((40, 40, 40), (8.0, 8.0, 8.0), comm=mpi.serial_comm)
+spos_ac = np.array([(0.15, 0.5, 0.95), (0.5, 0.5, 0.5)])
+
+for dtype, kd in [(float, None),
+                  (complex, KPointDescriptor([(0.25, 0.25, 0.0)]))]:
+    pd = PWDescriptor(45, gd, dtype, kd)
+    rng = np.random.RandomState(42)
+    a_xG = pd.zeros(11, q=0)
+    a_xG.real = rng.rand(*a_xG.shape)
+    if dtype == complex:
+        a_xG.imag = rng.rand(*a_xG.shape)
+
+    results = []
+    for lfc in [PWLFC([splines, splines[:1]], pd),
+                RealSpacePWLFC([splines, splines[:1]], pd, blocksize=5)]:
+        lfc.set_positions(spos_ac)
+        c_axi = lfc.dict(11)
+        lfc.integrate(a_xG, c_axi, q=0)
+        c_axiv = lfc.dict(11, derivative=True)
+        lfc.derivative(a_xG, c_axiv, q=0)
+        b_xG = pd.zeros(11, q=0)
+        lfc.add(b_xG, c_axi, q=0)
+        results.append((c_axi, c_axiv, b_xG))
+
+    (c1_axi, c1_axiv, b1_xG), (c2_axi, c2_axiv, b2_xG) = results
+    for a in c1_axi:
+        assert abs(c1_axi[a] - c2_axi[a]).max() < 1e-6
+        assert abs(c1_axiv[a] - c2_axiv[a]).max() < 1e-5
+    assert abs(b1_xG - b2_xG).max() < 1e-6 * abs(b1_xG).max()
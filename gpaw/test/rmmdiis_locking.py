@@ -0,0 +1,20 @@
+"""Test RMM-DIIS eigensolver with locking of converged bands."""
+from ase.build import bulk
+from gpaw import GPAW
+from gpaw.eigensolvers import RMMDIIS
+from gpaw.test import equal
+
+energies = []
+for lock in [None, 1e-9]:
+    atoms = bulk('Al')
+    es = RMMDIIS(lock=lock)
+    atoms.calc = GPAW(mode='fd', h=0.25, kpts=(4, 4, 4), nbands=12,
+                      eigensolver=es, txt=None)
+    energies.append(atoms.get_potential_energy())
+    if lock is None:
+        assert es.nlocked == 0
+    else:
+        # Some of the empty bands must have been locked:
+        assert es.nlocked > 0
+
+equal(energies[0], energies[1], 1e-4)
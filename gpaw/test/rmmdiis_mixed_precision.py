@@ -0,0 +1,18 @@
+"""Test RMM-DIIS with residuals and DIIS history in single precision."""
+import numpy as np
+from ase.build import molecule
+from gpaw import GPAW
+from gpaw.eigensolvers import RMMDIIS
+from gpaw.test import equal
+
+for mode in ['fd', 'pw']:
+    energies = []
+    for mixed_precision in [None, 1e-3]:
+        atoms = molecule('H2O', vacuum=2.5)
+        es = RMMDIIS(mixed_precision=mixed_precision)
+        atoms.calc = GPAW(mode=mode, h=0.24, eigensolver=es, txt=None)
+        energies.append(atoms.get_potential_energy())
+        # All iterations after the switch are done in double precision:
+        assert not es.low_precision
+        assert es.Htpsit_nG.dtype in [np.float64, np.complex128]
+    equal(energies[0], energies[1], 1e-4)
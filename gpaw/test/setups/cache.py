@@ -0,0 +1,28 @@
+import os
+
+import numpy as np
+
+from gpaw.mpi import world
+from gpaw.setup import create_setup
+
+os.environ['GPAW_SETUP_CACHE'] = 'setup-cache'
+try:
+    s1 = create_setup('O', 'PBE')  # parse XML and fill cache
+    world.barrier()
+    if world.rank == 0:
+        assert len(os.listdir('setup-cache')) == 2
+    s2 = create_setup('O', 'PBE')  # read from cache
+finally:
+    del os.environ['GPAW_SETUP_CACHE']
+s3 = create_setup('O', 'PBE')
+
+for s in [s1, s2]:
+    assert s.fingerprint == s3.fingerprint
+    assert s.data.l_orb_j == s3.data.l_j
+    assert s.data.id_j == s3.data.id_j
+    for name in ['E', 'M', 'Kc', 'MB', 'dEH0', 'Nct']:
+        assert abs(getattr(s, name) - getattr(s3, name)) < 1e-13, name
+    for name in ['M_p', 'M_pp', 'MB_p', 'dEH_p', 'Delta_pL', 'dO_ii',
+                 'nabla_iiv', 'rnabla_iiv']:
+        assert abs(getattr(s, name) - getattr(s3, name)).max() < 1e-13, name
+    assert np.allclose(s.data.phit_jg, s3.data.phit_jg)
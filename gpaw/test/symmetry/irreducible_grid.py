@@ -0,0 +1,23 @@
+from ase.build import bulk
+from gpaw import GPAW, PW
+from gpaw.test import equal
+
+# XC and mixing on the irreducible grid points should not change the result
+# (the fine-grid density is symmetrized by averaging over each orbit):
+e = []
+for irreducible_grid in [False, True]:
+    atoms = bulk('Si')
+    atoms.calc = GPAW(mode=PW(200),
+                      xc='PBE',
+                      kpts=(2, 2, 2),
+                      symmetry={'irreducible_grid': irreducible_grid},
+                      convergence={'energy': 1e-7},
+                      txt='si-irreducible-grid-%s.txt' % irreducible_grid)
+    e.append(atoms.get_potential_energy())
+    igrid = atoms.calc.density.mixer.igrid
+    if irreducible_grid:
+        assert len(igrid) < igrid.gd.N_c.prod() / 10
+        assert atoms.calc.hamiltonian.xc.igrid is not None
+    else:
+        assert igrid is None
+equal(e[0], e[1], 1e-5)
@@ -1,4 +1,5 @@
-from gpaw.symmetry import map_k_points_fast, map_k_points
+from gpaw.symmetry import (map_k_points_fast, map_k_points,
+                           map_k_points_lattice)
 from ase.dft.kpoints import monkhorst_pack
 from gpaw import GPAW
 from ase.build import bulk
@@ -50,7 +51,13 @@ for gamma in [True, False]:
                                              None,
                                              calc.wfs.kd.symmetry.tol)
 
+            bz2bzlattice_ks = map_k_points_lattice(bzk_kc, U_scc,
+                                                   time_reversal,
+                                                   None,
+                                                   calc.wfs.kd.symmetry.tol)
+
             assert ((bz2bz_ks - bz2bzfast_ks)**2 < 1e-9).all()
+            assert (bz2bz_ks == bz2bzlattice_ks).all()
 
             test_mapping(bz2bz_ks, U_scc, bzk_kc, time_reversal)
             test_mapping(bz2bzfast_ks, U_scc, bzk_kc, time_reversal)
@@ -0,0 +1,35 @@
+import numpy as np
+from ase.build import bulk
+from gpaw import GPAW, PW, FermiDirac
+from gpaw.occupations import TetrahedronMethod, tetrahedron_weights
+from gpaw.test import equal
+
+# Number of electrons must not depend on Bloechl's correction and the
+# derivative must be the density of states:
+e_xi = np.sort(np.random.RandomState(42).rand(20, 4), axis=1)
+for x in np.linspace(-0.1, 1.1, 13):
+    w_xi, dos_x = tetrahedron_weights(e_xi, x, False)
+    w2_xi = tetrahedron_weights(e_xi, x, True)[0]
+    assert abs(w_xi.sum(1) - w2_xi.sum(1)).max() < 1e-14
+    dn_x = (tetrahedron_weights(e_xi, x + 1e-6, False)[0].sum(1) -
+            tetrahedron_weights(e_xi, x - 1e-6, False)[0].sum(1)) / 2e-6
+    assert abs(dn_x - dos_x).max() < 1e-5
+
+e = {}
+ef = {}
+for name, occ in [('fd', FermiDirac(0.1)), ('tm', TetrahedronMethod())]:
+    atoms = bulk('Al')
+    atoms.calc = GPAW(mode=PW(200),
+                      kpts={'size': (6, 6, 6), 'gamma': True},
+                      occupations=occ,
+                      txt=name + '.txt')
+    e[name] = atoms.get_potential_energy()
+    ef[name] = atoms.calc.get_fermi_level()
+    nibzkpts = len(atoms.calc.get_ibz_k_points())
+    f_kn = np.array([atoms.calc.get_occupation_numbers(k)
+                     for k in range(nibzkpts)])
+    equal(f_kn.sum(), 3.0, 1e-8)
+
+print(e, ef)
+equal(e['tm'], e['fd'], 0.05)
+equal(ef['tm'], ef['fd'], 0.2)
@@ -0,0 +1,29 @@
+from ase.build import molecule
+from gpaw import GPAW, PW
+from gpaw.test import equal
+from gpaw.wavefunctions.extrapolation import aspc_coefficients
+
+equal(aspc_coefficients(1), [2.0, -1.0], 1e-12)
+equal(aspc_coefficients(2), [2.5, -2.0, 0.5], 1e-12)
+
+niter = {}
+energies = {}
+for mode in ['fd', 'pw', 'lcao']:
+    for order in [None, 2]:
+        atoms = molecule('H2O', vacuum=2.5)
+        atoms.calc = GPAW(mode=PW(300) if mode == 'pw' else mode,
+                          basis='dzp' if mode == 'lcao' else {},
+                          experimental={'wfs_extrapolation': order},
+                          txt=None)
+        n = 0
+        for step in range(4):
+            atoms.positions[0, 2] += 0.03
+            e = atoms.get_potential_energy()
+            if step > 0:
+                n += atoms.calc.scf.niter
+        niter[mode, order] = n
+        energies[mode, order] = e
+
+for mode in ['fd', 'pw', 'lcao']:
+    equal(energies[mode, None], energies[mode, 2], 1e-3)
+    assert niter[mode, 2] <= niter[mode, None]
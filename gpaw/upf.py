@@ -520,7 +520,7 @@ class UPFSetupData:
             b.bf_j.append(bf)
         return b
 
-    def build(self, xcfunc, lmax, basis, filter=None):
+    def build(self, xcfunc, lmax, basis, filter=None, world=None):
         # XXX better to create basis functions after filtering?
         # Although basis functions are not meant for same grid
         if basis is None:
@@ -1,8 +1,36 @@
+import os
+import tempfile
+
 import numpy as np
 
+from gpaw.io import can_read_blocks, read_block
 from gpaw.matrix import Matrix, create_distribution
 
 
+def empty_memory_mapped(shape, dtype, directory):
+    """Create empty array stored in a file in directory.
+
+    The operating system pages blocks of the array in and out of memory
+    as they are used, so the array can be larger than the available
+    memory.  The file is unlinked right away and its disk space is
+    freed when the array is garbage collected."""
+    if np.prod(shape) == 0:
+        return np.empty(shape, dtype)
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            if not os.path.isdir(directory):  # somebody else made it
+                raise
+    fd, filename = tempfile.mkstemp(prefix='gpaw-', suffix='.mmap',
+                                    dir=directory)
+    os.close(fd)
+    try:
+        return np.memmap(filename, dtype, 'w+', shape=shape)
+    finally:
+        os.remove(filename)
+
+
 class MatrixInFile:
     def __init__(self, M, N, dtype, data, dist):
         self.shape = (M, N)
@@ -78,15 +106,24 @@ class ArrayWaveFunctions:
     def eval(self, matrix):
         matrix.array[:] = self.matrix.array
 
-    def read_from_file(self):
-        """Read wave functions from file into memory."""
+    def read_from_file(self, data=None):
+        """Read wave functions from file into memory.
+
+        Use data (an array with the shape of the local part of the
+        matrix) as storage instead of allocating a new array."""
         matrix = Matrix(*self.matrix.shape,
-                        dtype=self.dtype, dist=self.matrix.dist)
+                        dtype=self.dtype, data=data, dist=self.matrix.dist)
+        # Each rank reads its own part of the file if the wave functions
+        # are distributed over domains or plane waves:
+        direct = self.comm.size > 1 and self._can_read_slabs()
         # Read band by band to save memory
         rows = matrix.dist.rows
         blocksize = (matrix.shape[0] + rows - 1) // rows
         for myn, psit_G in enumerate(matrix.array):
             n = matrix.dist.comm.rank * blocksize + myn
+            if direct:
+                self._read_slab(n, psit_G)
+                continue
             if self.comm.rank == 0:
                 big_psit_G = self.array[n]
                 if big_psit_G.dtype == complex and self.dtype == float:
@@ -129,6 +166,15 @@ class UniformGridWaveFunctions(ArrayWaveFunctions):
     def _distribute(self, big_psit_R, psit_R):
         self.gd.distribute(big_psit_R, psit_R.reshape(self.gd.n_c))
 
+    def _can_read_slabs(self):
+        return (can_read_blocks(self.array) and
+                self.array.dtype == self.dtype)
+
+    def _read_slab(self, n, psit_R):
+        start_c = tuple(s.start for s in self.gd.get_slice())
+        psit_R[:] = read_block(self.array, (n,) + start_c,
+                               (1,) + tuple(self.gd.n_c)).ravel()
+
     def __repr__(self):
         s = ArrayWaveFunctions.__repr__(self).split('(')[1][:-1]
         shape = self.gd.get_size_of_global_array()
@@ -203,6 +249,20 @@ class PlaneWaveExpansionWaveFunctions(ArrayWaveFunctions):
             psit_sG[0] = self.pd.scatter(big_psit_G[0], self.kpt)
             psit_sG[1] = self.pd.scatter(big_psit_G[1], self.kpt)
 
+    def _can_read_slabs(self):
+        return can_read_blocks(self.array)
+
+    def _read_slab(self, n, psit_G):
+        G1 = self.comm.rank * self.pd.maxmyng
+        myng = self.pd.myng_q[self.kpt]
+        if self.collinear:
+            start, shape = (n, G1), (1, myng)
+        else:
+            start, shape = (n, 0, G1), (1, 2, myng)
+        if self.dtype == float:
+            psit_G = psit_G.view(complex)
+        psit_G[:] = read_block(self.array, start, shape).ravel()
+
     def matrix_elements(self, other=None, out=None, symmetric=False, cc=False,
                         operator=None, result=None, serial=False):
         if other is None or isinstance(other, ArrayWaveFunctions):
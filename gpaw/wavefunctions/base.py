@@ -5,6 +5,7 @@ from gpaw.projections import Projections
 from gpaw.utilities import pack, unpack2
 from gpaw.utilities.blas import gemm, axpy
 from gpaw.utilities.partition import AtomPartition
+from gpaw.wavefunctions.extrapolation import NullWfsExtrapolation
 
 
 class WaveFunctions:
@@ -53,6 +54,7 @@ class WaveFunctions:
         self.mykpts = kd.create_k_points(self.gd, collinear)
 
         self.eigensolver = None
+        self.extrapolation = NullWfsExtrapolation()
         self.positions_set = False
         self.spos_ac = None
 
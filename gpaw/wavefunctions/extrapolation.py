@@ -0,0 +1,111 @@
+"""Extrapolation of wave functions between ionic steps."""
+from collections import deque
+
+import numpy as np
+from scipy.special import binom
+
+from gpaw.mpi import serial_comm
+
+
+def aspc_coefficients(order):
+    """Coefficients for Kolafa's always stable predictor.
+
+    Returns the B_j coefficients for j=1, ..., order + 1 to be used
+    like this::
+
+               --
+      x(t+1) = >  B  x(t+1-j)
+               --  j
+               j
+
+    where x(t) is the newest and x(t-order) the oldest entry in the
+    history.  See J. Kolafa, J. Comput. Chem. 25, 335 (2004).
+    """
+    k = order - 1
+    return np.array([(-1)**(j + 1) * j * binom(2 * k + 4, k + 2 - j) /
+                     binom(2 * k + 2, k + 1)
+                     for j in range(1, order + 2)])
+
+
+def align(a_nx, b_nx, comm):
+    """Rotate b_nx so that it resembles a_nx as much as possible.
+
+    The unitary transformation is found from the polar decomposition
+    of the overlap matrix between the two sets of vectors.  This
+    removes the arbitrary mixing of (nearly) degenerate states
+    between two ionic steps."""
+    A_nx = a_nx.reshape((len(a_nx), -1))
+    B_nx = b_nx.reshape((len(b_nx), -1))
+    O_nn = np.dot(B_nx.conj(), A_nx.T)
+    comm.sum(O_nn)
+    W_nn, _, V_nn = np.linalg.svd(O_nn)
+    U_nn = np.dot(W_nn, V_nn)
+    return np.dot(U_nn.T, B_nx).reshape(b_nx.shape)
+
+
+class NullWfsExtrapolation:
+    description = 'No extrapolation from previous steps'
+    order = 0
+
+    def extrapolate(self, wfs):
+        pass
+
+    def reset(self):
+        pass
+
+
+class WfsExtrapolation:
+    """Extrapolate wave functions using previous ionic steps.
+
+    The wave-function coefficients (psit_nG in FD and PW mode and C_nM
+    in LCAO mode) from the last ``order + 1`` steps are kept in a
+    ring buffer.  Before extrapolating, the old coefficients are
+    rotated to best match the newest ones.  The resulting guess is
+    not orthonormal, so it must be orthonormalized before use.
+
+    For FD and PW mode, extrapolation takes place between cutting
+    and pasting of the atom-centered part of the wave functions
+    (see ``reuse_wfs_method``) so that only the smooth remainder
+    is extrapolated.
+    """
+    def __init__(self, order=2):
+        if order not in [1, 2]:
+            raise ValueError('Extrapolation order must be 1 or 2, not {}'
+                             .format(order))
+        self.order = order
+        self.description = ('Order-{} extrapolation from previous steps'
+                            .format(order))
+        self.history_u = None
+
+    def reset(self):
+        self.history_u = None
+
+    def extrapolate(self, wfs):
+        if wfs.bd.comm.size > 1:
+            raise NotImplementedError('Extrapolation of wave functions '
+                                      'with band parallelization')
+        if wfs.mode == 'lcao':
+            array_u = [kpt.C_nM for kpt in wfs.mykpts]
+            comm = serial_comm
+        else:
+            array_u = [kpt.psit.array for kpt in wfs.mykpts]
+            comm = wfs.gd.comm
+
+        if self.history_u is None:
+            self.history_u = [deque(maxlen=self.order + 1) for _ in array_u]
+
+        with wfs.timer('Extrapolate wfs'):
+            for a_nx, history in zip(array_u, self.history_u):
+                history.appendleft(a_nx.copy())
+                if len(history) == 1:
+                    continue
+                B_j = aspc_coefficients(len(history) - 1)
+                a_nx *= B_j[0]
+                for B, b_nx in zip(B_j[1:], list(history)[1:]):
+                    a_nx += B * align(history[0], b_nx, comm)
+
+
+def create_wfs_extrapolation(order):
+    if not order:
+        return NullWfsExtrapolation()
+    return WfsExtrapolation(order)
@@ -2,6 +2,7 @@ import numpy as np
 from ase.units import Bohr
 
 from gpaw.fd_operators import Laplace, Gradient
+from gpaw.io import parallel_array_writer
 from gpaw.kpoint import KPoint
 from gpaw.kpt_descriptor import KPointDescriptor
 from gpaw.lfc import LocalizedFunctionsCollection as LFC
@@ -20,6 +21,15 @@ class FD(Mode):
     name = 'fd'
 
     def __init__(self, nn=3, interpolation=3, force_complex_dtype=False):
+        if nn == 'M':
+            # The Mehrstellen discretization of the Kohn-Sham equation,
+            # -A/2 psi + B v psi = eps B psi, is a non-Hermitian
+            # generalized eigenvalue problem with a singular B, which
+            # the eigensolvers can not handle.  It is also only O(h^4).
+            raise ValueError('The Mehrstellen stencil can only be used '
+                             'for the Poisson equation.  Use nn=3 (the '
+                             'default, O(h^6)) or larger for the kinetic '
+                             'energy.')
         self.nn = nn
         self.interpolation = interpolation
         Mode.__init__(self, force_complex_dtype)
@@ -216,11 +226,22 @@ class FDWaveFunctions(FDPWWaveFunctions):
         if not write_wave_functions:
             return
 
-        writer.add_array(
-            'values',
-            (self.nspins, self.kd.nibzkpts, self.bd.nbands) +
-            tuple(self.gd.get_size_of_global_array()),
-            self.dtype)
+        shape = ((self.nspins, self.kd.nibzkpts, self.bd.nbands) +
+                 tuple(self.gd.get_size_of_global_array()))
+        aw = parallel_array_writer(writer, self.world, 'values',
+                                   shape, self.dtype)
+        if aw is not None:
+            # Each rank writes its own bands and domain:
+            start_c = tuple(s.start for s in self.gd.get_slice())
+            for kpt in self.mykpts:
+                for myn, psit_G in enumerate(kpt.psit_nG):
+                    n = self.bd.global_index(myn)
+                    aw.write((kpt.s, kpt.k, n) + start_c,
+                             psit_G * Bohr**-1.5)
+            aw.close()
+            return
+
+        writer.add_array('values', shape, self.dtype)
 
         for s in range(self.nspins):
             for k in range(self.kd.nibzkpts):
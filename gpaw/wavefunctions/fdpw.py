@@ -235,8 +235,9 @@ class FDPWWaveFunctions(WaveFunctions):
         comm, r, c, b = self.scalapack_parameters
         L1 = ('  ScaLapack parameters: grid={}x{}, blocksize={}'
               .format(r, c, b))
-        L2 = ('  Wavefunction extrapolation:\n    {}'
-              .format(self.wfs_mover.description))
+        L2 = ('  Wavefunction extrapolation:\n    {}\n    {}'
+              .format(self.wfs_mover.description,
+                      self.extrapolation.description))
         return '\n'.join([L1, L2])
 
     def set_setups(self, setups):
@@ -251,6 +252,7 @@ class FDPWWaveFunctions(WaveFunctions):
 
         if move_wfs:
             paste_wfs = self.wfs_mover.cut_wfs(self, spos_ac)
+            self.extrapolation.extrapolate(self)
 
         # This will update the positions -- and transfer, if necessary --
         # the projection matrices which may be necessary for updating
@@ -132,6 +132,7 @@ class LCAOWaveFunctions(WaveFunctions):
         s = 'Wave functions: LCAO\n'
         s += '  Diagonalizer: %s\n' % self.ksl.get_description()
         s += '  Atomic Correction: %s\n' % self.atomic_correction.description
+        s += '  Extrapolation: %s\n' % self.extrapolation.description
         s += '  Datatype: %s\n' % self.dtype.__name__
         return s
 
@@ -179,6 +180,9 @@ class LCAOWaveFunctions(WaveFunctions):
                           self.kd.ibzk_qc, spos_ac, oldspos_ac,
                           self.setups, Mstart)
 
+        if oldspos_ac is not None and self.kpt_u[0].C_nM is not None:
+            self.extrapolation.extrapolate(self)
+
         for kpt in self.kpt_u:
             if kpt.C_nM is None:
                 kpt.C_nM = np.empty((mynbands, nao), self.dtype)
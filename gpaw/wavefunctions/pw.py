@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 from __future__ import division
 import numbers
+import os
+from collections import OrderedDict
 from math import pi
 from math import factorial as fac
 
@@ -14,18 +16,22 @@ from gpaw.arraydict import ArrayDict
 from gpaw.band_descriptor import BandDescriptor
 from gpaw.blacs import BlacsGrid, BlacsDescriptor, Redistributor
 from gpaw.density import Density
-from gpaw.lfc import BaseLFC
+from gpaw.lfc import BaseLFC, LFC
 from gpaw.lcao.overlap import fbt
 from gpaw.hamiltonian import Hamiltonian
+from gpaw.io import parallel_array_writer
+from gpaw.matrix import create_distribution
 from gpaw.matrix_descriptor import MatrixDescriptor
 from gpaw.spherical_harmonics import Y, nablarlYL
 from gpaw.spline import Spline
 from gpaw.utilities import unpack
 from gpaw.utilities.blas import rk, r2k, axpy, mmm
 from gpaw.utilities.progressbar import ProgressBar
+from gpaw.utilities.timing import nulltimer
 from gpaw.wavefunctions.fdpw import FDPWWaveFunctions
 from gpaw.wavefunctions.mode import Mode
-from gpaw.wavefunctions.arrays import PlaneWaveExpansionWaveFunctions
+from gpaw.wavefunctions.arrays import (PlaneWaveExpansionWaveFunctions,
+                                       empty_memory_mapped)
 import _gpaw
 
 
@@ -48,7 +54,8 @@ class PW(Mode):
     def __init__(self, ecut=340, fftwflags=fftw.MEASURE, cell=None,
                  gammacentered=False,
                  pulay_stress=None, dedecut=None,
-                 force_complex_dtype=False):
+                 force_complex_dtype=False, fixed_basis=False,
+                 realspace_projectors=False):
         """Plane-wave basis mode.
 
         ecut: float
@@ -69,6 +76,18 @@ class PW(Mode):
 
         cell: 3x3 ndarray
             Use this unit cell to chose the planewaves.
+        fixed_basis: bool
+            Keep the set of plane waves and the wave functions when the
+            unit cell changes (variable-cell relaxations).  The number of
+            grid points is also kept.  The stress tensor is then the
+            derivative of the energy for a fixed basis set, so
+            pulay_stress and dedecut can't be used.
+        realspace_projectors: bool
+            Apply the projector functions on the real-space FFT grid
+            instead of expanding them in plane waves.  The cost then
+            scales linearly with the number of atoms, but the results
+            are less accurate: the projectors are not filtered in PW
+            mode, so there is an egg-box effect.  Default is False.
 
         Only one of dedecut and pulay_stress can be used.
         """
@@ -84,6 +103,12 @@ class PW(Mode):
 
         assert pulay_stress is None or dedecut is None
 
+        if fixed_basis and not (pulay_stress is None and dedecut is None):
+            raise ValueError('Pulay-stress correction does not make sense '
+                             'for a fixed plane-wave basis')
+        self.fixed_basis = fixed_basis
+        self.realspace_projectors = realspace_projectors
+
         if cell is None:
             self.cell_cv = None
         else:
@@ -112,6 +137,8 @@ class PW(Mode):
         wfs = PWWaveFunctions(ecut, self.gammacentered,
                               self.fftwflags, dedepsilon,
                               parallel, initksl, gd=gd,
+                              fixed_basis=self.fixed_basis,
+                              realspace_projectors=self.realspace_projectors,
                               **kwargs)
 
         return wfs
@@ -127,6 +154,10 @@ class PW(Mode):
             dct['pulay_stress'] = self.pulay_stress * Ha / Bohr**3
         if self.dedecut is not None:
             dct['dedecut'] = self.dedecut
+        if self.fixed_basis:
+            dct['fixed_basis'] = True
+        if self.realspace_projectors:
+            dct['realspace_projectors'] = True
         return dct
 
 
@@ -185,6 +216,9 @@ class PWDescriptor:
         self.fftplan = fftw.FFTPlan(self.tmp_R, self.tmp_Q, -1, fftwflags)
         self.ifftplan = fftw.FFTPlan(self.tmp_Q, self.tmp_R, 1, fftwflags)
 
+        # Buffers and plans for transforming blocks of functions:
+        self.block_plans = {}
+
         # Calculate reciprocal lattice vectors:
         B_cv = 2.0 * pi * gd.icell_cv
         i_Qc.shape = (-1, 3)
@@ -249,6 +283,27 @@ class PWDescriptor:
         else:
             self.tmp_G = None
 
+    def new_cell(self, gd):
+        """Create descriptor for a strained unit cell.
+
+        The new descriptor has the same set of plane waves (same integer
+        G-vectors) as this one and shares index arrays, buffers and FFT
+        plans with it.  Only the metric dependent arrays (G_Qv, K_qv and
+        G2_qG) are recalculated."""
+        assert (gd.N_c == self.gd.N_c).all()
+        assert gd.comm is self.comm
+        pd = PWDescriptor.__new__(PWDescriptor)
+        pd.__dict__.update(self.__dict__)
+        pd.gd = gd
+        # Transform G-vectors with fixed coordinates in reciprocal space
+        # to the new reciprocal lattice:
+        M_vv = np.dot(self.gd.cell_cv.T, gd.icell_cv)
+        pd.G_Qv = np.dot(self.G_Qv, M_vv)
+        pd.K_qv = np.dot(self.K_qv, M_vv)
+        pd.G2_qG = [((pd.G_Qv[myQ_G] + K_v)**2).sum(axis=1)
+                    for myQ_G, K_v in zip(self.myQ_qG, pd.K_qv)]
+        return pd
+
     def get_reciprocal_vectors(self, q=0, add_q=True):
         """Returns reciprocal lattice vectors plus q, G + q,
         in xyz coordinates."""
@@ -370,6 +425,59 @@ class PWDescriptor:
             return self.tmp_R
         return self.gd.distribute(self.tmp_R)
 
+    def get_block_plans(self, nblock):
+        """Buffers and plans for nblock simultaneous transforms.
+
+        Returns tmp_xR, tmp_xQ, fftplan and ifftplan."""
+        plans = self.block_plans.get(nblock)
+        if plans is None:
+            shape = (nblock,) + self.tmp_Q.shape
+            tmp_xQ = fftw.empty(shape, complex)
+            if self.dtype == float:
+                tmp_xR = tmp_xQ.view(float)[..., :self.gd.N_c[2]]
+            else:
+                tmp_xR = tmp_xQ
+            fftplan = fftw.FFTPlan(tmp_xR, tmp_xQ, -1, self.fftwflags)
+            ifftplan = fftw.FFTPlan(tmp_xQ, tmp_xR, 1, self.fftwflags)
+            plans = (tmp_xR, tmp_xQ, fftplan, ifftplan)
+            self.block_plans[nblock] = plans
+        return plans
+
+    def block_fft(self, f_xR, q=None):
+        """Fast Fourier transform of a block of functions.
+
+        Same as calling fft(f_R, q, local=True) for each f_R in f_xR.
+        The array returned by block_ifft() can be passed in directly
+        (possibly modified in-place) to avoid a copy."""
+        nblock = len(f_xR)
+        tmp_xR, tmp_xQ, fftplan, ifftplan = self.get_block_plans(nblock)
+        if f_xR is not tmp_xR:
+            tmp_xR[:] = f_xR
+        fftplan.execute()
+        return tmp_xQ.reshape((nblock, -1))[:, self.Q_qG[q or 0]]
+
+    def block_ifft(self, c_xG, q=None):
+        """Inverse fast Fourier transform of a block of functions.
+
+        Same as calling ifft(c_G, q, local=True, safe=False) for each c_G
+        in c_xG, but all the FFT's are done with a single FFTW plan.
+        The returned array will be overwritten by the next call."""
+        q = q or 0
+        tmp_xR, tmp_xQ, fftplan, ifftplan = self.get_block_plans(len(c_xG))
+        scale = 1.0 / self.tmp_R.size
+        Q_G = self.Q_qG[q]
+        for c_G, tmp_Q in zip(c_xG, tmp_xQ):
+            _gpaw.pw_insert(c_G, Q_G, scale, tmp_Q)
+        if self.dtype == float:
+            t = tmp_xQ[:, :, :, 0]
+            n, m = self.gd.N_c[:2] // 2 - 1
+            t[:, 0, -m:] = t[:, 0, m:0:-1].conj()
+            t[:, n:0:-1, -m:] = t[:, -n:, m:0:-1].conj()
+            t[:, -n:, -m:] = t[:, n:0:-1, m:0:-1].conj()
+            t[:, -n:, 0] = t[:, n:0:-1, 0].conj()
+        ifftplan.execute()
+        return tmp_xR
+
     def scatter(self, a_G, q=None):
         """Scatter coefficients from master to all cores."""
         comm = self.gd.comm
@@ -726,15 +834,30 @@ class NonCollinearPreconditioner(Preconditioner):
 class PWWaveFunctions(FDPWWaveFunctions):
     mode = 'pw'
 
+    # Number of bands to FFT in one go (when there is no domain
+    # decomposition):
+    fft_block_size = 8
+
+    # Number of bytes to use for caching expansions of the projector
+    # functions in plane waves:
+    projector_cache_size = 64 * 1024**2
+
     def __init__(self, ecut, gammacentered, fftwflags, dedepsilon,
                  parallel, initksl,
                  reuse_wfs_method, collinear,
                  gd, nvalence, setups, bd, dtype,
-                 world, kd, kptband_comm, timer):
+                 world, kd, kptband_comm, timer, fixed_basis=False,
+                 realspace_projectors=False):
         self.ecut = ecut
         self.gammacentered = gammacentered
         self.fftwflags = fftwflags
         self.dedepsilon = dedepsilon  # Pulay correction for stress tensor
+        self.fixed_basis = fixed_basis  # keep basis when cell changes
+        self.realspace_projectors = realspace_projectors
+        self.pd = None
+
+        # Directory for memory-mapped wave functions (None: keep in memory):
+        self.outofcore = os.environ.get('GPAW_OUTOFCORE') or None
 
         self.ng_k = None  # number of G-vectors for all IBZ k-points
 
@@ -760,14 +883,37 @@ class PWWaveFunctions(FDPWWaveFunctions):
     def integrate(self, a_xg, b_yg=None, global_integral=True):
         return self.pd.integrate(a_xg, b_yg, global_integral)
 
+    def empty_coefficients(self, shape, dtype=complex):
+        """Allocate storage for wave-function coefficients.
+
+        The array is memory-mapped to a file in the self.outofcore
+        directory if that is set."""
+        if self.outofcore is None:
+            return np.empty(shape, dtype)
+        return empty_memory_mapped(shape, dtype, self.outofcore)
+
+    def empty_wave_functions(self, kpt, dist):
+        """Create wave functions for kpt with uninitialized coefficients.
+
+        The coefficients are allocated with empty_coefficients()."""
+        ng = self.pd.myng_q[kpt.q]
+        if not self.collinear:
+            ng *= 2
+        nrows = create_distribution(self.bd.nbands, ng, *dist).shape[0]
+        return PlaneWaveExpansionWaveFunctions(
+            self.bd.nbands, self.pd, self.dtype,
+            self.empty_coefficients((nrows, ng)),
+            kpt=kpt.q, dist=dist, spin=kpt.s, collinear=self.collinear)
+
     def bytes_per_wave_function(self):
         return 16 * self.pd.ngmax
 
     def set_setups(self, setups):
-        self.timer.start('PWDescriptor')
-        self.pd = PWDescriptor(self.ecut, self.gd, self.dtype, self.kd,
-                               self.fftwflags, self.gammacentered)
-        self.timer.stop('PWDescriptor')
+        if self.pd is None or self.pd.gd is not self.gd:
+            self.timer.start('PWDescriptor')
+            self.pd = PWDescriptor(self.ecut, self.gd, self.dtype, self.kd,
+                                   self.fftwflags, self.gammacentered)
+            self.timer.stop('PWDescriptor')
 
         # Build array of number of plane wave coefficiants for all k-points
         # in the IBZ:
@@ -777,7 +923,13 @@ class PWWaveFunctions(FDPWWaveFunctions):
                 self.ng_k[kpt.k] = len(self.pd.Q_qG[kpt.q])
         self.kd.comm.sum(self.ng_k)
 
-        self.pt = PWLFC([setup.pt_j for setup in setups], self.pd)
+        spline_aj = [setup.pt_j for setup in setups]
+        if self.realspace_projectors:
+            self.pt = RealSpacePWLFC(spline_aj, self.pd, timer=self.timer)
+        else:
+            self.pt = PWLFC(spline_aj, self.pd,
+                            cache_size=self.projector_cache_size,
+                            timer=self.timer)
 
         FDPWWaveFunctions.set_setups(self, setups)
 
@@ -785,6 +937,39 @@ class PWWaveFunctions(FDPWWaveFunctions):
             dedecut = self.setups.estimate_dedecut(self.ecut)
             self.dedepsilon = dedecut * 2 / 3 * self.ecut
 
+    def set_cell(self, cell_cv):
+        """Change the unit cell keeping the plane-wave basis set.
+
+        The plane-wave coefficients of the wave functions are kept and
+        scaled so that the wave functions stay normalized.  Call
+        set_setups() afterwards to update the projector functions."""
+        gd = self.gd.new_descriptor(cell_cv=cell_cv)
+        self.timer.start('PWDescriptor')
+        self.pd = self.pd.new_cell(gd)
+        self.timer.stop('PWDescriptor')
+        scale = (self.gd.volume / gd.volume)**0.5
+        self.gd = gd
+        for kpt in self.mykpts:
+            if kpt.psit is None:
+                continue
+            if not kpt.psit.in_memory:
+                kpt.psit.read_from_file()
+            psit_nG = kpt.psit.array
+            psit_nG *= scale
+            kpt.psit = PlaneWaveExpansionWaveFunctions(
+                self.bd.nbands, self.pd, self.dtype, psit_nG,
+                kpt=kpt.q, dist=(self.bd.comm, self.bd.comm.size),
+                spin=kpt.s, collinear=self.collinear)
+
+    def summary(self, log):
+        FDPWWaveFunctions.summary(self, log)
+        pt = self.pt
+        if pt.cache_size:
+            log('Projector expansions: {:.1f} % from cache '
+                '({} hits, {} misses, {:.1f} MiB used)\n'
+                .format(100 * pt.cache_hit_rate(), pt.cache_hits,
+                        pt.cache_misses, pt.cache_nbytes / 1024**2))
+
     def get_pseudo_partial_waves(self):
         return PWLFC([setup.get_partial_waves_for_atomic_orbitals()
                       for setup in self.setups], self.pd)
@@ -804,6 +989,10 @@ class PWWaveFunctions(FDPWWaveFunctions):
         dedecut = 1.5 * self.dedepsilon / self.ecut
         s += ('  Pulay-stress correction: {:.6f} eV/Ang^3 '
               '(de/decut={:.6f})\n'.format(stress, dedecut))
+        if isinstance(self.pt, RealSpacePWLFC):
+            s += '  Projectors: real space (FFT grid)\n'
+        else:
+            s += '  Projectors: reciprocal space\n'
 
         if fftw.FFTPlan is fftw.NumpyFFTPlan:
             s += "  Using Numpy's FFT\n"
@@ -830,6 +1019,19 @@ class PWWaveFunctions(FDPWWaveFunctions):
         Q_G = self.pd.Q_qG[kpt.q]
         T_G = 0.5 * self.pd.G2_qG[kpt.q]
 
+        if S == 1:
+            B = self.fft_block_size
+            for n1 in range(0, N, B):
+                n2 = min(n1 + B, N)
+                with self.timer('HMM T'):
+                    np.multiply(T_G, psit_xG[n1:n2], Htpsit_xG[n1:n2])
+                psit_xR = self.pd.block_ifft(psit_xG[n1:n2], kpt.q)
+                psit_xR *= vt_R
+                Htpsit_xG[n1:n2] += self.pd.block_fft(psit_xR, kpt.q)
+            ham.xc.apply_orbital_dependent_hamiltonian(
+                kpt, psit_xG, Htpsit_xG, ham.dH_asp)
+            return
+
         for n1 in range(0, N, S):
             n2 = min(n1 + S, N)
             psit_G = self.pd.alltoall1(psit_xG[n1:n2], kpt.q)
@@ -868,6 +1070,16 @@ class PWWaveFunctions(FDPWWaveFunctions):
 
         comm = self.gd.comm
 
+        if comm.size == 1:
+            nt_R = nt_xR[kpt.s]
+            B = self.fft_block_size
+            for n1 in range(0, self.bd.mynbands, B):
+                n2 = min(n1 + B, self.bd.mynbands)
+                psit_xR = self.pd.block_ifft(kpt.psit.array[n1:n2], kpt.q)
+                for f, psit_R in zip(f_n[n1:n2], psit_xR):
+                    _gpaw.add_to_density(f, psit_R, nt_R)
+            return
+
         nt_R = self.gd.zeros(global_array=True)
 
         for n1 in range(0, self.bd.mynbands, comm.size):
@@ -998,16 +1210,28 @@ class PWWaveFunctions(FDPWWaveFunctions):
         else:
             shape = (self.kd.nibzkpts, self.bd.nbands, 2, self.pd.ngmax)
 
-        writer.add_array('coefficients', shape, complex)
-
         c = Bohr**-1.5
-        for s in range(self.nspins):
-            for k in range(self.kd.nibzkpts):
-                for n in range(self.bd.nbands):
-                    psit_G = self.get_wave_function_array(n, k, s,
-                                                          realspace=False,
-                                                          cut=False)
-                    writer.fill(psit_G * c)
+        aw = parallel_array_writer(writer, self.world, 'coefficients',
+                                   shape, complex)
+        if aw is not None:
+            # Each rank writes its own bands and plane waves:
+            G1 = self.gd.comm.rank * self.pd.maxmyng
+            for kpt in self.mykpts:
+                for myn, psit_G in enumerate(kpt.psit_nG):
+                    n = self.bd.global_index(myn)
+                    if self.collinear:
+                        aw.write((kpt.s, kpt.k, n, G1), psit_G * c)
+                    else:
+                        aw.write((kpt.k, n, 0, G1), psit_G * c)
+            aw.close()
+        else:
+            writer.add_array('coefficients', shape, complex)
+            for s in range(self.nspins):
+                for k in range(self.kd.nibzkpts):
+                    for n in range(self.bd.nbands):
+                        psit_G = self.get_wave_function_array(
+                            n, k, s, realspace=False, cut=False)
+                        writer.fill(psit_G * c)
 
         writer.add_array('indices', (self.kd.nibzkpts, self.pd.ngmax),
                          np.int32)
@@ -1067,7 +1291,9 @@ class PWWaveFunctions(FDPWWaveFunctions):
         if self.world.size > 1:
             # Read to memory:
             for kpt in self.kpt_u:
-                kpt.psit.read_from_file()
+                kpt.psit.read_from_file(
+                    self.empty_coefficients(kpt.psit.matrix.dist.shape,
+                                            kpt.psit.dtype))
 
     def hs(self, ham, q=-1, s=0, md=None):
         npw = len(self.pd.Q_qG[q])
@@ -1117,7 +1343,15 @@ class PWWaveFunctions(FDPWWaveFunctions):
     @timer('Full diag')
     def diagonalize_full_hamiltonian(self, ham, atoms, occupations, log,
                                      nbands=None, ecut=None, scalapack=None,
-                                     expert=False):
+                                     expert=False, outofcore=None):
+        """Find nbands eigenstates by direct diagonalization.
+
+        The eigenvectors are stored in memory-mapped files in the
+        outofcore directory if given (default is the directory set by
+        the $GPAW_OUTOFCORE environment variable, if any)."""
+
+        if outofcore is not None:
+            self.outofcore = outofcore
 
         if self.dtype != complex:
             raise ValueError(
@@ -1149,6 +1383,9 @@ class PWWaveFunctions(FDPWWaveFunctions):
         self.bd = bd = BandDescriptor(nbands, self.bd.comm)
 
         log('Diagonalizing full Hamiltonian ({} lowest bands)'.format(nbands))
+        if self.outofcore is not None:
+            log('Wave functions stored in memory-mapped files in',
+                self.outofcore)
         log('Matrix size (min, max): {}, {}'.format(self.pd.ngmin,
                                                     self.pd.ngmax))
         mem = 3 * self.pd.ngmax**2 * 16 / S / 1024**2
@@ -1223,12 +1460,14 @@ class PWWaveFunctions(FDPWWaveFunctions):
                 r = Redistributor(bd.comm, md2, md3)
                 psit_nG = r.redistribute(psit_nG)
 
+            data = self.empty_coefficients((bd.mynbands, npw))
+            data[:] = psit_nG[:bd.mynbands]
+            del psit_nG
+
             kpt.psit = PlaneWaveExpansionWaveFunctions(
-                self.bd.nbands, self.pd, self.dtype,
-                psit_nG[:bd.mynbands].copy(),
+                self.bd.nbands, self.pd, self.dtype, data,
                 kpt=kpt.q, dist=(self.bd.comm, self.bd.comm.size),
                 spin=kpt.s, collinear=self.collinear)
-            del psit_nG
 
             with self.timer('Projections'):
                 self.pt.integrate(kpt.psit_nG, kpt.P_ani, kpt.q)
@@ -1250,10 +1489,7 @@ class PWWaveFunctions(FDPWWaveFunctions):
             else:
                 k_c = self.kd.ibzk_kc[kpt.k]
                 emikr_R = self.gd.plane_wave(-k_c)
-            kpt.psit = PlaneWaveExpansionWaveFunctions(
-                self.bd.nbands, self.pd, self.dtype, kpt=kpt.q,
-                dist=(self.bd.comm, -1, 1),
-                spin=kpt.s, collinear=self.collinear)
+            kpt.psit = self.empty_wave_functions(kpt, (self.bd.comm, -1, 1))
             psit_nG = kpt.psit.array
             for n, psit_G in enumerate(psit_nG.reshape((-1,
                                                         psit_nG.shape[-1]))):
@@ -1267,10 +1503,8 @@ class PWWaveFunctions(FDPWWaveFunctions):
         rs = np.random.RandomState(self.world.rank)
         for kpt in self.kpt_u:
             if kpt.psit is None:
-                kpt.psit = PlaneWaveExpansionWaveFunctions(
-                    self.bd.nbands, self.pd, self.dtype, kpt=kpt.q,
-                    dist=(self.bd.comm, -1, 1),
-                    spin=kpt.s, collinear=self.collinear)
+                kpt.psit = self.empty_wave_functions(
+                    kpt, (self.bd.comm, -1, 1))
 
             array = kpt.psit.array[mynao:]
             weight_G = 1.0 / (1.0 + self.pd.G2_qG[kpt.q])
@@ -1325,7 +1559,8 @@ def ft(spline):
 
 
 class PWLFC(BaseLFC):
-    def __init__(self, spline_aj, pd, blocksize=5000, comm=None):
+    def __init__(self, spline_aj, pd, blocksize=5000, comm=None,
+                 cache_size=0, timer=None):
         """Reciprocal-space plane-wave localized function collection.
 
         spline_aj: list of list of spline objects
@@ -1337,10 +1572,24 @@ class PWLFC(BaseLFC):
             doing all G-vectors in one big block.
         comm: communicator
             Communicator for operations that support parallelization
-            over planewaves (only integrate so far)."""
+            over planewaves (only integrate so far).
+        cache_size: int
+            Number of bytes to use for keeping expansions of the functions
+            in plane waves (see expand()).  The least recently used
+            expansions are thrown away first.  Default is no caching.
+        timer: Timer object
+            Expansions that are not found in the cache are timed as
+            'Expand'."""
 
         self.pd = pd
         self.spline_aj = spline_aj
+        self.timer = timer or nulltimer
+
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # (q, G1, G2, cc) -> f_GI
+        self.cache_nbytes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
 
         self.dtype = pd.dtype
 
@@ -1434,6 +1683,8 @@ class PWLFC(BaseLFC):
         nbytes = ((len(splines) + (lmax + 1)**2) *
                   sum(G2_G.nbytes for G2_G in self.pd.G2_qG))
         mem.subnode('Arrays', nbytes)
+        if self.cache_size:
+            mem.subnode('Cache', self.cache_size)
 
     def get_function_count(self, a):
         return sum(2 * spline.get_angular_momentum_number() + 1
@@ -1449,6 +1700,8 @@ class PWLFC(BaseLFC):
 
         self.pos_av = np.dot(spos_ac, self.pd.gd.cell_cv)
 
+        self.clear_cache()
+
         del self.emiGR_qGa[:]
         G_Qv = self.pd.G_Qv
         for Q_G in self.pd.myQ_qG:
@@ -1472,6 +1725,17 @@ class PWLFC(BaseLFC):
             I1 = I2
         self.nI = I1
 
+    def clear_cache(self):
+        self.cache.clear()
+        self.cache_nbytes = 0
+
+    def cache_hit_rate(self):
+        """Fraction of calls to expand() that were served from the cache."""
+        ncalls = self.cache_hits + self.cache_misses
+        if ncalls == 0:
+            return 0.0
+        return self.cache_hits / ncalls
+
     def expand(self, q=-1, G1=0, G2=None, cc=False):
         """Expand functions in plane-waves.
 
@@ -1483,10 +1747,35 @@ class PWLFC(BaseLFC):
             End G-vector index.
         cc: bool
             Complex conjugate.
+
+        If caching is enabled, the returned array is read-only and must
+        not be modified.
         """
         if G2 is None:
             G2 = self.Y_qGL[q].shape[0]
 
+        if not self.cache_size:
+            return self._expand(q, G1, G2, cc)
+
+        key = (q % len(self.Y_qGL), G1, G2, cc)
+        f_GI = self.cache.get(key)
+        if f_GI is not None:
+            self.cache_hits += 1
+            self.cache[key] = self.cache.pop(key)  # most recently used
+            return f_GI
+
+        self.cache_misses += 1
+        with self.timer('Expand'):
+            f_GI = self._expand(q, G1, G2, cc)
+        f_GI.flags.writeable = False
+        if f_GI.nbytes <= self.cache_size:
+            while self.cache_nbytes + f_GI.nbytes > self.cache_size:
+                self.cache_nbytes -= self.cache.popitem(last=False)[1].nbytes
+            self.cache[key] = f_GI
+            self.cache_nbytes += f_GI.nbytes
+        return f_GI
+
+    def _expand(self, q, G1, G2, cc):
         emiGR_Ga = self.emiGR_qGa[q][G1:G2]
         f_Gs = self.f_qGs[q][G1:G2]
         Y_GL = self.Y_qGL[q][G1:G2]
@@ -1598,11 +1887,13 @@ class PWLFC(BaseLFC):
         for G1, G2 in self.block(q):
             f_GI = self.expand(q, G1, G2, cc=self.pd.dtype == complex)
             if self.pd.dtype == float:
-                if G1 == 0 and self.comm.rank == 0:
-                    f_GI[0] *= 0.5
+                G0 = G1 == 0 and self.comm.rank == 0
                 G1 *= 2
                 G2 *= 2
             mmm(alpha, a_xG[:, G1:G2], 'N', f_GI, 'N', x, b_xI)
+            if self.pd.dtype == float and G0:
+                # The G=0 component must only be counted once:
+                b_xI -= 0.5 * alpha * np.outer(a_xG[:, 0], f_GI[0])
             x = 1.0
 
         self.comm.sum(b_xI)
@@ -1742,6 +2033,136 @@ class PWLFC(BaseLFC):
         return stress.real
 
 
+class RealSpacePWLFC(BaseLFC):
+    # No cache for plane-wave expansions:
+    cache_size = 0
+
+    def __init__(self, spline_aj, pd, blocksize=8, timer=None):
+        """Plane-wave localized function collection applied in real space.
+
+        The plane-wave coefficients are Fourier transformed to the FFT
+        grid where the functions are added or integrated by a
+        real-space LFC object visiting only the grid points inside the
+        spheres.  The cost scales linearly with the number of atoms
+        (PWLFC scales as the number of atoms times the number of plane
+        waves).  Setups are not filtered in PW mode, so the functions
+        are aliased on the FFT grid and there is an egg-box error.
+
+        Expansions in plane waves (expand() and the stress tensor) are
+        delegated to a PWLFC object.
+
+        spline_aj: list of list of spline objects
+            Splines.
+        pd: PWDescriptor
+            Plane-wave descriptor object.
+        blocksize: int
+            Number of functions to transform to real space in one go.
+        timer: Timer object
+            Fourier transforms are timed as 'Projector FFT'."""
+
+        self.pd = pd
+        self.spline_aj = spline_aj
+        self.dtype = pd.dtype
+        self.blocksize = blocksize
+        self.timer = timer or nulltimer
+
+        kd = pd.kd
+        self.gamma = kd is None or kd.gamma
+        self.lfc = LFC(pd.gd, spline_aj, kd, dtype=pd.dtype, forces=True)
+        self.pwlfc = PWLFC(spline_aj, pd, timer=timer)
+
+        # e^(ik.r) for the last k-point used:
+        self.eikr_R = None
+        self.eikr_q = None
+
+        # These are set later in set_positions():
+        self.spos_ac = None
+        self.atom_partition = None
+        self.my_atom_indices = None
+        self.pwlfc_positions_set = False
+
+    def estimate_memory(self, mem):
+        self.lfc.estimate_memory(mem)
+
+    def get_function_count(self, a):
+        return sum(2 * spline.get_angular_momentum_number() + 1
+                   for spline in self.spline_aj[a])
+
+    def set_positions(self, spos_ac, atom_partition=None):
+        self.lfc.set_positions(spos_ac, atom_partition)
+        self.my_atom_indices = self.lfc.my_atom_indices
+        self.spos_ac = spos_ac
+        self.atom_partition = atom_partition
+        self.pwlfc_positions_set = False
+
+    def reciprocal_space_lfc(self):
+        """PWLFC object with the current positions."""
+        if not self.pwlfc_positions_set:
+            self.pwlfc.set_positions(self.spos_ac, self.atom_partition)
+            self.pwlfc_positions_set = True
+        return self.pwlfc
+
+    def expand(self, q=-1, G1=0, G2=None, cc=False):
+        return self.reciprocal_space_lfc().expand(q, G1, G2, cc)
+
+    def stress_tensor_contribution(self, a_xG, c_axi=1.0, q=-1):
+        return self.reciprocal_space_lfc().stress_tensor_contribution(
+            a_xG, c_axi, q)
+
+    def bloch_phase(self, q):
+        """Return e^(ik.r) on the grid (None for the Gamma-point)."""
+        if self.gamma:
+            return None
+        if q != self.eikr_q:
+            self.eikr_R = self.pd.gd.plane_wave(self.pd.kd.ibzk_qc[q])
+            self.eikr_q = q
+        return self.eikr_R
+
+    def split(self, a_xG, c_axi):
+        """Split the first axis of a_xG and c_axi into blocks."""
+        if a_xG.ndim == 1:
+            yield (a_xG[np.newaxis],
+                   {a: c_i[np.newaxis] for a, c_i in c_axi.items()})
+            return
+        for n1 in range(0, len(a_xG), self.blocksize):
+            n2 = n1 + self.blocksize
+            yield (a_xG[n1:n2],
+                   {a: c_xi[n1:n2] for a, c_xi in c_axi.items()})
+
+    def ifft(self, a_xG, q):
+        """Bloch functions on the FFT grid from plane-wave coefficients."""
+        a_xR = self.pd.gd.empty(a_xG.shape[:-1], self.dtype)
+        with self.timer('Projector FFT'):
+            for x in np.ndindex(a_xG.shape[:-1]):
+                a_xR[x] = self.pd.ifft(a_xG[x], q)
+        eikr_R = self.bloch_phase(q)
+        if eikr_R is not None:
+            a_xR *= eikr_R
+        return a_xR
+
+    def add(self, a_xG, c_axi, q=-1):
+        for b_xG, b_axi in self.split(a_xG, c_axi):
+            b_xR = self.pd.gd.zeros(b_xG.shape[:-1], self.dtype)
+            self.lfc.add(b_xR, b_axi, q)
+            eikr_R = self.bloch_phase(q)
+            if eikr_R is not None:
+                b_xR *= eikr_R.conj()
+            with self.timer('Projector FFT'):
+                for x in np.ndindex(b_xG.shape[:-1]):
+                    b_xG[x] += self.pd.fft(b_xR[x], q)
+
+    def integrate(self, a_xG, c_axi=None, q=-1):
+        if c_axi is None:
+            c_axi = self.dict(a_xG.shape[:-1])
+        for b_xG, b_axi in self.split(a_xG, c_axi):
+            self.lfc.integrate(self.ifft(b_xG, q), b_axi, q)
+        return c_axi
+
+    def derivative(self, a_xG, c_axiv, q=-1):
+        for b_xG, b_axiv in self.split(a_xG, c_axiv):
+            self.lfc.derivative(self.ifft(b_xG, q), b_axiv, q)
+
+
 class PseudoCoreKineticEnergyDensityLFC(PWLFC):
     def add(self, tauct_R):
         tauct_R += self.pd.ifft(1.0 / self.pd.gd.dv *
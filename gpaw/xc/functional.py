@@ -3,6 +3,7 @@ import numpy as np
 
 class XCFunctional(object):
     orbital_dependent = False
+    igrid = None  # gpaw.symmetry.IrreducibleGrid object
 
     def __init__(self, name, type):
         self.name = name
@@ -62,6 +63,38 @@ class XCFunctional(object):
     def calculate_impl(self, gd, n_sg, v_sg, e_g):
         raise NotImplementedError
 
+    def set_irreducible_grid(self, igrid):
+        """Evaluate the kernel on the symmetry-irreducible points of igrid.
+
+        See gpaw.symmetry.IrreducibleGrid.  Use None to switch off."""
+        self.igrid = igrid
+
+    def calculate_kernel(self, gd, e_g, n_sg, v_sg, *args):
+        """Call self.kernel.calculate(e_g, n_sg, v_sg, *args).
+
+        The extra arguments come in pairs of input and output arrays
+        like sigma_xg and dedsigma_xg.  If an irreducible grid is set
+        for gd, the kernel only sees the irreducible points and the
+        results are expanded to the full grid afterwards."""
+        igrid = self.igrid
+        if igrid is None or gd is not igrid.gd:
+            self.kernel.calculate(e_g, n_sg, v_sg, *args)
+            return
+
+        e_x = igrid.empty()
+        v_sx = igrid.zeros(len(n_sg))
+        args_x = []
+        for i, a_xg in enumerate(args):
+            if i % 2 == 0:
+                args_x.append(igrid.reduce(a_xg))
+            else:
+                args_x.append(igrid.empty(len(a_xg)))
+        self.kernel.calculate(e_x, igrid.reduce(n_sg), v_sx, *args_x)
+        igrid.expand(e_x, e_g)
+        v_sg += igrid.expand(v_sx)
+        for a_xg, a_xx in zip(args[1::2], args_x[1::2]):
+            igrid.expand(a_xx, a_xg)
+
     def calculate_paw_correction(self, setup, D_sp, dEdD_sp=None, a=None):
         raise NotImplementedError
 
@@ -190,7 +190,7 @@ class GGA(XCFunctional):
 
     def calculate_impl(self, gd, n_sg, v_sg, e_g):
         sigma_xg, dedsigma_xg, gradn_svg = gga_vars(gd, self.grad_v, n_sg)
-        self.kernel.calculate(e_g, n_sg, v_sg, sigma_xg, dedsigma_xg)
+        self.calculate_kernel(gd, e_g, n_sg, v_sg, sigma_xg, dedsigma_xg)
         add_gradient_correction(self.grad_v, gradn_svg, sigma_xg,
                                 dedsigma_xg, v_sg)
 
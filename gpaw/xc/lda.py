@@ -88,7 +88,7 @@ class LDA(XCFunctional):
         XCFunctional.__init__(self, kernel.name, kernel.type)
 
     def calculate_impl(self, gd, n_sg, v_sg, e_g):
-        self.kernel.calculate(e_g, n_sg, v_sg)
+        self.calculate_kernel(gd, e_g, n_sg, v_sg)
 
     def calculate_paw_correction(self, setup, D_sp, dEdD_sp=None,
                                  addcoredensity=True, a=None):